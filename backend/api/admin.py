@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Fighter, Event, Bout
+from .models import Fighter, Event, Bout, BoutElo
 
 
 class FighterAdmin(admin.ModelAdmin):
@@ -16,4 +16,10 @@ admin.site.register(Event, EventAdmin)
 class BoutAdmin(admin.ModelAdmin):
     list_display = ["bout_id", "fighter_1", "fighter_2", "event", "event__date"]
     search_fields = ["bout_id", "fighter_1__name", "fighter_2__name", "event__name", "result"]
-admin.site.register(Bout, BoutAdmin)
\ No newline at end of file
+admin.site.register(Bout, BoutAdmin)
+
+class BoutEloAdmin(admin.ModelAdmin):
+    list_display = ["bout", "fighter", "event_date", "starting_elo", "ending_elo", "win_probability"]
+    search_fields = ["bout__bout_id", "fighter__name"]
+    list_select_related = ["bout__event", "bout__fighter_1", "bout__fighter_2", "fighter"]
+admin.site.register(BoutElo, BoutEloAdmin)
\ No newline at end of file
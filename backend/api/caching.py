@@ -0,0 +1,88 @@
+"""
+Response caching for the read-only fighter/event endpoints.
+
+Their data only changes when `load_json_data` or `elo` runs, so serialized responses are cached
+(in the CACHES backend configured in settings - local memory by default, no external services)
+under a key that includes the current DatasetVersion stamp. Both commands call
+bump_dataset_version() when they change anything, which invalidates every cached page at once;
+entries for old stamps are never read again and simply expire.
+
+Responses also carry an ETag built from the same stamp, so clients that send If-None-Match
+get a 304 Not Modified without the page being serialized (or even read from the cache).
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DatasetVersion
+
+
+# Seconds a cached page is kept. Pages are invalidated by the dataset stamp, this only cleans up old stamps
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Stamp used before either command has ever run
+EMPTY_DATASET_STAMP = 'empty'
+
+
+def dataset_version():
+    """ Returns the current dataset stamp (one indexed single-row query) """
+
+    return DatasetVersion.objects.values_list('stamp', flat=True).first() or EMPTY_DATASET_STAMP
+
+
+def bump_dataset_version():
+    """ Gives the dataset a new stamp, invalidating every cached response and ETag """
+
+    stamp = uuid.uuid4().hex
+    DatasetVersion.objects.update_or_create(pk=1, defaults={'stamp': stamp})
+    return stamp
+
+
+def response_etag(request, stamp):
+    """ ETag for a response: the same URL, format and dataset stamp always produce the same body """
+
+    key = f"{stamp}:{request.accepted_media_type}:{request.get_full_path()}"
+    return f'"{hashlib.md5(key.encode("utf-8")).hexdigest()}"'
+
+
+def response_cache_key(request, stamp):
+    """ Cache key for a response's data (rendering happens per request, so the format isn't part of it) """
+
+    path_hash = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    return f"api-response:{stamp}:{path_hash}"
+
+
+class CachedDatasetViewMixin:
+    """
+    Caches a read-only view's response data per dataset stamp and answers If-None-Match with 304s.
+    Goes before the generic view in the bases, e.g. `class EventListView(CachedDatasetViewMixin, generics.ListAPIView)`.
+    Authentication and permissions still run on every request (get() is only called once they've passed).
+    Only successful responses are cached, errors (e.g. 404s) are served as usual.
+    """
+
+    def get(self, request, *args, **kwargs):
+        stamp = dataset_version()
+        etag = response_etag(request, stamp)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = not_modified
+        else:
+            cache_key = response_cache_key(request, stamp)
+            data = cache.get(cache_key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = super().get(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data, CACHE_TIMEOUT)
+
+        response['ETag'] = etag
+        # Browsers may keep the page, but must check the ETag with us before reusing it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
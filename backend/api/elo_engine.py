@@ -0,0 +1,204 @@
+"""
+In-memory Elo replay engine.
+
+The `elo` management command used to re-fetch both fighters and save them twice for every bout.
+Instead, everything is loaded once, the whole bout history is replayed over a dict of Fighter
+objects in Python, and the caller writes the results back in a single bulk_update pass.
+"""
+import math
+import logging
+from datetime import date
+
+from django.db.models import Max, Q
+
+from .models import Bout, BoutElo
+
+logger = logging.getLogger(__name__)
+
+
+K_FACTOR = 30 # maximum possible rating change in a single bout
+INITIAL_ELO = 1500.00 # every fighter starts here (matches the Fighter.elo model default)
+
+# Fields written back to the Fighter table after a replay (the per-bout history goes to the BoutElo table)
+ELO_FIELDS = ['elo', 'peak_elo']
+
+
+def win_probability(winning_fighter_elo, losing_fighter_elo):
+    """ Returns the predicted win chance percentage as a decimal """
+
+    return 1.0 / (1 + math.pow( 10, ((winning_fighter_elo - losing_fighter_elo) / 400.0) ))
+
+
+def elo_rating(current_elo, opponent_elo, outcomeValue, k=K_FACTOR):
+    """ Returns an updated Elo rating for a fighter post-bout, based on expectation and outcome
+
+        R' = R + K *(S - E)
+
+    R = elo of current fighter
+    K = maximum possible rating change
+    S = actual outcome Value: 1 for a win, 0.5 for a draw, and 0 for a loss
+    E = expected outcome value for S based on the fighters' elo comparison
+    R` = New rating
+    """
+
+    R = current_elo
+    K = k
+    S = outcomeValue if current_elo else 0.5 # if there is a clear winner, use the outcomeValue (1 or 0 for win or loss), otherwise it's a draw/NC (value of 0.5)
+    E = win_probability(current_elo, opponent_elo) # percentage chance of winning based on Elo ratings, as decimal (0-1)
+
+    return ( R + K *( S - E ) )
+
+
+def expected_win_chance(fighter_elo, opponent_elo):
+    """ Returns a fighter's pre-fight chance of beating their opponent, as a decimal (0-1)
+
+    This is the standard Elo expectation, 1 / (1 + 10^((opponent - fighter) / 400)), which is
+    win_probability() with the two ratings passed the other way around.
+    """
+
+    return win_probability(opponent_elo, fighter_elo)
+
+
+def rateable_event_cutoff(today=None):
+    """ Returns the latest event date that has complete results (no future or un-scraped events)
+
+    Events that were scraped before they took place have bouts without a result yet (which the replay would
+    score as draws), so the newest event with a decided bout marks how far the scraped data goes.
+    The scraper's --incremental mode re-scrapes everything after it on the next refresh.
+    """
+
+    today = today or date.today()
+    last_scraped = Bout.objects.filter(Q(result__isnull=False) | Q(winning_fighter__isnull=False)).aggregate(
+        last_event_date=Max('event__date')
+    )['last_event_date']
+    if last_scraped is None: # no results at all yet, so nothing can be rated
+        return date.min
+    return min(today, last_scraped)
+
+
+def chronological_bouts(event, bouts_by_id):
+    """ Returns an event's bouts in the order they were fought (earliest prelim first, main event last)
+
+    Event.bout_order lists the main event first, so it gets reversed here.
+    Bouts missing from bouts_by_id are skipped with a warning instead of crashing the whole replay.
+    """
+
+    ordered_bouts = []
+    for bout_id in reversed(event.bout_order):
+        bout = bouts_by_id.get(bout_id)
+        if bout is None:
+            logger.warning(f"Bout {bout_id} listed on {event.name} was not found, skipping it.")
+            continue
+        ordered_bouts.append(bout)
+    return ordered_bouts
+
+
+class EloReplay:
+    """
+    Replays bouts over an in-memory dict of Fighter objects (keyed by fighter_id).
+    Nothing touches the database here: the caller loads the fighters, feeds events/bouts in
+    chronological order, then persists `changed_fighters()` with a bulk_update and
+    `snapshots` (unsaved BoutElo rows, one per fighter per replayed bout) with a bulk_create.
+    """
+
+    def __init__(self, fighters, k=K_FACTOR):
+        self.fighters = fighters
+        self.k = k
+        self.changed_ids = set()
+        self.snapshots = []
+        self.fight_counts = {} # fighter_id -> rated bouts so far, numbers each fighter's snapshots
+
+    def reset(self):
+        """ Puts every fighter back to their pre-debut rating, ready for a full recompute """
+
+        for fighter in self.fighters.values():
+            fighter.elo = INITIAL_ELO
+            fighter.peak_elo = INITIAL_ELO
+        self.fight_counts = {}
+        self.changed_ids.update(self.fighters.keys())
+
+    def rewind(self, earlier_results):
+        """ Restores every fighter's rating as of a cutoff date, so the events from then on can be replayed again
+
+        `earlier_results` are (fighter_id, ending_elo) pairs for every bout before the cutoff, in each fighter's
+        fight order (the BoutElo rows before it). Fighters without any go back to their pre-debut rating.
+        Fighters whose rating doesn't change keep their records untouched (and aren't marked as changed).
+        """
+
+        standings = {} # fighter_id -> (elo, peak_elo) after their last bout before the cutoff
+        self.fight_counts = {}
+        for fighter_id, ending_elo in earlier_results:
+            peak_elo = standings[fighter_id][1] if fighter_id in standings else INITIAL_ELO
+            standings[fighter_id] = (ending_elo, max(peak_elo, ending_elo))
+            self.fight_counts[fighter_id] = self.fight_counts.get(fighter_id, 0) + 1
+
+        for fighter in self.fighters.values():
+            elo, peak_elo = standings.get(fighter.fighter_id, (INITIAL_ELO, INITIAL_ELO))
+            if (fighter.elo, fighter.peak_elo) == (elo, peak_elo):
+                continue
+
+            fighter.elo = elo
+            fighter.peak_elo = peak_elo
+            self.changed_ids.add(fighter.fighter_id)
+
+    def changed_fighters(self):
+        """ Returns the Fighter objects whose rating records were modified by this replay """
+
+        return [self.fighters[fighter_id] for fighter_id in self.changed_ids]
+
+    def replay_event(self, event, bouts_by_id):
+        """ Replays every bout on an event, in fight order """
+
+        logger.info(f"Ranking fighters from bouts at {event.name}.")
+        for bout in chronological_bouts(event, bouts_by_id):
+            self.replay_bout(bout, event)
+
+    def replay_bout(self, bout, event):
+        """ Gets new Elo ratings for the two fighters participating in a given bout, updates their in-memory records """
+
+        # The dict always holds the latest state, so tournaments (fighters with several bouts on one card) work as-is
+        fighter_1 = self.fighters.get(bout.fighter_1_id)
+        fighter_2 = self.fighters.get(bout.fighter_2_id)
+        if fighter_1 is None or fighter_2 is None:
+            logger.warning(f"Skipping bout {bout.bout_id}: fighter record not found.")
+            return
+
+        fighter_1_prefight_elo = fighter_1.elo
+        fighter_2_prefight_elo = fighter_2.elo
+
+        # Is there a definitive winner? (Win or Loss - not a draw or NC)
+        if bout.winning_fighter_id:
+            fighter_1_outcome = 1 if bout.winning_fighter_id == fighter_1.fighter_id else 0
+        # No winner... So it's a draw or no contest
+        else:
+            fighter_1_outcome = 0.5
+        fighter_2_outcome = 1 - fighter_1_outcome
+
+        fighter_1_postfight_elo = elo_rating(fighter_1_prefight_elo, fighter_2_prefight_elo, fighter_1_outcome, self.k)
+        fighter_2_postfight_elo = elo_rating(fighter_2_prefight_elo, fighter_1_prefight_elo, fighter_2_outcome, self.k)
+
+        self.record_result(fighter_1, bout, event, fighter_2, fighter_1_prefight_elo, fighter_1_postfight_elo, fighter_2_prefight_elo)
+        self.record_result(fighter_2, bout, event, fighter_1, fighter_2_prefight_elo, fighter_2_postfight_elo, fighter_1_prefight_elo)
+
+    def record_result(self, fighter, bout, event, opponent, starting_elo, ending_elo, opponent_starting_elo):
+        """ Updates the fighter's in-memory Elo records after a bout, and adds the bout to their history (a BoutElo snapshot) """
+
+        fighter.elo = ending_elo
+        # Update fighter's peak Elo (if a new high was achieved)
+        if ending_elo > fighter.peak_elo:
+            fighter.peak_elo = ending_elo
+
+        self.fight_counts[fighter.fighter_id] = self.fight_counts.get(fighter.fighter_id, 0) + 1
+        self.snapshots.append(BoutElo(
+            bout_id=bout.bout_id,
+            fighter_id=fighter.fighter_id,
+            opponent_id=opponent.fighter_id,
+            event_date=event.date,
+            fight_number=self.fight_counts[fighter.fighter_id],
+            starting_elo=starting_elo,
+            ending_elo=ending_elo,
+            win_probability=expected_win_chance(starting_elo, opponent_starting_elo),
+        ))
+
+        self.changed_ids.add(fighter.fighter_id)
+        logger.debug(f"Updated {fighter.name} Elo vs. {opponent.name} at {event.name}")
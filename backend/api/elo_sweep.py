@@ -0,0 +1,146 @@
+"""
+Vectorized (NumPy) Elo engine for parameter sweeps.
+
+The whole bout history is encoded once as integer index arrays, then replayed for many
+(K, initial rating, draw value) configurations at the same time: ratings are a
+(configurations x fighters) matrix, and every step updates a whole group of bouts at once.
+
+Bouts are grouped into "levels": a bout can only depend on the previous bouts of its two
+fighters, so each bout goes one level after the latest level either fighter appeared in.
+No fighter appears twice within a level, which keeps the vectorized replay exactly equal
+to replaying the bouts one by one (like EloReplay does).
+"""
+import itertools
+import numpy as np
+
+from .elo_engine import K_FACTOR, INITIAL_ELO, chronological_bouts
+
+
+# Keeps log-loss finite when a prediction is (numerically) 0 or 1
+PROBABILITY_EPSILON = 1e-12
+
+
+class BoutHistory:
+    """
+    Every rateable bout encoded as integer index arrays, in the order they were fought.
+
+    fighter_1 / fighter_2 -- index into fighter_ids for both fighters of each bout
+    outcome -- fighter_1's result: 1 for a win, 0 for a loss (draws/NCs hold 0 and are flagged in is_draw)
+    is_draw -- True for bouts without a winner (draw or no contest)
+    levels -- list of bout index arrays that can be replayed together (see module docstring)
+    """
+
+    def __init__(self, fighter_ids, fighter_1, fighter_2, outcome, is_draw):
+        self.fighter_ids = fighter_ids
+        self.fighter_1 = fighter_1
+        self.fighter_2 = fighter_2
+        self.outcome = outcome
+        self.is_draw = is_draw
+        self.levels = schedule_levels(fighter_1, fighter_2, len(fighter_ids))
+
+    def __len__(self):
+        return len(self.fighter_1)
+
+    @classmethod
+    def from_events(cls, events, bouts_by_id):
+        """ Encodes the bouts of the given events (already in chronological order) """
+
+        fighter_index = {}
+        fighter_1, fighter_2, outcome, is_draw = [], [], [], []
+
+        for event in events:
+            for bout in chronological_bouts(event, bouts_by_id):
+                fighter_1.append(fighter_index.setdefault(bout.fighter_1_id, len(fighter_index)))
+                fighter_2.append(fighter_index.setdefault(bout.fighter_2_id, len(fighter_index)))
+                outcome.append(1.0 if bout.winning_fighter_id == bout.fighter_1_id else 0.0)
+                is_draw.append(not bout.winning_fighter_id)
+
+        return cls(
+            list(fighter_index),
+            np.array(fighter_1, dtype=np.intp),
+            np.array(fighter_2, dtype=np.intp),
+            np.array(outcome, dtype=np.float64),
+            np.array(is_draw, dtype=bool),
+        )
+
+
+def schedule_levels(fighter_1, fighter_2, number_of_fighters):
+    """ Groups bout indexes into levels where no fighter appears twice, keeping each fighter's bouts in order """
+
+    last_level = np.full(number_of_fighters, -1, dtype=np.intp)
+    bout_levels = np.empty(len(fighter_1), dtype=np.intp)
+
+    for bout_index, (f1, f2) in enumerate(zip(fighter_1.tolist(), fighter_2.tolist())):
+        level = max(last_level[f1], last_level[f2]) + 1
+        bout_levels[bout_index] = level
+        last_level[f1] = level
+        last_level[f2] = level
+
+    if not len(bout_levels):
+        return []
+
+    # A stable sort keeps the original bout order inside each level
+    order = np.argsort(bout_levels, kind='stable')
+    boundaries = np.flatnonzero(np.diff(bout_levels[order])) + 1
+    return np.split(order, boundaries)
+
+
+def expected_scores(ratings, opponent_ratings):
+    """ Vectorized version of elo_engine.win_probability (the E term the rating updates use) """
+
+    return 1.0 / (1.0 + np.power(10.0, (ratings - opponent_ratings) / 400.0))
+
+
+def sweep(history, k_factors=(K_FACTOR,), initial_ratings=(INITIAL_ELO,), draw_values=(0.5,)):
+    """ Replays the full history once for every (K, initial rating, draw value) combination
+
+    Returns a list of result dicts (one per combination) with the final ratings and the
+    log-loss / Brier score of the pre-fight predictions, scored over bouts with a winner.
+    """
+
+    configs = list(itertools.product(k_factors, initial_ratings, draw_values))
+    k = np.array([config[0] for config in configs], dtype=np.float64)[:, None]
+    initial = np.array([config[1] for config in configs], dtype=np.float64)
+    draw_value = np.array([config[2] for config in configs], dtype=np.float64)[:, None]
+
+    ratings = np.repeat(initial[:, None], len(history.fighter_ids), axis=1)
+    # Pre-fight chance of fighter_1 winning, for every configuration and bout
+    predictions = np.empty((len(configs), len(history)))
+
+    for bouts in history.levels:
+        f1 = history.fighter_1[bouts]
+        f2 = history.fighter_2[bouts]
+        fighter_1_elo = ratings[:, f1]
+        fighter_2_elo = ratings[:, f2]
+
+        fighter_1_expected = expected_scores(fighter_1_elo, fighter_2_elo)
+        fighter_2_expected = expected_scores(fighter_2_elo, fighter_1_elo)
+
+        draws = history.is_draw[bouts]
+        fighter_1_score = np.where(draws, draw_value, history.outcome[bouts])
+        fighter_2_score = np.where(draws, draw_value, 1.0 - history.outcome[bouts])
+
+        # fighter_2's expected score is the standard Elo chance of fighter_1 winning, 1 / (1 + 10^((R2 - R1) / 400))
+        predictions[:, bouts] = fighter_2_expected
+
+        ratings[:, f1] = fighter_1_elo + k * (fighter_1_score - fighter_1_expected)
+        ratings[:, f2] = fighter_2_elo + k * (fighter_2_score - fighter_2_expected)
+
+    decisive = ~history.is_draw
+    actual = history.outcome[decisive]
+    predicted = np.clip(predictions[:, decisive], PROBABILITY_EPSILON, 1 - PROBABILITY_EPSILON)
+
+    log_loss = -np.mean(actual * np.log(predicted) + (1 - actual) * np.log(1 - predicted), axis=1)
+    brier = np.mean((predicted - actual) ** 2, axis=1)
+
+    return [
+        {
+            "k": config[0],
+            "initial_rating": config[1],
+            "draw_value": config[2],
+            "log_loss": float(log_loss[index]),
+            "brier": float(brier[index]),
+            "ratings": ratings[index],
+        }
+        for index, config in enumerate(configs)
+    ]
@@ -0,0 +1,286 @@
+"""
+Ingestion helpers for `load_json_data`.
+
+JSON files (or a zip archive holding them) are stream-parsed one record at a time, so memory stays
+flat no matter how large the dataset gets.
+
+With --bulk, rows are streamed into temporary staging tables with PostgreSQL COPY (psycopg 3), then merged
+into the real tables with one INSERT ... ON CONFLICT statement per table. Staging tables are
+created with ON COMMIT DROP, so these helpers must run inside a transaction (transaction.atomic).
+"""
+import hashlib
+import io
+import json
+import posixpath
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+
+from .models import Fighter, Event, Bout
+
+
+# Characters read from a JSON file at a time while stream-parsing it
+READ_CHUNK_SIZE = 64 * 1024
+
+# File names inside a scraped data archive (e.g. complete_data-july_4_2025.zip)
+JSON_FILE_NAMES = {
+    'events': 'events.json',
+    'fighters': 'fighters.json',
+    'bouts': 'bouts.json',
+}
+
+
+# Columns that come straight from the scraped JSON, per table
+FIGHTER_COLUMNS = ['fighter_id', 'name', 'nickname', 'wins', 'losses', 'draws', 'height_in', 'weight_lb', 'reach_in', 'stance', 'date_of_birth']
+EVENT_COLUMNS = ['event_id', 'name', 'date', 'location', 'bout_order']
+BOUT_COLUMNS = ['bout_id', 'event_id', 'fighter_1_id', 'fighter_2_id', 'winning_fighter_id', 'result', 'method', 'ending_round', 'ending_time', 'time_format', 'referee', 'details']
+
+# Every table stores a hash of its scraped columns, so unchanged rows can be skipped on re-ingestion
+HASH_COLUMN = 'content_hash'
+
+
+def iter_json_array(text_stream, chunk_size=READ_CHUNK_SIZE):
+    """ Yields the items of a top-level JSON array one at a time, reading the stream in chunks
+
+    Only the current chunk (plus a partially read item) is ever held in memory, unlike json.load.
+    Raises json.JSONDecodeError / ValueError when the stream isn't a well-formed JSON array.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    end_of_file = False
+    expecting = '['  # '[' -> 'first item' -> ',' or ']' -> 'item' -> ...
+
+    while True:
+        # Skip whitespace between tokens
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+
+        if position == len(buffer):
+            if end_of_file:
+                raise ValueError("Unexpected end of file while reading a JSON array")
+            chunk = text_stream.read(chunk_size)
+            end_of_file = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+
+        if expecting == '[':
+            if buffer[position] != '[':
+                raise ValueError("Expected a JSON array")
+            position += 1
+            expecting = 'first item'
+
+        elif expecting == ',':
+            if buffer[position] == ']':
+                return
+            if buffer[position] != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {buffer[position]!r}")
+            position += 1
+            expecting = 'item'
+
+        else:
+            if expecting == 'first item' and buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                # A value that runs right up to the end of the buffer (e.g. a number) might continue in the next chunk
+                complete = end < len(buffer) or end_of_file
+            except json.JSONDecodeError:
+                if end_of_file:
+                    raise
+                complete = False
+
+            if not complete:
+                chunk = text_stream.read(chunk_size)
+                end_of_file = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+
+            yield item
+            position = end
+            expecting = ','
+
+
+def open_archive_member(archive, name):
+    """ Opens events.json / fighters.json / bouts.json from a zip archive as a text stream
+
+    The file may sit at the root of the archive or inside a single folder.
+    """
+
+    file_name = JSON_FILE_NAMES[name]
+    for member in archive.namelist():
+        if posixpath.basename(member) == file_name and not member.startswith('__MACOSX/'):
+            return io.TextIOWrapper(archive.open(member), encoding='utf-8')
+    raise FileNotFoundError(f"{file_name} not found in {archive.filename}")
+
+
+def content_hash(row):
+    """ Returns a SHA-256 hex digest of a row tuple (dates are hashed in their ISO format) """
+
+    serialized = json.dumps(row, default=str, separators=(',', ':'))
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def validate_row(model, columns, row):
+    """ Returns the row tuple, or raises ValueError naming every value the table would reject
+
+    Checks what the database enforces (NOT NULL, varchar lengths, integer ranges), so a bad record is
+    reported and skipped on its own instead of failing a whole COPY / batch statement.
+    """
+
+    problems = []
+    for column, value in zip(columns, row):
+        field = model._meta.get_field(column)
+        if value is None:
+            if not field.null:
+                problems.append(f"{column} is required")
+            continue
+        try:
+            # Foreign key columns are checked against the column they point at
+            (field.target_field if field.is_relation else field).run_validators(value)
+        except ValidationError as e:
+            problems.append(f"{column}: {' '.join(e.messages)}")
+
+    if problems:
+        raise ValueError("; ".join(problems))
+    return row
+
+
+def with_content_hash(rows):
+    """ Appends the content hash to every row tuple (matching a `[*columns, HASH_COLUMN]` column list) """
+
+    for row in rows:
+        yield (*row, content_hash(row))
+
+
+def batched(iterable, batch_size):
+    """ Yields lists of up to batch_size items from an iterable (itertools.batched is Python 3.12+) """
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def staging_table_name(model):
+    return f"staging_{model._meta.db_table}"
+
+
+def create_staging_table(cursor, model, columns):
+    """ Creates an empty temp table with the same column types as the model's table, plus a row_number column
+
+    row_number keeps the position in the JSON file, so when an id shows up twice the last one wins
+    (same as calling update_or_create for every row).
+    """
+
+    staging_table = staging_table_name(model)
+    # ON COMMIT DROP only fires on a real commit, a nested atomic() block (savepoint) can still see an earlier table
+    cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+    cursor.execute(
+        f"CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS "
+        f"SELECT {', '.join(columns)} FROM {model._meta.db_table} WITH NO DATA"
+    )
+    cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN row_number integer")
+    return staging_table
+
+
+def copy_rows(cursor, staging_table, columns, rows):
+    """ Streams an iterable of row tuples into a staging table with COPY, returns how many rows were written """
+
+    row_count = 0
+    with cursor.copy(f"COPY {staging_table} ({', '.join(columns)}, row_number) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row((*row, row_count))
+            row_count += 1
+    return row_count
+
+
+def _upsert(cursor, model, columns, select_sql, params=(), extra_insert_columns=()):
+    """ Runs INSERT ... SELECT ... ON CONFLICT DO UPDATE, returns (inserted, updated, unchanged) row counts
+
+    Existing rows only get `columns` updated, extra_insert_columns are only written for new rows.
+    Existing rows whose content_hash already matches are left alone (no new row version, no WAL churn).
+    (xmax = 0) is only true for freshly inserted rows, which is how PostgreSQL tells the two apart.
+    """
+
+    table = model._meta.db_table
+    primary_key = model._meta.pk.column
+    insert_columns = ', '.join([*columns, *extra_insert_columns])
+    update_columns = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns if column != primary_key)
+
+    cursor.execute(
+        f"WITH source AS ({select_sql}), upserted AS ("
+        f"  INSERT INTO {table} ({insert_columns}) SELECT * FROM source"
+        f"  ON CONFLICT ({primary_key}) DO UPDATE SET {update_columns}"
+        f"  WHERE {table}.{HASH_COLUMN} IS DISTINCT FROM EXCLUDED.{HASH_COLUMN}"
+        f"  RETURNING (xmax = 0) AS inserted"
+        f") SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted), "
+        f"(SELECT count(*) FROM source) - count(*) FROM upserted",
+        params
+    )
+    return cursor.fetchone()
+
+
+def merge_fighters(cursor, initial_elo):
+    """ Upserts staged fighters. New fighters get a fresh rating, existing ratings are left alone """
+
+    staging_table = staging_table_name(Fighter)
+    select_sql = (
+        f"SELECT DISTINCT ON (fighter_id) {', '.join(FIGHTER_COLUMNS)}, {HASH_COLUMN}, %s, %s "
+        f"FROM {staging_table} ORDER BY fighter_id, row_number DESC"
+    )
+    # Only the scraped columns are updated on conflict, so elo/peak_elo survive re-ingestion
+    return _upsert(
+        cursor, Fighter, [*FIGHTER_COLUMNS, HASH_COLUMN], select_sql, [initial_elo, initial_elo],
+        extra_insert_columns=['elo', 'peak_elo']
+    )
+
+
+def merge_events(cursor):
+    """ Upserts staged events """
+
+    staging_table = staging_table_name(Event)
+    select_sql = (
+        f"SELECT DISTINCT ON (event_id) {', '.join(EVENT_COLUMNS)}, {HASH_COLUMN} "
+        f"FROM {staging_table} ORDER BY event_id, row_number DESC"
+    )
+    return _upsert(cursor, Event, [*EVENT_COLUMNS, HASH_COLUMN], select_sql)
+
+
+def bouts_with_missing_references(cursor):
+    """ Returns (bout_id, missing_event, missing_fighter) for every staged bout pointing at an unknown event or fighter """
+
+    staging_table = staging_table_name(Bout)
+    cursor.execute(
+        f"SELECT s.bout_id, e.event_id IS NULL, (f1.fighter_id IS NULL OR f2.fighter_id IS NULL) "
+        f"FROM {staging_table} s "
+        f"LEFT JOIN {Event._meta.db_table} e ON e.event_id = s.event_id "
+        f"LEFT JOIN {Fighter._meta.db_table} f1 ON f1.fighter_id = s.fighter_1_id "
+        f"LEFT JOIN {Fighter._meta.db_table} f2 ON f2.fighter_id = s.fighter_2_id "
+        f"WHERE e.event_id IS NULL OR f1.fighter_id IS NULL OR f2.fighter_id IS NULL "
+        f"ORDER BY s.row_number"
+    )
+    return cursor.fetchall()
+
+
+def merge_bouts(cursor):
+    """ Upserts staged bouts whose event and fighters exist (report the others with bouts_with_missing_references)
+
+    A winning_fighter_id that isn't one of the two participants is stored as NULL.
+    """
+
+    staging_table = staging_table_name(Bout)
+    select_columns = [
+        "CASE WHEN s.winning_fighter_id IN (s.fighter_1_id, s.fighter_2_id) THEN s.winning_fighter_id END"
+        if column == 'winning_fighter_id' else f"s.{column}"
+        for column in [*BOUT_COLUMNS, HASH_COLUMN]
+    ]
+    select_sql = (
+        f"SELECT DISTINCT ON (s.bout_id) {', '.join(select_columns)} "
+        f"FROM {staging_table} s "
+        f"JOIN {Event._meta.db_table} e ON e.event_id = s.event_id "
+        f"JOIN {Fighter._meta.db_table} f1 ON f1.fighter_id = s.fighter_1_id "
+        f"JOIN {Fighter._meta.db_table} f2 ON f2.fighter_id = s.fighter_2_id "
+        f"ORDER BY s.bout_id, s.row_number DESC"
+    )
+    return _upsert(cursor, Bout, [*BOUT_COLUMNS, HASH_COLUMN], select_sql)
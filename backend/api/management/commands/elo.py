@@ -1,8 +1,11 @@
 from django.core.management.base import BaseCommand
-import math
-from api.models import Event, Bout, Fighter
+from django.db import transaction
+from api.models import Event, Bout, Fighter, BoutElo
+from api.elo_engine import EloReplay, ELO_FIELDS, rateable_event_cutoff
+from api.caching import bump_dataset_version
+import argparse
 import logging
-from datetime import datetime, date
+from datetime import date
 
 # Set up logging to persist output
 log_file = "assigning_elo_rankings.log"
@@ -22,145 +25,91 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Assigns Elo ratings to all fighters, ordered by earliest date."
 
-    def win_probability(self, winning_fighter_elo, losing_fighter_elo):
-        """ Returns the predicted win chance percentage as a decimal """
-
-        return 1.0 / (1 + math.pow( 10, ((winning_fighter_elo - losing_fighter_elo) / 400.0) ))
-
-
-    def elo_rating(self, current_elo, opponent_elo, outcomeValue):
-        """ Returns an updated Elo rating for a fighter post-bout, based on expectation and outcome
-
-            R' = R + K *(S - E)   
- 
-        R = elo of current fighter 
-        K = maximum possible rating change
-        S = actual outcome Value: 1 for a win, 0.5 for a draw, and 0 for a loss
-        E = expected outcome value for S based on the fighters' elo comparison
-        R` = New rating
-        """
-
-        R = current_elo
-        K = 30
-        S = outcomeValue if current_elo else 0.5 # if there is a clear winner, use the outcomeValue (1 or 0 for win or loss), otherwise it's a draw/NC (value of 0.5)
-        E = self.win_probability(current_elo, opponent_elo) # percentage chance of winning based on Elo ratings, as decimal (0-1)
-
-        return ( R + K *( S - E ) )
-
-
-    def update_fighter_elo_records(self, fighter, bout, opponent, starting_elo, ending_elo):
-        """ Updates the fighter's Elo DB records after a bout """
-
-        # Create the new elo history entry as a dictionary
-        elo_history_entry = {
-            "date": bout.event.date.strftime("%Y-%m-%d"),
-            "bout_id": bout.bout_id,
-            "opponent_id": opponent.fighter_id,
-            "starting_elo": starting_elo,
-            "ending_elo": ending_elo,
-            "elo_change": ending_elo - starting_elo
-        }
-        # Append the new entry to the fighter's elo_history list
-        fighter.elo_history.append(elo_history_entry)
-
-        # Update the fighter's current Elo
-        fighter.elo = ending_elo
-        # Update fighter's peak Elo (if a new high was achieved)
-        if ending_elo > fighter.peak_elo:
-            fighter.peak_elo = ending_elo
-
-        # Save the updated fighter object!
-        fighter.save()
-
-        logger.info(f"Updated {fighter.name} Elo vs. {opponent.name} at {bout.event.name}")
-
-
-    def assign_elo_rankings(self, bout):
-        """ Gets Elo new ratings for the two fighters participating in a given bout, saves new  database records """
-
-        # Get fresh data from the participating fighters
-        # If the event is a tournament, their Elos could have changed since the event started, so we query the DB every time
-        fighter_1 = Fighter.objects.get(fighter_id=bout.fighter_1.fighter_id)
-        fighter_2 = Fighter.objects.get(fighter_id=bout.fighter_2.fighter_id)
-
-        fighter_1_prefight_elo = fighter_1.elo
-        fighter_2_prefight_elo = fighter_2.elo
-
-        # Here, we update the elo determine the elo change
-        if bout.winning_fighter: # Is there a definitive winner? (Win or Loss - not a draw or NC)
-            # if winner is fighter_1
-            if bout.winning_fighter.fighter_id == fighter_1.fighter_id: 
-                fighter_1_postfight_elo = self.elo_rating(fighter_1.elo, fighter_2.elo, 1)
-                fighter_2_postfight_elo = self.elo_rating(fighter_2.elo, fighter_1.elo, 0)
-            
-            # if winner is fighter_2
-            else:
-                fighter_1_postfight_elo = self.elo_rating(fighter_1.elo, fighter_2.elo, 0)
-                fighter_2_postfight_elo = self.elo_rating(fighter_2.elo, fighter_1.elo, 1)
-        
-        # No winner... So it's a draw or no contest
-        else:
-            fighter_1_postfight_elo = self.elo_rating(fighter_1.elo, fighter_2.elo, 0.5)
-            fighter_2_postfight_elo = self.elo_rating(fighter_2.elo, fighter_1.elo, 0.5)
-      
-        # Update the fighter's Elo records
-        # Fighter 1
-        self.update_fighter_elo_records(fighter_1, bout, fighter_2, fighter_1_prefight_elo, fighter_1_postfight_elo)
-        # Fighter 2
-        self.update_fighter_elo_records(fighter_2, bout, fighter_1, fighter_2_prefight_elo, fighter_2_postfight_elo)
+    # Rows per UPDATE statement when writing the results back
+    BULK_UPDATE_BATCH_SIZE = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=self.parse_date,
+            help='Only replay events on or after this date (YYYY-MM-DD), restoring ratings as of that date from the BoutElo table.'
+        )
+
+    def parse_date(self, date_str):
+        """ Helper to validate the --since date in YYYY-MM-DD format."""
+        try:
+            return date.fromisoformat(date_str)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid date format: {date_str}. Expected format is YYYY-MM-DD.")
+
+    def load_bouts(self, events):
+        """ Loads every bout for the given events in one query, keyed by bout_id """
+
+        return Bout.objects.filter(event__in=events).only(
+            'bout_id', 'event_id', 'fighter_1_id', 'fighter_2_id', 'winning_fighter_id'
+        ).in_bulk()
 
+    def load_fighters(self):
+        """ Loads every fighter (only the fields the replay needs) in one query, keyed by fighter_id """
+
+        return Fighter.objects.only('fighter_id', 'name', *ELO_FIELDS).in_bulk()
+
+    def load_earlier_results(self, since):
+        """ (fighter_id, ending_elo) for every rated bout before `since`, in each fighter's fight order, in one query """
+
+        return BoutElo.objects.filter(event_date__lt=since).order_by('fighter_id', 'fight_number').values_list(
+            'fighter_id', 'ending_elo'
+        ).iterator()
 
     def handle(self, *args, **options):
-        self.stdout.write("Starting Elo rating calculations.")
+        since = options['since']
 
-        # Get all of the events. ordered by event date (oldest first)
-        events = Event.objects.all().order_by('date')
+        if since:
+            self.stdout.write(f"Starting Elo rating calculations for events since {since}.")
+        else:
+            self.stdout.write("Starting Elo rating calculations.")
+
+        # How to assign elo rankings:
+        # 1. Load the rateable events to replay (oldest first), their bouts, and every fighter - three queries in total
+        # 2. Full recompute: reset every fighter back to the starting rating, so re-running the command never double counts
+        #    Incremental (--since): restore each fighter's rating as of the cutoff, from their BoutElo rows before it
+        # 3. Loop thru each event, and each bout in fight order (earliest prelim first, main event last)
+        # 4. Based on the outcome vs. prediction formula: when a bout is concluded, update each fighter in memory
+        # 5. Write every changed fighter back in a single bulk_update pass, and replace the replayed BoutElo snapshots
+        # 6. Bump the dataset version, so cached API responses get invalidated
+
+        # Future events, and recent events that have not been scraped since they took place, are skipped
+        events = Event.objects.filter(date__lte=rateable_event_cutoff())
+        if since:
+            events = events.filter(date__gte=since)
+        events = list(events.order_by('date', 'event_id'))
 
         # If there are no events, we can't assign Elo ratings
         if not events:
             self.stdout.write(self.style.WARNING("No events found. Cannot assign Elo ratings."))
             return
-        
-        # How to assign elo rankings:
-        # 1. Loop thru all events 
-        # 2. Get the bouts from each event 
-        # 3. Ensure the bout order (from the earliest prelim being first, to main event being last)
-        # 4. Loop thru each bout that happens on an event
-        # 5. Get the fighters associated with each bout
-        # 6. Based on the outcome vs. prediction formula: when a bout is concluded, save post-bout elo rating to each fighter
-
-        # Events loop 
-        for event in events:
-            logger.info(f"Ranking fighters from bouts at {event.name}.")
 
-            # If the event is in the future, skip the event
-            today = datetime.now().date()
-            if event.date > today:
-                logger.info(f"Skipping future event: {event.name}")
-                continue
-
-            # TODO: This safeguard should be removed once more events get added. July 4th was the last time I crawled/scraped data
-            # These events are no longer in the future, but have not been scraped since the event took place (incomplete data)
-            most_recent_date_of_scraping = datetime(2025, 7, 4).date()
-            if event.date > most_recent_date_of_scraping:
-                logger.info(f"Skipping a recent event that has incomplete data: {event.name}")
-                continue
-
-            # Get the bouts from the event by bout_id
-            bout_ids = event.bout_order
-            bouts = Bout.objects.filter(bout_id__in=bout_ids)
+        bouts_by_id = self.load_bouts(events)
+        replay = EloReplay(self.load_fighters())
+        if since:
+            replay.rewind(self.load_earlier_results(since))
+        else:
+            replay.reset()
 
-            # Assist in bout order using a hash map, we need the bouts to be in order according to the event.bout_order field
-            bout_hash_map = {bout.bout_id: bout for bout in bouts}
+        # Events loop
+        for event in events:
+            replay.replay_event(event, bouts_by_id)
 
-            # Put the bouts in order in alignment with the hash map
-            ordered_bouts = [bout_hash_map[bout_id] for bout_id in bout_ids]
+        changed_fighters = replay.changed_fighters()
+        with transaction.atomic():
+            Fighter.objects.bulk_update(changed_fighters, ELO_FIELDS, batch_size=self.BULK_UPDATE_BATCH_SIZE)
 
-            # But! the bouts are in reverse order... so we reverse them back, that earliest come first!
-            reversed_bouts = list(reversed(ordered_bouts))
+            stale_snapshots = BoutElo.objects.filter(event_date__gte=since) if since else BoutElo.objects.all()
+            stale_snapshots.delete()
+            BoutElo.objects.bulk_create(replay.snapshots, batch_size=self.BULK_UPDATE_BATCH_SIZE)
 
-            # Bout loop
-            for bout in reversed_bouts:
-                self.assign_elo_rankings(bout)
+            # Cached fighter/event pages now show stale ratings
+            bump_dataset_version()
 
+        logger.info(f"Replayed {len(bouts_by_id)} bouts from {len(events)} events, updated {len(changed_fighters)} fighters.")
         self.stdout.write(self.style.SUCCESS("Elo rating records successfully updated."))
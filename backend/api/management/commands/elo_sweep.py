@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from api.models import Event, Bout
+from api.elo_engine import K_FACTOR, INITIAL_ELO, rateable_event_cutoff
+from api.elo_sweep import BoutHistory, sweep
+import time
+
+
+class Command(BaseCommand):
+    help = "Replays the full bout history for many Elo configurations at once and scores each one (log-loss / Brier)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=float, nargs='+', default=[K_FACTOR], help='K factors to try (e.g. --k 20 30 40)')
+        parser.add_argument('--initial', type=float, nargs='+', default=[INITIAL_ELO], help='Initial ratings to try')
+        parser.add_argument('--draw', type=float, nargs='+', default=[0.5], help='Outcome values to use for draws/no contests')
+        parser.add_argument('--top', type=int, default=20, help='How many of the best configurations to print')
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+
+        # Same rateable events as the `elo` command, in the same order
+        events = list(Event.objects.filter(date__lte=rateable_event_cutoff()).order_by('date', 'event_id'))
+        if not events:
+            self.stdout.write(self.style.WARNING("No events found. Nothing to sweep."))
+            return
+
+        bouts_by_id = Bout.objects.filter(event__in=events).only(
+            'bout_id', 'fighter_1_id', 'fighter_2_id', 'winning_fighter_id'
+        ).in_bulk()
+
+        history = BoutHistory.from_events(events, bouts_by_id)
+        self.stdout.write(f"Encoded {len(history)} bouts between {len(history.fighter_ids)} fighters into {len(history.levels)} levels.")
+
+        results = sweep(history, options['k'], options['initial'], options['draw'])
+        results.sort(key=lambda result: result['log_loss'])
+
+        self.stdout.write(f"{'K':>8} {'Initial':>9} {'Draw':>6} {'Log-loss':>10} {'Brier':>8}")
+        for result in results[:options['top']]:
+            self.stdout.write(
+                f"{result['k']:>8g} {result['initial_rating']:>9g} {result['draw_value']:>6g} "
+                f"{result['log_loss']:>10.5f} {result['brier']:>8.5f}"
+            )
+
+        elapsed_seconds = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(f"Swept {len(results)} configurations in {elapsed_seconds:.2f} seconds."))
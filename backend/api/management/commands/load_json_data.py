@@ -1,11 +1,17 @@
 import json
-from django.core.management.base import BaseCommand
-from django.db import transaction
+import zipfile
+from contextlib import ExitStack
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, connection
 from datetime import date
-from django.db.utils import IntegrityError
+from django.db.utils import DatabaseError
 import logging
+import time
 
 from api.models import Fighter, Bout, Event
+from api.elo_engine import INITIAL_ELO
+from api import ingest
+from api.caching import bump_dataset_version
 
 
 # Set up logging for more detailed output than just self.stdout.write
@@ -28,27 +34,44 @@ logging.basicConfig(
 
 
 class Command(BaseCommand):
-    help = "Load UFC data from JSON files into the PostgreSQL database."
+    help = "Load UFC data from JSON files (or a zip archive of them) into the PostgreSQL database."
 
     def add_arguments(self, parser):
-        parser.add_argument('events_json', type=str, help='Path to the events JSON file')
-        parser.add_argument('fighters_json', type=str, help='Path to the fighters JSON file')
-        parser.add_argument('bouts_json', type=str, help='Path to the bouts JSON file')
+        parser.add_argument('events_json', type=str, nargs='?', help='Path to the events JSON file')
+        parser.add_argument('fighters_json', type=str, nargs='?', help='Path to the fighters JSON file')
+        parser.add_argument('bouts_json', type=str, nargs='?', help='Path to the bouts JSON file')
+        parser.add_argument(
+            '--zip',
+            type=str,
+            help='Path to a zip archive holding events.json, fighters.json and bouts.json (e.g. complete_data-july_4_2025.zip), instead of the three paths'
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Stream rows into staging tables with PostgreSQL COPY and merge them with set-based upserts (much faster)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='How many records are written to the database per statement (without --bulk)'
+        )
 
-    def load_json_file(self, file_path):
-        """ Helper to load JSON data from a file."""
+    def iter_json_records(self, name, file_path=None, archive=None):
+        """ Helper to stream-parse JSON records from a file (or a zip archive member), one at a time.
+
+        A missing file is logged and yields nothing, a file that isn't valid JSON raises CommandError.
+        """
+        source = f"{archive.filename}:{ingest.JSON_FILE_NAMES[name]}" if archive else file_path
         try:
-            with open(file_path, 'r') as f:
-                return json.load(f)
+            stream = ingest.open_archive_member(archive, name) if archive else open(file_path, 'r')
+            with stream:
+                yield from ingest.iter_json_array(stream)
         except FileNotFoundError:
-            logger.error(f"Error: JSON file not found at {file_path}")
-            return None
-        except json.JSONDecodeError:
-            logger.error(f"Error: Could not decode JSON from {file_path}. Check file format.")
-            return None
-        except Exception as e:
-            logger.error(f"An unexpected error occurred while reading {file_path}: {e}")
-            return None
+            logger.error(f"Error: JSON file not found at {source}")
+        except (json.JSONDecodeError, ValueError) as e:
+            # Records are written as they're parsed, so a truncated or corrupt file has to abort (and roll back) the whole load
+            raise CommandError(f"Could not decode JSON from {source}: {e}")
 
     def validate_date(self, date_str):
         """ Helper to validate date strings in YYYY-MM-DD format."""
@@ -61,145 +84,224 @@ class Command(BaseCommand):
         return converted_date
 
 
-    def handle(self, *args, **options):      
-        # Note: Load order may be important here.
-        #    Only Bouts have foreign keys to Fighters and Events, so it needs to be loaded last. 
-        #    Fighters have no FK references, so It'll go first.
-        #    Events do have a list of Bouts, but they are not FK's, just a list of strings that reference Bout IDs.
+    def optional_int(self, value):
+        """ Helper to coerce nullable integer fields (raises ValueError for anything that isn't a number)."""
+        return None if value is None else int(value)
 
-        self.stdout.write("Loading Fighters from JSON file.")
+    def fighter_row(self, fighter):
+        """ Converts a fighter JSON object into a row tuple (in ingest.FIGHTER_COLUMNS order) for COPY."""
+        return ingest.validate_row(Fighter, ingest.FIGHTER_COLUMNS, (
+            fighter["fighter_id"],
+            fighter["name"],
+            fighter["nickname"],
+            int(fighter["wins"]),
+            int(fighter["losses"]),
+            fighter["draws"],
+            self.optional_int(fighter["height_in"]),
+            self.optional_int(fighter["weight_lb"]),
+            self.optional_int(fighter["reach_in"]),
+            fighter["stance"],
+            self.validate_date(fighter["date_of_birth"]),
+        ))
 
-        # JSON file paths 
-        fighters_json = options['fighters_json']
-        events_json = options['events_json']
-        bouts_json = options['bouts_json']
-        
-        # get the JSON data
-        fighters_data = self.load_json_file(fighters_json)
-        events_data = self.load_json_file(events_json)
-        bouts_data = self.load_json_file(bouts_json)
+    def event_row(self, event):
+        """ Converts an event JSON object into a row tuple (in ingest.EVENT_COLUMNS order) for COPY."""
+        event_date = self.validate_date(event["date"])
+        if event_date is None:
+            raise ValueError(f"Event date is required, got {event['date']!r}")
+        row = (event["event_id"], event["name"], event_date, event["location"], list(event["bout_order"]))
+        return ingest.validate_row(Event, ingest.EVENT_COLUMNS, row)
 
-        # Here, we add records to DB tables.
-        with transaction.atomic():
+    def bout_row(self, bout):
+        """ Converts a bout JSON object into a row tuple (in ingest.BOUT_COLUMNS order) for COPY."""
+        return ingest.validate_row(Bout, ingest.BOUT_COLUMNS, tuple(bout[column] for column in ingest.BOUT_COLUMNS))
 
-            #----------------
-            #--- Fighters ---
-            
-            self.stdout.write(self.style.NOTICE("Loading Fighters..."))
+    def valid_rows(self, records, to_row, label, id_field):
+        """ Yields a row tuple per JSON record, logging (and skipping) the records that can't be converted."""
+        for record in records:
+            try:
+                yield to_row(record)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Error processing {label} {record.get(id_field) if isinstance(record, dict) else record}: {e!r}")
 
-            for fighter in fighters_data:
+    def bulk_load(self, fighters_data, events_data, bouts_data):
+        """ Loads all three files with COPY into staging tables, then merges them with INSERT ... ON CONFLICT."""
+        start_time = time.time()
 
-                # We should convert date_of_birth to a date object for postgres, handling invalid formats
-                date_of_birth = self.validate_date(fighter['date_of_birth'])
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Same load order as the row-by-row path: Bouts reference Fighters and Events, so they merge last
+            for model, columns, records, to_row, label in (
+                (Fighter, ingest.FIGHTER_COLUMNS, fighters_data, self.fighter_row, "fighter"),
+                (Event, ingest.EVENT_COLUMNS, events_data, self.event_row, "event"),
+                (Bout, ingest.BOUT_COLUMNS, bouts_data, self.bout_row, "Bout"),
+            ):
+                hashed_columns = [*columns, ingest.HASH_COLUMN]
+                rows = ingest.with_content_hash(self.valid_rows(records, to_row, label, columns[0]))
+                staging_table = ingest.create_staging_table(cursor, model, hashed_columns)
+                staged = ingest.copy_rows(cursor, staging_table, hashed_columns, rows)
+                self.stdout.write(self.style.NOTICE(f"Staged {staged} {model._meta.verbose_name_plural}..."))
 
-                try:
-                    fighter_obj, created = Fighter.objects.update_or_create(
-                        fighter_id=fighter["fighter_id"],
-                        defaults={
-                            "name": fighter["name"],
-                            "nickname": fighter["nickname"],
-                            "wins": fighter["wins"],
-                            "losses": fighter["losses"],
-                            "draws": fighter["draws"],
-                            "height_in": fighter["height_in"],
-                            "weight_lb": fighter["weight_lb"],
-                            "reach_in": fighter["reach_in"],
-                            "stance": fighter["stance"],
-                            "date_of_birth": date_of_birth,
-                        }
-                    )
-                    if created:
-                        logger.info(f"Created Fighter: {fighter_obj.name} ({fighter_obj.fighter_id})")
-                    else:
-                        logger.debug(f"Updated Fighter: {fighter_obj.name} ({fighter_obj.fighter_id})")
-                except IntegrityError as e:
-                    logger.error(f"Database integrity error for fighter {fighter_id}: {e}")
-                except Exception as e:
-                    logger.error(f"Error processing fighter {fighter_id}: {e}", exc_info=True)
-            
-            self.stdout.write(self.style.SUCCESS("Fighter loading complete."))
+            self.report("Fighter", *ingest.merge_fighters(cursor, INITIAL_ELO))
+            self.report("Event", *ingest.merge_events(cursor))
 
+            for bout_id, missing_event, missing_fighter in ingest.bouts_with_missing_references(cursor):
+                if missing_event:
+                    logger.error(f"Event does not exist for Bout {bout_id}")
+                if missing_fighter:
+                    logger.error(f"Fighter does not exist for Bout {bout_id}")
 
-            #----------------
-            #---- Events ----
+            self.report("Bout", *ingest.merge_bouts(cursor))
 
-            self.stdout.write(self.style.NOTICE("Loading Events..."))
+        logger.info(f"Bulk load finished in {time.time() - start_time:.2f} seconds.")
 
-            for event in events_data:
+    def report(self, label, created, updated, unchanged):
+        """ Writes the per-table summary of what the load changed."""
+        self.changed_rows += created + updated
+        self.stdout.write(self.style.SUCCESS(
+            f"{label} loading complete: {created} created, {updated} updated, {unchanged} unchanged."
+        ))
 
-                # Again, convert event_date to a date object for postgres, handling invalid formats
-                event_date = self.validate_date(event['date'])
+    def upsert_in_batches(self, model, columns, rows, batch_size, label, prepare_batch=None):
+        """ Writes new or changed rows to the database in fixed-size batches of INSERT ... ON CONFLICT DO UPDATE statements.
 
-                try:
-                    event_obj, created = Event.objects.update_or_create(
-                        event_id=event["event_id"],
-                        defaults={
-                            "name": event["name"],
-                            "date": event_date,
-                            "location": event["location"],
-                            "bout_order": event["bout_order"]
-                        }
-                    )
-                    if created:
-                        logger.info(f"Created Event: {event_obj.name} ({event_obj.event_id})")
-                    else:
-                        logger.debug(f"Updated Event: {event_obj.name} ({event_obj.event_id})")
-                except IntegrityError as e:
-                    logger.error(f"Database integrity error for event {event['event_id']}: {e}")
-                except Exception as e:
-                    logger.error(f"Error processing event {event['event_id']}: {e}", exc_info=True)
-
-            self.stdout.write(self.style.SUCCESS("Event loading complete."))
+        Rows whose content hash matches the stored one are skipped entirely.
+        """
+        primary_key = model._meta.pk.attname
+        columns = [*columns, ingest.HASH_COLUMN]
+        created_count = updated_count = unchanged_count = 0
+
+        for batch in ingest.batched(ingest.with_content_hash(rows), batch_size):
+            # If an id shows up twice in a batch, the last one wins (same as update_or_create row by row)
+            objs = list({obj.pk: obj for obj in (model(**dict(zip(columns, row))) for row in batch)}.values())
+            if prepare_batch:
+                objs = prepare_batch(objs)
+            if not objs:
+                continue
+
+            stored_hashes = dict(model.objects.filter(pk__in=[obj.pk for obj in objs]).values_list('pk', ingest.HASH_COLUMN))
+            changed_objs = [obj for obj in objs if stored_hashes.get(obj.pk) != obj.content_hash]
+            unchanged_count += len(objs) - len(changed_objs)
+            objs = changed_objs
+            if not objs:
+                continue
+
+            update_fields = [column for column in columns if column != primary_key]
+            try:
+                with transaction.atomic(): # savepoint, so one bad batch doesn't roll back the whole load
+                    model.objects.bulk_create(objs, update_conflicts=True, unique_fields=[primary_key], update_fields=update_fields)
+            except DatabaseError as e:
+                # One bad row fails the whole statement, so the batch is retried row by row and only the bad rows are dropped
+                logger.warning(f"{label} batch {objs[0].pk} - {objs[-1].pk} failed, retrying row by row: {e}")
+                objs = self.upsert_rows(model, objs, primary_key, update_fields, label)
+
+            for obj in objs:
+                if obj.pk in stored_hashes:
+                    updated_count += 1
+                    logger.debug(f"Updated {label}: {obj.pk}")
+                else:
+                    created_count += 1
+                    logger.info(f"Created {label}: {obj.pk}")
+
+        return created_count, updated_count, unchanged_count
+
+    def upsert_rows(self, model, objs, primary_key, update_fields, label):
+        """ Writes rows one at a time, each in its own savepoint. Logs (and drops) the rows the database rejects, returns the rest."""
+        written = []
+        for obj in objs:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([obj], update_conflicts=True, unique_fields=[primary_key], update_fields=update_fields)
+            except DatabaseError as e:
+                logger.error(f"Database error for {label} {obj.pk}: {e}")
+                continue
+            written.append(obj)
+        return written
 
+    def valid_bouts(self, bouts):
+        """ Drops (and logs) bouts that point at unknown events or fighters, checked with one query per model per batch."""
+        event_ids = set(Event.objects.filter(pk__in={bout.event_id for bout in bouts}).values_list('pk', flat=True))
+        fighter_ids = set(Fighter.objects.filter(
+            pk__in={bout.fighter_1_id for bout in bouts} | {bout.fighter_2_id for bout in bouts}
+        ).values_list('pk', flat=True))
+
+        valid = []
+        for bout in bouts:
+            if bout.event_id not in event_ids:
+                logger.error(f"Event does not exist for Bout {bout.bout_id}")
+                continue
+            if bout.fighter_1_id not in fighter_ids or bout.fighter_2_id not in fighter_ids:
+                logger.error(f"Fighter does not exist for Bout {bout.bout_id}")
+                continue
+            # Let's choose a winner, if there is one (it has to be one of the two fighters)
+            if bout.winning_fighter_id not in (bout.fighter_1_id, bout.fighter_2_id):
+                bout.winning_fighter_id = None
+            valid.append(bout)
+        return valid
+
+    def batched_load(self, fighters_data, events_data, bouts_data, batch_size):
+        """ Loads all three files through the ORM, in fixed-size batches."""
+        # Here, we add records to DB tables.
+        with transaction.atomic():
+
+            #----------------
+            #--- Fighters ---
+
+            self.stdout.write(self.style.NOTICE("Loading Fighters..."))
+            rows = self.valid_rows(fighters_data, self.fighter_row, "fighter", "fighter_id")
+            counts = self.upsert_in_batches(Fighter, ingest.FIGHTER_COLUMNS, rows, batch_size, "Fighter")
+            self.report("Fighter", *counts)
+
+            #----------------
+            #---- Events ----
+
+            self.stdout.write(self.style.NOTICE("Loading Events..."))
+            rows = self.valid_rows(events_data, self.event_row, "event", "event_id")
+            counts = self.upsert_in_batches(Event, ingest.EVENT_COLUMNS, rows, batch_size, "Event")
+            self.report("Event", *counts)
 
             #----------------
             #----- Bouts ----
 
             self.stdout.write(self.style.NOTICE("Loading Bouts..."))
+            rows = self.valid_rows(bouts_data, self.bout_row, "Bout", "bout_id")
+            counts = self.upsert_in_batches(Bout, ingest.BOUT_COLUMNS, rows, batch_size, "Bout", self.valid_bouts)
+            self.report("Bout", *counts)
 
-            for bout in bouts_data:
+    def handle(self, *args, **options):
+        # Note: Load order may be important here.
+        #    Only Bouts have foreign keys to Fighters and Events, so it needs to be loaded last.
+        #    Fighters have no FK references, so It'll go first.
+        #    Events do have a list of Bouts, but they are not FK's, just a list of strings that reference Bout IDs.
 
+        json_paths = [options['events_json'], options['fighters_json'], options['bouts_json']]
+        if options['zip'] and any(json_paths):
+            raise CommandError("Pass either --zip or the three JSON file paths, not both.")
+        if not options['zip'] and not all(json_paths):
+            raise CommandError("Pass the events, fighters and bouts JSON file paths (or a zip archive with --zip).")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        self.changed_rows = 0
+        with ExitStack() as stack:
+            archive = None
+            if options['zip']:
                 try:
-                    event = Event.objects.get(event_id=bout["event_id"])
-                    # Ensure fighter IDs are valid
-                    fighter_1 = Fighter.objects.get(fighter_id=bout["fighter_1_id"])
-                    fighter_2 = Fighter.objects.get(fighter_id=bout["fighter_2_id"])
-    
-                    # Let's choose a winner, if there is one.
-                    winning_fighter = None
-                    if bout["winning_fighter_id"]: # if there is a winning fighter
-                        if fighter_1.fighter_id == bout["winning_fighter_id"]:
-                            winning_fighter = fighter_1
-                        elif fighter_2.fighter_id == bout["winning_fighter_id"]:
-                            winning_fighter = fighter_2
-
-                    bout_obj, created = Bout.objects.update_or_create(
-                        bout_id=bout["bout_id"],
-                        defaults={
-                            "event": event,
-                            "fighter_1": fighter_1,
-                            "fighter_2": fighter_2,
-                            "winning_fighter": winning_fighter,
-                            "result": bout["result"],
-                            "method": bout["method"],
-                            "ending_round": bout["ending_round"],
-                            "ending_time": bout["ending_time"],
-                            "time_format": bout["time_format"],
-                            "referee": bout["referee"],
-                            "details": bout["details"]
-                        }
-                    )
-                    if created:
-                        logger.info(f"Created Bout: {bout_obj.bout_id}")
-                    else:
-                        logger.debug(f"Updated Bout: {bout_obj.bout_id}")
-                except Fighter.DoesNotExist as e:
-                    logger.error(f"Fighter does not exist for Bout {bout['bout_id']}: {e}")
-                except Event.DoesNotExist as e:
-                    logger.error(f"Event does not exist for Bout {bout['bout_id']}: {e}")
-                except IntegrityError as e:
-                    logger.error(f"Database integrity error for Bout {bout['bout_id']}: {e}")
-                except Exception as e:
-                    logger.error(f"Error processing Bout {bout['bout_id']}: {e}", exc_info=True)
-        
-        self.stdout.write('Successfully loaded UFC data into the database.')
\ No newline at end of file
+                    archive = stack.enter_context(zipfile.ZipFile(options['zip']))
+                except (FileNotFoundError, zipfile.BadZipFile) as e:
+                    raise CommandError(f"Could not open zip archive {options['zip']}: {e}")
+
+            # Records are stream-parsed lazily, each file is only opened when its turn comes
+            fighters_data = self.iter_json_records('fighters', options['fighters_json'], archive)
+            events_data = self.iter_json_records('events', options['events_json'], archive)
+            bouts_data = self.iter_json_records('bouts', options['bouts_json'], archive)
+
+            if options['bulk']:
+                self.bulk_load(fighters_data, events_data, bouts_data)
+            else:
+                self.batched_load(fighters_data, events_data, bouts_data, options['batch_size'])
+
+        # Cached fighter/event API responses are invalidated, unless the data was already up to date
+        if self.changed_rows:
+            bump_dataset_version()
+
+        self.stdout.write('Successfully loaded UFC data into the database.')
@@ -0,0 +1,182 @@
+"""
+Head-to-head matchups for the matchmaker.
+
+Win probabilities use the standard Elo expectation (elo_engine.expected_win_chance), computed
+with NumPy over whole arrays of ratings at once: pairs of equal-length arrays give one
+probability per pair, and broadcasting a column against a row gives every pairing at once.
+
+Rating curves are read from the BoutElo table (one query for both fighters) and evenly
+downsampled, so a chart never gets more than a fixed number of points per fighter.
+A single fighter's rating history can also be windowed by date and downsampled with
+largest-triangle-three-buckets, which keeps the peaks and dips an even pick would skip.
+
+Matchup matrices (every pairing among a division's top N fighters) are one broadcasted call,
+so even a few hundred fighters take a single array operation rather than N^2 lookups.
+"""
+import numpy as np
+
+from .models import Fighter, BoutElo
+
+
+# Most points returned per fighter's rating curve
+CURVE_POINTS = 50
+
+# Points in a rating history chart: default and most allowed
+HISTORY_DEFAULT_POINTS = 100
+HISTORY_MAX_POINTS = 500
+
+# Fighters in a matchup matrix: default and most allowed
+MATRIX_DEFAULT_SIZE = 25
+MATRIX_MAX_SIZE = 300
+
+# Decimals kept in a matrix, four is plenty for a card and keeps a 300x300 response well under a megabyte
+MATRIX_PRECISION = 4
+
+# Divisions by weight limit (lb), lightest first. Fighters don't have a division of their own, only the weight
+# they were listed at, so each fighter goes in the lightest division whose limit that weight fits under
+WEIGHT_CLASSES = {
+    'strawweight': 115,
+    'flyweight': 125,
+    'bantamweight': 135,
+    'featherweight': 145,
+    'lightweight': 155,
+    'welterweight': 170,
+    'middleweight': 185,
+    'light-heavyweight': 205,
+    'heavyweight': None, # everyone above light heavyweight
+}
+
+
+def expected_win_chances(fighter_elos, opponent_elos):
+    """ Vectorized elo_engine.expected_win_chance: each fighter's chance (0-1) of beating the opponent at the same position
+
+    Accepts anything NumPy can broadcast, e.g. two lists of pairs, or
+    `expected_win_chances(elos[:, None], elos[None, :])` for every pairing.
+    """
+
+    fighter_elos = np.asarray(fighter_elos, dtype=np.float64)
+    opponent_elos = np.asarray(opponent_elos, dtype=np.float64)
+    return 1.0 / (1.0 + np.power(10.0, (opponent_elos - fighter_elos) / 400.0))
+
+
+def downsample_evenly(points, max_points=CURVE_POINTS):
+    """ Keeps at most `max_points` evenly spaced points (always the first and last one) """
+
+    if len(points) <= max_points:
+        return list(points)
+    keep = np.unique(np.linspace(0, len(points) - 1, max_points).round().astype(np.intp))
+    return [points[index] for index in keep.tolist()]
+
+
+def largest_triangle_three_buckets(xs, ys, max_points):
+    """ Indices of at most `max_points` points that keep the shape of a line chart (always the first and last one)
+
+    Largest-triangle-three-buckets (Steinarsson, 2013): the points between the ends are split into
+    max_points - 2 buckets, and each bucket keeps the point forming the largest triangle with the point kept
+    before it and the average of the next bucket. Peaks and dips survive, where an even pick may step over them.
+    """
+
+    count = len(xs)
+    if count <= max_points:
+        return list(range(count))
+    if max_points < 3:
+        return [0, count - 1][:max_points]
+
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    # Bucket boundaries over the points between the ends, every bucket holds at least one point
+    edges = np.linspace(1, count - 1, max_points - 1).astype(np.intp).tolist() + [count]
+
+    kept = [0]
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The next bucket's average (the last point, for the last bucket) is the triangle's third corner
+        next_start, next_end = (end, edges[bucket + 2]) if bucket < max_points - 3 else (count - 1, count)
+        next_x, next_y = xs[next_start:next_end].mean(), ys[next_start:next_end].mean()
+
+        previous = kept[-1]
+        areas = np.abs(
+            (xs[previous] - next_x) * (ys[start:end] - ys[previous])
+            - (xs[previous] - xs[start:end]) * (next_y - ys[previous])
+        )
+        kept.append(start + int(np.argmax(areas)))
+
+    kept.append(count - 1)
+    return kept
+
+
+def rating_history(fighter_id, start=None, end=None, max_points=HISTORY_DEFAULT_POINTS):
+    """ A fighter's rating after each bout between `start` and `end` (dates, both optional and inclusive), oldest first
+
+    Returns {"total_points": bouts in the window, "points": [{"date", "elo"}, ...]}, with the points downsampled
+    to at most `max_points` (see largest_triangle_three_buckets). One query, answered from bout_elo_fighter_date_idx.
+    """
+
+    snapshots = BoutElo.objects.filter(fighter_id=fighter_id)
+    if start is not None:
+        snapshots = snapshots.filter(event_date__gte=start)
+    if end is not None:
+        snapshots = snapshots.filter(event_date__lte=end)
+    rows = list(snapshots.order_by('event_date', 'fight_number').values_list('event_date', 'ending_elo'))
+
+    # Charts plot against time, so dates (as day numbers) are the x axis, not the fight number
+    kept = largest_triangle_three_buckets(
+        [event_date.toordinal() for event_date, ending_elo in rows],
+        [ending_elo for event_date, ending_elo in rows],
+        max_points,
+    )
+    return {
+        "total_points": len(rows),
+        "points": [{"date": rows[index][0].strftime("%Y-%m-%d"), "elo": rows[index][1]} for index in kept],
+    }
+
+
+def rating_curves(fighter_ids, max_points=CURVE_POINTS):
+    """ Returns {fighter_id: [{"date", "elo"}, ...]} (rating after each bout, oldest first) in one query """
+
+    curves = {fighter_id: [] for fighter_id in fighter_ids}
+    snapshots = BoutElo.objects.filter(fighter_id__in=fighter_ids).order_by('fighter_id', 'fight_number')
+    for fighter_id, event_date, ending_elo in snapshots.values_list('fighter_id', 'event_date', 'ending_elo'):
+        curves[fighter_id].append({"date": event_date.strftime("%Y-%m-%d"), "elo": ending_elo})
+
+    return {fighter_id: downsample_evenly(points, max_points) for fighter_id, points in curves.items()}
+
+
+def compare(fighter_a, fighter_b, max_points=CURVE_POINTS):
+    """ Returns fighter_a's chances of beating fighter_b (now, and both at their peak) plus both rating curves """
+
+    # Current rating vs. current rating, and prime vs. prime, as one batch of pairs
+    win_probability, peak_win_probability = expected_win_chances(
+        [fighter_a.elo, fighter_a.peak_elo],
+        [fighter_b.elo, fighter_b.peak_elo],
+    ).tolist()
+
+    return {
+        "win_probability": win_probability,
+        "peak_win_probability": peak_win_probability,
+        "curves": rating_curves([fighter_a.fighter_id, fighter_b.fighter_id], max_points),
+    }
+
+
+def weight_class_fighters(weight_class):
+    """ Fighters listed in a division's weight range (see WEIGHT_CLASSES), highest current rating first """
+
+    limits = list(WEIGHT_CLASSES.values())
+    upper_limit = WEIGHT_CLASSES[weight_class]
+    position = list(WEIGHT_CLASSES).index(weight_class)
+    lower_limit = limits[position - 1] if position else None
+
+    fighters = Fighter.objects.filter(weight_lb__isnull=False)
+    if lower_limit is not None:
+        fighters = fighters.filter(weight_lb__gt=lower_limit)
+    if upper_limit is not None:
+        fighters = fighters.filter(weight_lb__lte=upper_limit)
+    return fighters.order_by('-elo', 'fighter_id')
+
+
+def win_probability_matrix(elos):
+    """ N x N matrix where [i][j] is fighter i's chance of beating fighter j (0.5 on the diagonal), as nested lists """
+
+    elos = np.asarray(elos, dtype=np.float64)
+    matrix = expected_win_chances(elos[:, np.newaxis], elos[np.newaxis, :])
+    return np.round(matrix, MATRIX_PRECISION).tolist()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_fighter_elo_fighter_elo_history_fighter_peak_elo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bout',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='fighter',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 04:28
+
+import django.db.models.deletion
+from datetime import date
+from django.db import migrations, models
+
+
+def backfill_bout_elos(apps, schema_editor):
+    """ Builds BoutElo rows from the elo_history already stored on each fighter (no need to re-run `elo`) """
+    Fighter = apps.get_model('api', 'Fighter')
+    Bout = apps.get_model('api', 'Bout')
+    BoutElo = apps.get_model('api', 'BoutElo')
+
+    bout_ids = set(Bout.objects.values_list('bout_id', flat=True))
+    fighter_ids = set(Fighter.objects.values_list('fighter_id', flat=True))
+    histories = {}
+    for fighter_id, history in Fighter.objects.exclude(elo_history=[]).values_list('fighter_id', 'elo_history'):
+        # `elo` used to append to elo_history without clearing it, so re-runs repeated every bout: keep the last entry per bout
+        history = {entry['bout_id']: entry for entry in history}.values()
+        histories[fighter_id] = [
+            entry for entry in history if entry['bout_id'] in bout_ids and entry['opponent_id'] in fighter_ids
+        ]
+    # (bout_id, fighter_id) -> starting Elo, to work out each side's pre-fight win probability
+    starting_elos = {
+        (entry['bout_id'], fighter_id): entry['starting_elo']
+        for fighter_id, history in histories.items() for entry in history
+    }
+
+    snapshots = []
+    for fighter_id, history in histories.items():
+        for fight_number, entry in enumerate(history, start=1):
+            opponent_elo = starting_elos.get((entry['bout_id'], entry['opponent_id']), entry['starting_elo'])
+            snapshots.append(BoutElo(
+                bout_id=entry['bout_id'],
+                fighter_id=fighter_id,
+                opponent_id=entry['opponent_id'],
+                event_date=date.fromisoformat(entry['date']),
+                fight_number=fight_number,
+                starting_elo=entry['starting_elo'],
+                ending_elo=entry['ending_elo'],
+                win_probability=1.0 / (1 + 10 ** ((opponent_elo - entry['starting_elo']) / 400.0)),
+            ))
+    BoutElo.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_bout_content_hash_event_content_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoutElo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_date', models.DateField()),
+                ('fight_number', models.PositiveIntegerField()),
+                ('starting_elo', models.FloatField()),
+                ('ending_elo', models.FloatField()),
+                ('win_probability', models.FloatField()),
+                ('bout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elo_snapshots', to='api.bout')),
+                ('fighter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elo_snapshots', to='api.fighter')),
+                ('opponent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.fighter')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fighter', 'event_date', 'fight_number'], name='bout_elo_fighter_date_idx'), models.Index(fields=['event_date'], name='bout_elo_event_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bout', 'fighter'), name='unique_bout_elo_per_fighter')],
+            },
+        ),
+        migrations.RunPython(backfill_bout_elos, migrations.RunPython.noop),
+    ]
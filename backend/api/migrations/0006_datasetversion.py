@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_boutelo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stamp', models.CharField(max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 04:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_datasetversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('name', config='english', weight='A'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddField(
+            model_name='fighter',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('nickname', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fighter',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='fighter_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 04:39
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_search_vectors'),
+    ]
+
+    operations = [
+        # gin_trgm_ops comes from pg_trgm (part of PostgreSQL's standard contrib modules)
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='fighter',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='fighter_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='fighter',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['nickname'], name='fighter_nickname_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_fighter_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['-date', '-event_id'], name='event_date_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fighter',
+            index=models.Index(fields=['-peak_elo', '-fighter_id'], name='fighter_peak_elo_keyset_idx'),
+        ),
+    ]
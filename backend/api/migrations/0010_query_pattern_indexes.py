@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='boutelo',
+            name='bout',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='elo_snapshots', to='api.bout'),
+        ),
+        migrations.AlterField(
+            model_name='boutelo',
+            name='fighter',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='elo_snapshots', to='api.fighter'),
+        ),
+        migrations.AddIndex(
+            model_name='fighter',
+            index=models.Index(condition=models.Q(('weight_lb__isnull', False)), fields=['weight_lb', '-elo'], name='fighter_weight_elo_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 04:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='fighter',
+            name='elo_history',
+        ),
+    ]
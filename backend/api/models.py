@@ -1,6 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+
+# Text search configuration for the stored search vectors (queries must use the same one)
+SEARCH_CONFIG = 'english'
 
 class Note(models.Model):
     title = models.CharField(max_length=64)
@@ -18,6 +23,23 @@ class Event(models.Model):
     location = models.CharField(max_length=255)
     bout_order = ArrayField(models.CharField(max_length=64), blank=True, default=list)
 
+    # SHA-256 of the scraped JSON record, so load_json_data can skip rows that haven't changed
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+
+    # Full-text search document, computed by PostgreSQL whenever the row is written (ORM or COPY ingest)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('name', weight='A', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='event_search_vector_idx'),
+            # Keyset pagination of the events list (see api/pagination.py)
+            models.Index(fields=['-date', '-event_id'], name='event_date_keyset_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -39,10 +61,32 @@ class Fighter(models.Model):
 
     # https://docs.djangoproject.com/en/5.2/ref/models/fields/#default 
     # cannot default simply to default=list, as a list is mutable. so we need to use a callable
+    # (the elo_history column itself was replaced by the BoutElo table, but migration 0003 still references this default)
     def elo_history_default():
         return []
-        
-    elo_history = models.JSONField(default=elo_history_default)
+
+    # SHA-256 of the scraped JSON record, so load_json_data can skip rows that haven't changed
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+
+    # Full-text search document (name ranks above nickname), computed by PostgreSQL whenever the row is written
+    search_vector = models.GeneratedField(
+        expression=SearchVector('name', weight='A', config=SEARCH_CONFIG) + SearchVector('nickname', weight='B', config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='fighter_search_vector_idx'),
+            # Trigram indexes (pg_trgm) for typo-tolerant name/nickname matching in the matchmaker autocomplete
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='fighter_name_trgm_idx'),
+            GinIndex(fields=['nickname'], opclasses=['gin_trgm_ops'], name='fighter_nickname_trgm_idx'),
+            # Keyset pagination of the fighters list (see api/pagination.py)
+            models.Index(fields=['-peak_elo', '-fighter_id'], name='fighter_peak_elo_keyset_idx'),
+            # A division's top fighters by current rating (matchmaker matrix, see api/matchups.py).
+            # Fighters without a listed weight are never in a division, so they're left out of the index
+            models.Index(fields=['weight_lb', '-elo'], name='fighter_weight_elo_idx', condition=models.Q(weight_lb__isnull=False)),
+        ]
 
     def __str__(self):
         return self.name
@@ -65,9 +109,59 @@ class Bout(models.Model):
     referee = models.CharField(max_length=255, null=True, blank=True)
     details = models.CharField(max_length=255, null=True, blank=True)
 
+    # SHA-256 of the scraped JSON record, so load_json_data can skip rows that haven't changed
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+
     def __str__(self):
         return f"{self.fighter_1.name} vs {self.fighter_2.name} at {self.event.name}"
     
+class BoutElo(models.Model):
+    """
+    Per-bout Elo snapshot for one fighter, written by the `elo` management command.
+    This is each fighter's rating history (one row per bout), kept out of the Fighter row so
+    list pages and rating updates never read or rewrite a fighter's whole career.
+    """
+    # No single-column indexes on bout/fighter: the unique constraint (bout, fighter) and bout_elo_fighter_date_idx
+    # both start with them, so they answer the same lookups (and the elo command has two fewer indexes to write)
+    bout = models.ForeignKey(Bout, on_delete=models.CASCADE, related_name='elo_snapshots', db_index=False)
+    fighter = models.ForeignKey(Fighter, on_delete=models.CASCADE, related_name='elo_snapshots', db_index=False)
+    opponent = models.ForeignKey(Fighter, on_delete=models.CASCADE, related_name='+')
+
+    event_date = models.DateField() # copied from the bout's event, so it can be indexed here
+    fight_number = models.PositiveIntegerField() # 1 for the fighter's first rated bout, 2 for the next, etc.
+
+    starting_elo = models.FloatField()
+    ending_elo = models.FloatField()
+    win_probability = models.FloatField() # the fighter's pre-fight chance of winning, based on both starting Elos
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bout', 'fighter'], name='unique_bout_elo_per_fighter'),
+        ]
+        indexes = [
+            models.Index(fields=['fighter', 'event_date', 'fight_number'], name='bout_elo_fighter_date_idx'),
+            models.Index(fields=['event_date'], name='bout_elo_event_date_idx'),
+        ]
+
+    @property
+    def elo_change(self):
+        return self.ending_elo - self.starting_elo
+
+    def __str__(self):
+        return f"{self.fighter_id} in {self.bout_id}: {self.starting_elo:.0f} -> {self.ending_elo:.0f}"
+
+class DatasetVersion(models.Model):
+    """
+    Single-row stamp that changes every time `load_json_data` or `elo` modifies the data.
+    Cached API responses (and their ETags) are keyed by it, so one bump invalidates every cached page at once.
+    It lives in the database (not the cache) so a management command can invalidate the web server's local-memory cache.
+    """
+    stamp = models.CharField(max_length=32) # random, so a re-created database never reuses an old stamp
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stamp} ({self.updated_at:%Y-%m-%d %H:%M})"
+
 # class BoutFighter(models.Model):
     # This junction table is implicitly handled by Bout's fighter_1_id, fighter_2_id and winning_fighter.
     # I don't need a separate BoutFighter model with this JSON structure because
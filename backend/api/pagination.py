@@ -1,6 +1,129 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
 
-class TwentyItemsPagination(PageNumberPagination): # Changed class name
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class RowValue(Func):
+    # A parenthesized list of expressions, (a, b, ...), so whole keys can be compared at once
+    function = ''
+    output_field = Field()
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination on a unique composite key, e.g. ordering = ('-peak_elo', '-fighter_id').
+
+    Page-number pagination needs an OFFSET (the database still walks every skipped row) plus a COUNT(*)
+    on every request. Here the cursor holds the key of the row the page starts after, so every page is one
+    `WHERE (key) < (cursor) ORDER BY key LIMIT page_size + 1` query, answered from an index on the key: page 500
+    costs the same as page 1. The extra row tells whether there is a next page.
+
+    Every ordering field must sort in the same direction and the last one must be unique (the primary key).
+    Responses look like {"next": url, "previous": url, "results": [...]}, without a total count.
+    """
     page_size = 20
-    # page_size_query_param = 'page_size' # Allows client to specify page size (e.g., ?page_size=10)
-    max_page_size = 100 # Maximum page size allowed if client requests more
\ No newline at end of file
+    ordering = None
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        position, reverse = self.decode_cursor(cursor, queryset.model) if cursor else (None, False)
+
+        # Pages before the cursor are read in the opposite order, then flipped back
+        ordering = [field if self.descending == reverse else f'-{field}' for field in self.fields]
+        if position is not None:
+            queryset = queryset.filter(self.after_position(position, before=self.descending != reverse))
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def after_position(self, position, before):
+        """ Rows strictly past `position` in key order, as a row-value comparison: (a, b) < (x, y)
+
+        Postgres compares row values field by field, exactly like the ORDER BY, and answers the comparison
+        as an Index Cond on the key's index, so the scan starts right at the cursor (even when thousands of
+        rows tie on the first field, e.g. the fighters still at their starting peak_elo).
+        """
+        lookup = LessThan if before else GreaterThan
+        return lookup(RowValue(*(F(field) for field in self.fields)), RowValue(*(Value(value) for value in position)))
+
+    def position_of(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    def encode_cursor(self, position, reverse):
+        """ Opaque, URL-safe cursor for a row's key (dates as ISO strings), plus which way to read from it """
+
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        payload = json.dumps({'p': values, 'r': reverse}).encode('utf-8')
+        return replace_query_param(self.base_url, self.cursor_query_param, base64.urlsafe_b64encode(payload).decode('ascii'))
+
+    def decode_cursor(self, cursor, model):
+        """ Returns (position, reverse), with every value converted back by its model field. NotFound if malformed """
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            values, reverse = payload['p'], bool(payload['r'])
+            if len(values) != len(self.fields):
+                raise ValueError(values)
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, values)], reverse
+        except (ValueError, TypeError, KeyError, UnicodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+class FighterKeysetPagination(KeysetPagination):
+    # Highest peak rating first, fighter_id breaks ties (index: fighter_peak_elo_keyset_idx)
+    ordering = ('-peak_elo', '-fighter_id')
+
+class EventKeysetPagination(KeysetPagination):
+    # Most recent first, event_id breaks ties between events on the same day (index: event_date_keyset_idx)
+    ordering = ('-date', '-event_id')
@@ -0,0 +1,137 @@
+"""
+In-process prefix index for fighter-name autocomplete.
+
+Every fighter's normalized name and nickname (lowercase, accents and punctuation stripped) is
+stored in a sorted array once per word boundary ("kamaru usman", "usman"), so a typeahead query
+is a binary search for the first key starting with it, plus a short scan over the keys that do.
+No database query is needed to answer it.
+
+The index is built lazily on first use and rebuilt when the dataset version stamp changes
+(see api/caching.py). The stamp is checked at most every VERSION_CHECK_INTERVAL seconds, so
+requests in between don't touch the database at all.
+
+Prefixes only: misspelled names are left to the pg_trgm lookup (search.fighter_name_matches).
+"""
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+
+from .caching import dataset_version
+from .models import Fighter
+
+
+# Seconds between dataset stamp checks (0 checks on every request)
+VERSION_CHECK_INTERVAL = 10
+
+# Fields kept in memory for every fighter, same as FighterAutocompleteSerializer (minus the match score)
+FIGHTER_FIELDS = ['fighter_id', 'name', 'nickname', 'weight_lb', 'elo', 'peak_elo']
+
+
+def normalize(text):
+    """ Lowercases, strips accents and turns anything that isn't a letter or digit into single spaces """
+
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    characters = (
+        character.lower() if character.isalnum() else ' '
+        for character in decomposed if not unicodedata.combining(character)
+    )
+    return ' '.join(''.join(characters).split())
+
+
+def word_suffixes(text):
+    """ "the nigerian nightmare" -> ["the nigerian nightmare", "nigerian nightmare", "nightmare"] """
+
+    words = text.split()
+    return [' '.join(words[index:]) for index in range(len(words))]
+
+
+class FighterPrefixIndex:
+    """
+    Sorted (key, fighter) arrays over every word suffix of every fighter's name and nickname.
+    Immutable once built, so it can be shared between threads.
+    """
+
+    def __init__(self, fighters):
+        self.fighters = fighters # list of dicts with FIGHTER_FIELDS
+        entries = sorted(
+            (key, fighter_index, is_name)
+            for fighter_index, fighter in enumerate(fighters)
+            for field, is_name in (('name', True), ('nickname', False))
+            for key in word_suffixes(normalize(fighter[field]))
+        )
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+
+    @classmethod
+    def from_database(cls):
+        return cls(list(Fighter.objects.values(*FIGHTER_FIELDS)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, query, limit=10):
+        """ Returns up to `limit` fighter dicts with a name or nickname word starting with `query`, best match first
+
+        Each result gets a `similarity` (0-1): how much of the matched word(s) the query already covers,
+        so "jon" ranks Jon Jones (a whole word) above Jonathan Martinez. Ties go to the higher peak Elo.
+        """
+
+        query = normalize(query)
+        if not query:
+            return []
+
+        best_match = {} # fighter_index -> best (sort key, similarity) among its matching keys
+        position = bisect.bisect_left(self.keys, query)
+        while position < len(self.keys) and self.keys[position].startswith(query):
+            key, fighter_index, is_name = self.entries[position]
+            word_end = key.find(' ', len(query))
+            similarity = len(query) / (word_end if word_end != -1 else len(key))
+            fighter = self.fighters[fighter_index]
+            # Whole-word matches first, then names over nicknames, then the higher peak Elo
+            sort_key = (-similarity, not is_name, -(fighter['peak_elo'] or 0), fighter['fighter_id'])
+            if fighter_index not in best_match or sort_key < best_match[fighter_index][0]:
+                best_match[fighter_index] = (sort_key, similarity)
+            position += 1
+
+        top_matches = heapq.nsmallest(limit, best_match.items(), key=lambda item: item[1][0])
+        return [
+            dict(self.fighters[fighter_index], similarity=similarity)
+            for fighter_index, (sort_key, similarity) in top_matches
+        ]
+
+
+# Process-wide index, plus the dataset stamp it was built from
+_lock = threading.Lock()
+_index = None
+_index_stamp = None
+_stamp_checked_at = 0.0
+
+
+def fighter_prefix_index():
+    """ Returns the shared FighterPrefixIndex, (re)building it if the dataset stamp has changed """
+
+    global _index, _index_stamp, _stamp_checked_at
+
+    if _index is not None and time.monotonic() - _stamp_checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    with _lock:
+        stamp = dataset_version()
+        _stamp_checked_at = time.monotonic()
+        if _index is None or stamp != _index_stamp:
+            _index = FighterPrefixIndex.from_database()
+            _index_stamp = stamp
+        return _index
+
+
+def reset_fighter_prefix_index():
+    """ Drops the shared index, the next lookup rebuilds it (used by tests) """
+
+    global _index, _index_stamp, _stamp_checked_at
+
+    with _lock:
+        _index = None
+        _index_stamp = None
+        _stamp_checked_at = 0.0
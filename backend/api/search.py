@@ -0,0 +1,123 @@
+"""
+Top-K combined search over fighters and events.
+
+Both tables are ranked together in the database with a single UNION ALL query over their stored,
+GIN-indexed search vectors, ordered by (rank desc, type, id) and limited to one page. Only the
+rows on that page are then loaded and serialized, so a broad query like "UFC" costs the same as
+a narrow one.
+
+Pages are cursor (keyset) paginated: the cursor is the (type, id, rank) of the last result on the
+page, and the next page continues strictly after it in (rank desc, type, id) order. Each UNION
+branch has a constant type, so the keyset condition is applied inside each branch, where it can be
+combined with the index scan.
+
+Fighter-name autocomplete (the matchmaker) uses pg_trgm word similarity instead, answered from GIN
+trigram indexes on name and nickname, so partial and misspelled names ("kamaru usmen") still match.
+"""
+import base64
+import binascii
+import json
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
+from django.db.models import CharField, F, FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest
+from rest_framework.exceptions import NotFound
+
+from .models import Fighter, Event, SEARCH_CONFIG
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+# Most suggestions an autocomplete request returns
+AUTOCOMPLETE_LIMIT = 10
+
+# Result types, in the order they're listed when ranks tie
+SEARCH_TYPES = {
+    'event': Event,
+    'fighter': Fighter,
+}
+
+
+def encode_cursor(position):
+    """ Encodes a (type, id, rank) position as an opaque, URL-safe cursor string """
+
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """ Decodes a cursor back into a (type, id, rank) position, raising NotFound for anything malformed """
+
+    try:
+        result_type, result_id, rank = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if result_type not in SEARCH_TYPES or not isinstance(result_id, str):
+            raise ValueError(result_type)
+        return result_type, result_id, float(rank)
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise NotFound("Invalid cursor")
+
+
+def ranked_branch(result_type, search_query, after=None):
+    """ One side of the UNION: (type, result_id, rank) for every matching row of a model, after the cursor position """
+
+    model = SEARCH_TYPES[result_type]
+    queryset = model.objects.filter(search_vector=search_query).annotate(
+        type=Value(result_type, output_field=CharField()),
+        result_id=F('pk'),
+        # ts_rank returns a float4, which doesn't survive a round trip through Python floats exactly.
+        # As a float8 it does, so the rank in a cursor compares equal to the row it came from
+        rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+    )
+
+    if after is not None:
+        after_type, after_id, after_rank = after
+        # Continue strictly after (rank desc, type asc, id asc). The type is constant within a branch,
+        # so only rows with the same rank need the type/id tie-breaker.
+        if result_type > after_type:
+            queryset = queryset.filter(rank__lte=after_rank)
+        elif result_type == after_type:
+            queryset = queryset.filter(Q(rank__lt=after_rank) | Q(rank=after_rank, pk__gt=after_id))
+        else:
+            queryset = queryset.filter(rank__lt=after_rank)
+
+    return queryset.values_list('type', 'result_id', 'rank')
+
+
+def ranked_search_results(query, after=None, limit=DEFAULT_PAGE_SIZE):
+    """ Returns up to `limit` (type, id, rank) tuples for the best matches after the cursor position, in one query """
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG)
+    fighters, events = (ranked_branch(result_type, search_query, after) for result_type in ('fighter', 'event'))
+    return list(fighters.union(events, all=True).order_by('-rank', 'type', 'result_id')[:limit])
+
+
+def load_results(ranked_results):
+    """ Loads the rows for a page of ranked results, one pk__in query per type, keyed by (type, id) """
+
+    ids_by_type = {}
+    for result_type, result_id, rank in ranked_results:
+        ids_by_type.setdefault(result_type, []).append(result_id)
+
+    return {
+        (result_type, obj.pk): obj
+        for result_type, ids in ids_by_type.items()
+        for obj in SEARCH_TYPES[result_type].objects.filter(pk__in=ids).defer('search_vector')
+    }
+
+
+def fighter_name_matches(query):
+    """ Fighters whose name or nickname fuzzily matches `query`, best match first
+
+    `name %> query` / `nickname %> query` (pg_trgm word similarity) are answered from the GIN trigram
+    indexes. A prefix or a typo still matches as long as enough of its trigrams line up with some part
+    of the name (pg_trgm.word_similarity_threshold, 0.6 by default).
+    """
+
+    return Fighter.objects.filter(
+        Q(name__trigram_word_similar=query) | Q(nickname__trigram_word_similar=query)
+    ).annotate(
+        # GREATEST skips NULLs, so fighters without a nickname are scored on their name alone
+        similarity=Greatest(TrigramWordSimilarity(query, 'name'), TrigramWordSimilarity(query, 'nickname')),
+        # Breaks ties between fighters who all contain the query (e.g. "silva"): the closer the whole name, the better
+        name_similarity=TrigramSimilarity('name', query),
+    ).order_by('-similarity', '-name_similarity', '-peak_elo', 'fighter_id')
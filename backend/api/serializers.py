@@ -4,7 +4,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.db.models import Q
 
-from .models import Note, Event, Fighter, Bout
+from .models import Note, Event, Fighter, Bout, BoutElo
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -79,31 +79,69 @@ class SimpleEventSerializer(serializers.ModelSerializer):
 class FighterSerializer(serializers.ModelSerializer):
     """
     Serializer for the Fighter model.
-    Includes all fields.
+    Includes all fields, except the database-generated search vector.
     """
     class Meta:
         model = Fighter
-        fields = '__all__' # All fields including primary_key=True 'fighter_id'
+        exclude = ['search_vector'] # All other fields including primary_key=True 'fighter_id'
         # read_only_fields = ['fighter_id'] # If fighter_id is generated elsewhere
 
+def elo_history_from_snapshots(fighter):
+    """
+    Builds a fighter's elo_history (one entry per rated bout, oldest first) from their BoutElo rows.
+    Views prefetch `elo_snapshots` ordered by fight_number, so every fighter on a page costs one query in total.
+    """
+    return [
+        {
+            "date": snapshot.event_date.strftime("%Y-%m-%d"),
+            "bout_id": snapshot.bout_id,
+            "opponent_id": snapshot.opponent_id,
+            "starting_elo": snapshot.starting_elo,
+            "ending_elo": snapshot.ending_elo,
+            "elo_change": snapshot.elo_change,
+        }
+        for snapshot in fighter.elo_snapshots.all()
+    ]
+
+class FighterEloSerializer(FighterSerializer):
+    """
+    FighterSerializer whose elo_history is read from the BoutElo table (see elo_history_from_snapshots).
+    Used by the matchmaker chart.
+    """
+    elo_history = serializers.SerializerMethodField()
+
+    def get_elo_history(self, obj):
+        return elo_history_from_snapshots(obj)
+
+def expanded_fields(context):
+    """
+    Returns the set of names passed in the request's ?expand= query parameter (e.g. ?expand=fighters).
+    Used for opt-in, heavier representations of nested objects.
+    """
+    request = context.get('request')
+    if request is None:
+        return set()
+    return {name.strip() for name in request.query_params.get('expand', '').split(',') if name.strip()}
+
 class BoutSerializer(serializers.ModelSerializer):
     """
-    Serializer for the Bout model, with nested Fighter details.
+    Serializer for the Bout model.
+    Fighters are compact by default: id, name and their Elo going into / coming out of this bout.
+    Pass ?expand=fighters to nest the full FighterSerializer (every fighter column) instead.
     """
-    # Use nested serializers to display fighter details instead of just IDs
-    fighter_1 = FighterSerializer(read_only=True)
-    fighter_2 = FighterSerializer(read_only=True)
-    winning_fighter = FighterSerializer(read_only=True)
+    fighter_1 = serializers.SerializerMethodField()
+    fighter_2 = serializers.SerializerMethodField()
+    winning_fighter = serializers.SerializerMethodField()
     event = SimpleEventSerializer(read_only=True)
 
     class Meta:
         model = Bout
         fields = [
             'bout_id',
-            'event', # This will be the Event's primary key (event_id string)
-            'fighter_1', # Nested Fighter object
-            'fighter_2', # Nested Fighter object
-            'winning_fighter', # Nested Fighter object (can be null)
+            'event', # Nested SimpleEventSerializer
+            'fighter_1', # Compact (or nested, with ?expand=fighters) Fighter object
+            'fighter_2', # Compact (or nested, with ?expand=fighters) Fighter object
+            'winning_fighter', # Compact (or nested, with ?expand=fighters) Fighter object (can be null)
             'result',
             'method',
             'ending_round',
@@ -114,6 +152,37 @@ class BoutSerializer(serializers.ModelSerializer):
         ]
         # read_only_fields = ['bout_id'] # If bout_id is generated elsewhere
 
+    def get_fighter_1(self, bout):
+        return self.fighter_representation(bout, bout.fighter_1)
+
+    def get_fighter_2(self, bout):
+        return self.fighter_representation(bout, bout.fighter_2)
+
+    def get_winning_fighter(self, bout):
+        return self.fighter_representation(bout, bout.winning_fighter)
+
+    def fighter_representation(self, bout, fighter):
+        if fighter is None:
+            return None
+        if 'fighters' in expanded_fields(self.context):
+            return FighterSerializer(fighter, context=self.context).data
+
+        # Find this fighter's BoutElo snapshot (prefetched by the views; upcoming bouts don't have one yet)
+        snapshot = next((snapshot for snapshot in bout.elo_snapshots.all() if snapshot.fighter_id == fighter.fighter_id), None)
+        return {
+            'fighter_id': fighter.fighter_id,
+            'name': fighter.name,
+            'starting_elo': snapshot.starting_elo if snapshot else None,
+            'ending_elo': snapshot.ending_elo if snapshot else None,
+        }
+
+class EventBoutSerializer(BoutSerializer):
+    """
+    BoutSerializer for bouts nested inside their own event, so the event isn't repeated for every bout.
+    """
+    class Meta(BoutSerializer.Meta):
+        fields = [field for field in BoutSerializer.Meta.fields if field != 'event']
+
 class EventSerializer(serializers.ModelSerializer):
     """
     Serializer for the Event model, with nested Bout details.
@@ -146,9 +215,9 @@ class EventSerializer(serializers.ModelSerializer):
         # and maintain the order as specified in bout_order.
         
         # This is a common pattern for ordering by a list of IDs
-        # You would typically avoid N+1 queries here by prefetching,
-        # but for simplicity, we'll fetch them.
-        
+        # The event views prefetch event_bouts (with select_related fighters),
+        # so this reads from the prefetch cache instead of querying per event.
+
         # Get all related bouts first
         event_bouts_queryset = obj.event_bouts.all()
         
@@ -163,15 +232,19 @@ class EventSerializer(serializers.ModelSerializer):
                 ordered_bouts.append(bout)
         
         # Serialize the ordered list of Bout objects
-        return BoutSerializer(ordered_bouts, many=True, read_only=True, context=self.context).data
+        return EventBoutSerializer(ordered_bouts, many=True, read_only=True, context=self.context).data
 
 class FighterDetailSerializer(serializers.ModelSerializer):
     participated_bouts = serializers.SerializerMethodField()
+    elo_history = serializers.SerializerMethodField() # read from BoutElo rows, see elo_history_from_snapshots
 
     class Meta:
         model = Fighter
-        fighter_fields = [field.name for field in Fighter._meta.get_fields() if field.concrete]
-        fields = tuple(fighter_fields) + ('participated_bouts',)
+        fighter_fields = [field.name for field in Fighter._meta.get_fields() if field.concrete and not field.generated]
+        fields = tuple(fighter_fields) + ('elo_history', 'participated_bouts')
+
+    def get_elo_history(self, obj):
+        return elo_history_from_snapshots(obj)
 
     def get_participated_bouts(self, obj):
         """
@@ -179,10 +252,11 @@ class FighterDetailSerializer(serializers.ModelSerializer):
         """
         # Use Q objects to combine conditions for 'fighter_1' and 'fighter_2'
         # .select_related() pre-fetches related objects (Event, Fighter_1, Fighter_2, Winner)
-        # to avoid N+1 query problems when serializing bouts.
+        # to avoid N+1 query problems when serializing bouts. Pre-fight ratings come from the
+        # prefetched BoutElo rows.
         bouts_queryset = Bout.objects.filter(
             Q(fighter_1=obj) | Q(fighter_2=obj)
-        ).select_related('event', 'fighter_1', 'fighter_2', 'winning_fighter').order_by('-event__date') # Order by event date descending for most recent first
+        ).select_related('event', 'fighter_1', 'fighter_2', 'winning_fighter').prefetch_related('elo_snapshots').order_by('-event__date') # Order by event date descending for most recent first
 
         # Serialize the queryset using the (modified) BoutSerializer
         # 'many=True' because it's a list of bouts
@@ -222,6 +296,32 @@ class FighterSearchSerializer(serializers.ModelSerializer):
         model = Fighter
         fields = ['fighter_id', 'name', 'nickname', 'weight_lb', 'wins', 'losses', 'draws', 'elo', 'peak_elo']
 
+class FighterAutocompleteSerializer(serializers.ModelSerializer):
+    # Compact rows for typeahead suggestions (matchmaker), with how closely each one matched the query (0-1)
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Fighter
+        fields = ['fighter_id', 'name', 'nickname', 'weight_lb', 'elo', 'peak_elo', 'similarity']
+
+class FighterMatchupSerializer(serializers.ModelSerializer):
+    # Compact fighter for the head-to-head comparison, with a downsampled rating curve instead of the full elo_history.
+    # The curves come in through the context, {fighter_id: [{"date", "elo"}, ...]} (see matchups.rating_curves)
+    elo_curve = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Fighter
+        fields = ['fighter_id', 'name', 'nickname', 'weight_lb', 'wins', 'losses', 'draws', 'elo', 'peak_elo', 'elo_curve']
+
+    def get_elo_curve(self, obj):
+        return self.context['curves'].get(obj.fighter_id, [])
+
+class FighterRatingSerializer(serializers.ModelSerializer):
+    # Just who a fighter is and their ratings, e.g. the rows/columns of a matchup matrix
+    class Meta:
+        model = Fighter
+        fields = ['fighter_id', 'name', 'nickname', 'weight_lb', 'elo', 'peak_elo']
+
 class EventSearchSerializer(serializers.ModelSerializer):
     # This serializer will be used when a search query matches an Event.
     class Meta:
@@ -1,5 +1,29 @@
-from django.test import TestCase
-from django.db import connections
+import io
+import json
+import os
+import random
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from rest_framework.test import APIClient
+
+from .models import Event, Fighter, Bout, BoutElo, SEARCH_CONFIG
+from . import ingest
+from .management.commands import load_json_data
+from .caching import dataset_version, bump_dataset_version
+from .prefix_index import FighterPrefixIndex, normalize, reset_fighter_prefix_index
+from .elo_engine import EloReplay, INITIAL_ELO, expected_win_chance, rateable_event_cutoff
+from .matchups import expected_win_chances, downsample_evenly, largest_triangle_three_buckets
+from .elo_sweep import BoutHistory, sweep
 
 class DatabaseConnectionTest(TestCase):
 
@@ -19,6 +43,739 @@ class DatabaseConnectionTest(TestCase):
     #         self.assertTrue(result and result[0], "SSL connection is not active.")
 
 
+class EloReplayTest(SimpleTestCase):
+
+    # The replay engine works on unsaved model instances, so no database is needed
+    def setUp(self):
+        self.fighters = {
+            fighter_id: Fighter(fighter_id=fighter_id, name=fighter_id)
+            for fighter_id in ("a", "b", "c")
+        }
+        self.event = Event(event_id="e1", name="UFC Test", date=date(2020, 1, 1), bout_order=["b2", "b1"])
+        self.bouts = {
+            "b1": Bout(bout_id="b1", event_id="e1", fighter_1_id="a", fighter_2_id="b", winning_fighter_id="a"),
+            "b2": Bout(bout_id="b2", event_id="e1", fighter_1_id="a", fighter_2_id="c", winning_fighter_id=None),
+        }
+
+    def test_replay_event_in_fight_order(self):
+        replay = EloReplay(self.fighters)
+        replay.reset()
+        replay.replay_event(self.event, self.bouts)
+
+        a, b, c = (self.fighters[fighter_id] for fighter_id in ("a", "b", "c"))
+        a_history = [snapshot for snapshot in replay.snapshots if snapshot.fighter_id == "a"]
+        # bout_order lists the main event first, so b1 is fought before b2
+        self.assertEqual([snapshot.bout_id for snapshot in a_history], ["b1", "b2"])
+        self.assertEqual(a_history[1].starting_elo, a_history[0].ending_elo)
+        self.assertAlmostEqual(a_history[0].ending_elo, INITIAL_ELO + 15)
+        self.assertAlmostEqual(b.elo, INITIAL_ELO - 15)
+        self.assertAlmostEqual(a.elo + b.elo + c.elo, 3 * INITIAL_ELO) # rating points are only exchanged, never created
+        self.assertEqual(a.elo, a_history[-1].ending_elo)
+        self.assertEqual(a.peak_elo, max(snapshot.ending_elo for snapshot in a_history))
+        self.assertEqual(set(replay.changed_ids), {"a", "b", "c"})
+
+    def test_replay_collects_bout_elo_snapshots(self):
+        replay = EloReplay(self.fighters)
+        replay.reset()
+        replay.replay_event(self.event, self.bouts)
+
+        # One snapshot per fighter per bout, numbered in each fighter's fight order
+        a_snapshots = [snapshot for snapshot in replay.snapshots if snapshot.fighter_id == "a"]
+        self.assertEqual(len(replay.snapshots), 4)
+        self.assertEqual([snapshot.fight_number for snapshot in a_snapshots], [1, 2])
+        self.assertEqual([snapshot.fight_number for snapshot in replay.snapshots if snapshot.fighter_id == "b"], [1])
+        self.assertEqual(a_snapshots[1].opponent_id, "c")
+        # Both fighters start at the same rating, so it's a coin flip
+        self.assertAlmostEqual(a_snapshots[0].win_probability, 0.5)
+        self.assertGreater(a_snapshots[1].win_probability, 0.5)
+
+    def test_reset_makes_replay_repeatable(self):
+        replay = EloReplay(self.fighters)
+        replay.reset()
+        replay.replay_event(self.event, self.bouts)
+        first_run = {fighter_id: fighter.elo for fighter_id, fighter in self.fighters.items()}
+
+        replay.reset()
+        replay.replay_event(self.event, self.bouts)
+        self.assertEqual(first_run, {fighter_id: fighter.elo for fighter_id, fighter in self.fighters.items()})
+
+    def test_rewind_matches_full_replay(self):
+        later_event = Event(event_id="e2", name="UFC Test 2", date=date(2020, 2, 1), bout_order=["b3"])
+        later_bouts = {"b3": Bout(bout_id="b3", event_id="e2", fighter_1_id="b", fighter_2_id="c", winning_fighter_id="c")}
+
+        replay = EloReplay(self.fighters)
+        replay.reset()
+        replay.replay_event(self.event, self.bouts)
+        replay.replay_event(later_event, later_bouts)
+        full_run = {fighter_id: (fighter.elo, fighter.peak_elo) for fighter_id, fighter in self.fighters.items()}
+        snapshot_fields = lambda snapshot: (snapshot.bout_id, snapshot.fighter_id, snapshot.fight_number, snapshot.starting_elo, snapshot.ending_elo)
+        later_snapshots = [snapshot_fields(snapshot) for snapshot in replay.snapshots if snapshot.event_date >= later_event.date]
+        # What the elo command reads from the BoutElo table: every result before the cutoff, in fight order
+        earlier_results = sorted(
+            (snapshot.fighter_id, snapshot.fight_number, snapshot.ending_elo)
+            for snapshot in replay.snapshots if snapshot.event_date < later_event.date
+        )
+
+        # Rewinding to the second event only restores (and marks as changed) the fighters who fought there
+        replay = EloReplay(self.fighters)
+        replay.rewind((fighter_id, ending_elo) for fighter_id, fight_number, ending_elo in earlier_results)
+        self.assertEqual(replay.changed_ids, {"b", "c"})
+        self.assertEqual(self.fighters["b"].elo, INITIAL_ELO - 15)
+        replay.replay_event(later_event, later_bouts)
+        self.assertEqual(full_run, {fighter_id: (fighter.elo, fighter.peak_elo) for fighter_id, fighter in self.fighters.items()})
+        # The replayed bouts continue each fighter's fight numbering
+        self.assertEqual([snapshot_fields(snapshot) for snapshot in replay.snapshots], later_snapshots)
+
+
+class EloSweepTest(SimpleTestCase):
+
+    def test_sweep_matches_sequential_replay(self):
+        fighters = {fighter_id: Fighter(fighter_id=fighter_id, name=fighter_id) for fighter_id in ("a", "b", "c", "d")}
+        events = [
+            Event(event_id="e1", name="UFC Test", date=date(2020, 1, 1), bout_order=["b2", "b1"]),
+            Event(event_id="e2", name="UFC Test 2", date=date(2020, 2, 1), bout_order=["b4", "b3"]),
+        ]
+        bouts = {
+            "b1": Bout(bout_id="b1", fighter_1_id="a", fighter_2_id="b", winning_fighter_id="a"),
+            "b2": Bout(bout_id="b2", fighter_1_id="c", fighter_2_id="d", winning_fighter_id=None),
+            "b3": Bout(bout_id="b3", fighter_1_id="a", fighter_2_id="c", winning_fighter_id="c"),
+            "b4": Bout(bout_id="b4", fighter_1_id="b", fighter_2_id="a", winning_fighter_id="b"),
+        }
+
+        replay = EloReplay(fighters)
+        replay.reset()
+        for event in events:
+            replay.replay_event(event, bouts)
+
+        history = BoutHistory.from_events(events, bouts)
+        # b1/b2 share no fighters so they run together, the rest depend on earlier bouts
+        self.assertEqual([level.tolist() for level in history.levels], [[0, 1], [2], [3]])
+
+        results = sweep(history, k_factors=(30, 40), draw_values=(0.5,))
+        self.assertEqual(len(results), 2)
+        for index, fighter_id in enumerate(history.fighter_ids):
+            self.assertAlmostEqual(results[0]["ratings"][index], fighters[fighter_id].elo)
+        self.assertGreater(results[0]["log_loss"], 0)
+        self.assertGreater(results[0]["brier"], 0)
+
+
+class BulkLoadTest(TestCase):
+
+    fighters = [
+        {"fighter_id": "f1", "name": "Fighter One", "nickname": None, "wins": 1, "losses": 0, "draws": "0",
+         "height_in": 70, "weight_lb": 155, "reach_in": None, "stance": "Orthodox", "date_of_birth": "1990-01-01"},
+        {"fighter_id": "f2", "name": "Fighter Two", "nickname": "Two", "wins": 0, "losses": 1, "draws": "0",
+         "height_in": None, "weight_lb": 155, "reach_in": 72, "stance": None, "date_of_birth": None},
+    ]
+    events = [{"event_id": "e1", "name": "UFC 1", "date": "1993-11-12", "location": "Denver", "bout_order": ["b1"]}]
+    bouts = [
+        {"bout_id": "b1", "event_id": "e1", "fighter_1_id": "f1", "fighter_2_id": "f2", "winning_fighter_id": "f1",
+         "result": "Win/Loss", "method": "KO/TKO", "ending_round": "1", "ending_time": "0:26", "time_format": "No Time Limit",
+         "referee": "Joao Alberto Barreto", "details": "Punch"},
+        # points at an event that was never scraped, so it gets reported and skipped
+        {"bout_id": "b2", "event_id": "missing", "fighter_1_id": "f1", "fighter_2_id": "f2", "winning_fighter_id": None,
+         "result": None, "method": None, "ending_round": None, "ending_time": None, "time_format": None,
+         "referee": None, "details": None},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.paths = []
+        for name, records in (("events", self.events), ("fighters", self.fighters), ("bouts", self.bouts)):
+            path = os.path.join(self.directory.name, f"{name}.json")
+            with open(path, "w") as f:
+                json.dump(records, f)
+            self.paths.append(path)
+
+    def test_bulk_load_upserts_and_keeps_ratings(self):
+        call_command("load_json_data", *self.paths, bulk=True, stdout=io.StringIO())
+
+        self.assertEqual(Fighter.objects.count(), 2)
+        self.assertEqual(Event.objects.get(pk="e1").bout_order, ["b1"])
+        self.assertEqual(list(Bout.objects.values_list("bout_id", "winning_fighter_id")), [("b1", "f1")])
+        self.assertEqual(Fighter.objects.get(pk="f1").date_of_birth, date(1990, 1, 1))
+
+        # Re-ingesting updates changed records but leaves the Elo columns alone, and skips unchanged ones
+        Fighter.objects.filter(pk="f1").update(elo=1600)
+        fighters = [dict(self.fighters[0], name="Renamed Fighter"), self.fighters[1]]
+        with open(self.paths[1], "w") as f:
+            json.dump(fighters, f)
+        output = io.StringIO()
+        call_command("load_json_data", *self.paths, bulk=True, stdout=output)
+        fighter = Fighter.objects.get(pk="f1")
+        self.assertEqual((fighter.name, fighter.elo), ("Renamed Fighter", 1600))
+        # The stored search vector follows the new name (PostgreSQL regenerates it on every write, COPY path included)
+        self.assertEqual(list(Fighter.objects.filter(search_vector=SearchQuery("renamed", config=SEARCH_CONFIG)).values_list("pk", flat=True)), ["f1"])
+        self.assertIn("Fighter loading complete: 0 created, 1 updated, 1 unchanged.", output.getvalue())
+        self.assertIn("Bout loading complete: 0 created, 0 updated, 1 unchanged.", output.getvalue())
+
+    def test_bulk_load_skips_rows_the_tables_would_reject(self):
+        fighters = self.fighters + [
+            dict(self.fighters[0], fighter_id="f3", name=None),
+            dict(self.fighters[0], fighter_id="f4", stance="x" * 65),
+        ]
+        with open(self.paths[1], "w") as f:
+            json.dump(fighters, f)
+
+        # Each bad record is reported on its own, and the rest of the load goes through
+        with self.assertLogs("api.management.commands.load_json_data", level="ERROR") as logs:
+            call_command("load_json_data", *self.paths, bulk=True, stdout=io.StringIO())
+        self.assertEqual(set(Fighter.objects.values_list("pk", flat=True)), {"f1", "f2"})
+        self.assertEqual(list(Bout.objects.values_list("bout_id", flat=True)), ["b1"])
+        self.assertTrue(any("fighter f3" in line and "name is required" in line for line in logs.output))
+        self.assertTrue(any("fighter f4" in line and "stance" in line for line in logs.output))
+
+    def test_truncated_file_loads_nothing(self):
+        # The first record is complete, then the file is cut off in the middle of the second one
+        with open(self.paths[1], "w") as f:
+            f.write(json.dumps(self.fighters)[:-20])
+        stamp = dataset_version()
+
+        for options in ({"bulk": True}, {"batch_size": 1}):
+            with self.subTest(**options):
+                with self.assertRaisesMessage(CommandError, "Could not decode JSON from"):
+                    call_command("load_json_data", *self.paths, stdout=io.StringIO(), **options)
+                self.assertEqual(Fighter.objects.count(), 0)
+                self.assertEqual(Event.objects.count(), 0)
+                self.assertEqual(dataset_version(), stamp)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        # Rows that get past validation can still be rejected by the database (here, a win count that overflows integer)
+        command = load_json_data.Command()
+        rows = [
+            (f"f{index}", f"Fighter {index}", None, 2 ** 31 if index == 2 else 0, 0, "0", None, None, None, None, None)
+            for index in range(1, 4)
+        ]
+        with self.assertLogs("api.management.commands.load_json_data", level="ERROR") as logs:
+            counts = command.upsert_in_batches(Fighter, ingest.FIGHTER_COLUMNS, rows, 10, "Fighter")
+
+        # Only the bad row is lost, and it's the one that gets reported
+        self.assertEqual(counts, (2, 0, 0))
+        self.assertEqual(set(Fighter.objects.values_list("pk", flat=True)), {"f1", "f3"})
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Database error for Fighter f2", logs.output[0])
+
+    def test_batched_load_from_zip_archive(self):
+        archive_path = os.path.join(self.directory.name, "complete_data.zip")
+        with zipfile.ZipFile(archive_path, "w") as archive:
+            for path in self.paths:
+                archive.write(path, os.path.join("data", os.path.basename(path)))
+
+        call_command("load_json_data", zip=archive_path, batch_size=1, stdout=io.StringIO())
+
+        self.assertEqual(set(Fighter.objects.values_list("pk", flat=True)), {"f1", "f2"})
+        self.assertEqual(list(Bout.objects.values_list("bout_id", "event_id", "winning_fighter_id")), [("b1", "e1", "f1")])
+        stamp = dataset_version()
+
+        # Hashes match the COPY path, so a second load (either way) writes nothing, and cached responses stay valid
+        output = io.StringIO()
+        call_command("load_json_data", *self.paths, bulk=True, stdout=output)
+        self.assertIn("Fighter loading complete: 0 created, 0 updated, 2 unchanged.", output.getvalue())
+        self.assertEqual(dataset_version(), stamp)
+
+
+class BoutEloBackfillMigrationTest(TransactionTestCase):
+
+    before = [("api", "0004_bout_content_hash_event_content_hash_and_more")]
+    after = [("api", "0005_boutelo")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.addCleanup(self.migrate_to_latest)
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill_keeps_the_last_entry_per_bout(self):
+        apps = self.executor.loader.project_state(self.before).apps
+        Fighter = apps.get_model("api", "Fighter")
+        Event = apps.get_model("api", "Event")
+        Bout = apps.get_model("api", "Bout")
+
+        event = Event.objects.create(event_id="e1", name="UFC 1", date=date(2020, 1, 1), location="Las Vegas", bout_order=["b2", "b1"])
+        def entry(bout_id, opponent_id, starting_elo, ending_elo):
+            return {"bout_id": bout_id, "opponent_id": opponent_id, "date": "2020-01-01", "starting_elo": starting_elo, "ending_elo": ending_elo}
+        # `elo` ran twice, so both histories list every bout twice (the second run is the one to keep)
+        # and f1's history also has a bout that no longer exists
+        f1_history = [entry("b1", "f2", 1500, 1515), entry("gone", "f2", 1515, 1520), entry("b2", "f2", 1515, 1530)]
+        f2_history = [entry("b1", "f1", 1500, 1485), entry("b2", "f1", 1485, 1470)]
+        f1 = Fighter.objects.create(fighter_id="f1", name="Fighter 1", elo_history=f1_history + [dict(e, ending_elo=e["ending_elo"] + 1) for e in f1_history])
+        f2 = Fighter.objects.create(fighter_id="f2", name="Fighter 2", elo_history=f2_history * 2)
+        for bout_id in ("b1", "b2"):
+            Bout.objects.create(bout_id=bout_id, event=event, fighter_1=f1, fighter_2=f2, winning_fighter=f1)
+
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.after)
+
+        BoutElo = self.executor.loader.project_state(self.after).apps.get_model("api", "BoutElo")
+        snapshots = list(BoutElo.objects.order_by("fighter_id", "fight_number").values_list("fighter_id", "bout_id", "fight_number", "ending_elo"))
+        self.assertEqual(snapshots, [("f1", "b1", 1, 1516), ("f1", "b2", 2, 1531), ("f2", "b1", 1, 1485), ("f2", "b2", 2, 1470)])
+
+
+class EventViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        fighters = Fighter.objects.bulk_create([Fighter(fighter_id=f"f{index}", name=f"Fighter {index}") for index in range(12)])
+        for event_index in range(5):
+            bout_ids = [f"e{event_index}b{bout_index}" for bout_index in range(4)]
+            event = Event.objects.create(
+                event_id=f"e{event_index}", name=f"UFC {event_index}", date=date(2020, 1, 1 + event_index),
+                location="Las Vegas", bout_order=bout_ids
+            )
+            Bout.objects.bulk_create([
+                Bout(bout_id=bout_id, event=event, fighter_1=fighters[bout_index * 2], fighter_2=fighters[bout_index * 2 + 1],
+                     winning_fighter=fighters[bout_index * 2])
+                for bout_index, bout_id in enumerate(bout_ids)
+            ])
+
+    def setUp(self):
+        # Every test starts from the same (empty) dataset stamp, so cached pages from other tests must go
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="tester", password="not-a-real-password"))
+
+    def test_event_list_query_count_is_constant(self):
+        # dataset stamp + events + their bouts (fighters joined in) + their BoutElo snapshots,
+        # no matter how many events/bouts are on the page (keyset pagination, no page count)
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/events/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertEqual(len(response.data["results"][0]["ordered_bouts"]), 4)
+
+    def test_lists_page_through_keyset_cursors(self):
+        # Every fighter has the same peak rating and two events share a date, so pages must break ties on the id
+        Event.objects.create(event_id="e9", name="UFC 9", date=date(2020, 1, 3), location="Las Vegas")
+        Fighter.objects.filter(pk="f3").update(peak_elo=1600)
+
+        for url, key, page_size, expected in (
+            ("/api/fighters/", "fighter_id", 5, ["f3", "f9", "f8", "f7", "f6", "f5", "f4", "f2", "f11", "f10", "f1", "f0"]),
+            ("/api/events/", "event_id", 2, ["e4", "e3", "e9", "e2", "e1", "e0"]),
+        ):
+            with mock.patch("api.pagination.KeysetPagination.page_size", page_size):
+                response = self.client.get(url)
+                self.assertIsNone(response.data["previous"])
+                pages = [[item[key] for item in response.data["results"]]]
+                while response.data["next"]:
+                    with self.assertNumQueries(2 if url == "/api/fighters/" else 4): # the same for every page
+                        response = self.client.get(response.data["next"])
+                    pages.append([item[key] for item in response.data["results"]])
+                self.assertEqual(sum(pages, []), expected)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+                # ...and back again
+                while response.data["previous"]:
+                    response = self.client.get(response.data["previous"])
+                    self.assertEqual([item[key] for item in response.data["results"]], pages[-2])
+                    pages.pop()
+                self.assertEqual(len(pages), 1)
+
+        self.assertEqual(self.client.get("/api/fighters/", {"cursor": "not-a-cursor"}).status_code, 404)
+
+    def test_event_detail_query_count_is_constant(self):
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/events/e0/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([bout["bout_id"] for bout in response.data["ordered_bouts"]], ["e0b0", "e0b1", "e0b2", "e0b3"])
+
+    def test_bout_fighters_are_compact_unless_expanded(self):
+        BoutElo.objects.create(
+            bout_id="e0b0", fighter_id="f0", opponent_id="f1", event_date=date(2020, 1, 1), fight_number=1,
+            starting_elo=1500, ending_elo=1515, win_probability=0.5
+        )
+
+        bout = self.client.get("/api/events/e0/").data["ordered_bouts"][0]
+        self.assertNotIn("event", bout)
+        self.assertEqual(bout["fighter_1"], {"fighter_id": "f0", "name": "Fighter 0", "starting_elo": 1500, "ending_elo": 1515})
+        self.assertEqual(bout["fighter_2"]["ending_elo"], None)
+
+        bout = self.client.get("/api/events/e0/?expand=fighters").data["ordered_bouts"][0]
+        self.assertEqual(bout["fighter_1"]["fighter_id"], "f0")
+        self.assertIn("peak_elo", bout["fighter_1"])
+        self.assertNotIn("starting_elo", bout["fighter_1"])
+
+    def test_responses_are_cached_until_the_dataset_changes(self):
+        first = self.client.get("/api/events/e0/")
+        Event.objects.filter(pk="e0").update(name="Renamed")
+
+        # Served from the cache: only the dataset stamp is read
+        with self.assertNumQueries(1):
+            cached = self.client.get("/api/events/e0/")
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(cached["ETag"], first["ETag"])
+
+        # Clients that already have this version get a 304 without a body
+        not_modified = self.client.get("/api/events/e0/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+
+        # Both management commands bump the stamp, which invalidates every cached page and ETag
+        call_command("elo", stdout=io.StringIO())
+        fresh = self.client.get("/api/events/e0/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertEqual(fresh.data["name"], "Renamed")
+        self.assertNotEqual(fresh["ETag"], first["ETag"])
+
+    def test_elo_command_writes_bout_elo_snapshots(self):
+        call_command("elo", stdout=io.StringIO())
+        self.assertEqual(BoutElo.objects.count(), 40) # 5 events x 4 bouts x 2 fighters
+
+        # Fighter pages and the matchmaker read elo_history from BoutElo, one entry per bout ending at the current rating
+        fighter = Fighter.objects.get(pk="f0")
+        elo_history = self.client.get("/api/fighters/f0/").data["elo_history"]
+        self.assertEqual(len(elo_history), 5)
+        self.assertEqual(elo_history[-1]["ending_elo"], fighter.elo)
+        self.assertEqual(max(entry["ending_elo"] for entry in elo_history), fighter.peak_elo)
+        self.assertEqual(self.client.get("/api/matchmaker/", {"q": "Fighter 0"}).data["results"][0]["elo_history"], elo_history)
+
+        # An incremental run replaces only the snapshots it replays, and ends up where a full run does
+        full_run = dict(Fighter.objects.values_list("fighter_id", "peak_elo"))
+        full_snapshots = list(BoutElo.objects.order_by("bout_id", "fighter_id").values_list("bout_id", "fighter_id", "fight_number", "ending_elo"))
+        Fighter.objects.update(elo=1500, peak_elo=1500) # rewinding must restore ratings from BoutElo, not trust the fighter rows
+        call_command("elo", since=date(2020, 1, 3), stdout=io.StringIO())
+        self.assertEqual(BoutElo.objects.count(), 40)
+        self.assertEqual(dict(Fighter.objects.values_list("fighter_id", "peak_elo")), full_run)
+        self.assertEqual(list(BoutElo.objects.order_by("bout_id", "fighter_id").values_list("bout_id", "fighter_id", "fight_number", "ending_elo")), full_snapshots)
+        self.assertEqual(self.client.get("/api/fighters/f0/").data["elo_history"], elo_history)
+
+    def test_elo_skips_events_without_results(self):
+        # An event scraped before it took place: its bouts have no winner or result yet, and must not be rated as draws
+        event = Event.objects.create(event_id="e5", name="UFC 5", date=date(2020, 1, 10), location="Las Vegas", bout_order=["e5b0"])
+        Bout.objects.create(bout_id="e5b0", event=event, fighter_1_id="f0", fighter_2_id="f1")
+        self.assertEqual(rateable_event_cutoff(today=date(2020, 2, 1)), date(2020, 1, 5))
+        self.assertEqual(rateable_event_cutoff(today=date(2020, 1, 3)), date(2020, 1, 3))
+
+        call_command("elo", stdout=io.StringIO())
+        self.assertEqual(BoutElo.objects.count(), 40)
+        self.assertFalse(BoutElo.objects.filter(bout_id="e5b0").exists())
+
+
+class CombinedSearchViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Fighter.objects.create(fighter_id="f1", name="Kamaru Usman", nickname="The Nigerian Nightmare")
+        Fighter.objects.create(fighter_id="f2", name="Jon Jones", nickname="Bones")
+        Event.objects.create(event_id="e1", name="UFC 245: Usman vs. Covington", date=date(2019, 12, 14), location="Las Vegas")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="tester", password="not-a-real-password"))
+        # The prefix index is shared by the whole process, don't let it outlive another test's fighters
+        reset_fighter_prefix_index()
+
+    def test_search_matches_stored_vectors(self):
+        results = self.client.get("/api/search/", {"q": "usman"}).data["results"]
+        self.assertEqual({(result["type"], result.get("fighter_id") or result.get("event_id")) for result in results}, {("fighter", "f1"), ("event", "e1")})
+
+        # Nicknames are part of the fighter's search vector too
+        results = self.client.get("/api/search/", {"q": "bones"}).data["results"]
+        self.assertEqual([result["fighter_id"] for result in results], ["f2"])
+
+    def test_search_pages_through_merged_ranking(self):
+        Event.objects.bulk_create([
+            Event(event_id=f"usman{index}", name=f"UFC Fight Night: Usman vs. Opponent {index}", date=date(2020, 1, 1), location="Las Vegas")
+            for index in range(5)
+        ])
+
+        # Every page is one ranking query (fighters and events together) plus one query per result type on the page.
+        # All seven results tie on rank, and events sort before fighters, so the first page only holds events
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/search/", {"q": "usman", "page_size": 3})
+        seen = response.data["results"]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += response.data["results"]
+
+        ranks = [result["rank"] for result in seen]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual(len({(result["type"], result.get("fighter_id") or result.get("event_id")) for result in seen}), 7)
+        self.assertEqual(response.data["previous"], None)
+
+        self.assertEqual(self.client.get("/api/search/", {"q": "usman", "cursor": "not-a-cursor"}).status_code, 404)
+
+    @override_settings(FIGHTER_PREFIX_INDEX=False)
+    def test_matchmaker_autocomplete_tolerates_typos(self):
+        Fighter.objects.create(fighter_id="f3", name="Mason Jones", nickname="The Dragon")
+
+        suggestions = self.client.get("/api/matchmaker/autocomplete/", {"q": "kamaru usmen"}).data
+        self.assertEqual(suggestions[0]["fighter_id"], "f1")
+        self.assertNotIn("elo_history", suggestions[0])
+
+        # Both Joneses contain every trigram of "jon jones", the closer full name ranks first
+        suggestions = self.client.get("/api/matchmaker/autocomplete/", {"q": "jon jones"}).data
+        self.assertEqual([suggestion["fighter_id"] for suggestion in suggestions], ["f2", "f3"])
+
+        # Nicknames match too, and the matchmaker itself uses the same matching
+        self.assertEqual(self.client.get("/api/matchmaker/autocomplete/", {"q": "nigerian nightmare"}).data[0]["fighter_id"], "f1")
+        self.assertEqual(self.client.get("/api/matchmaker/", {"q": "kamaru usmen"}).data["results"][0]["fighter_id"], "f1")
+        self.assertEqual(self.client.get("/api/matchmaker/autocomplete/", {"q": ""}).data, [])
+
+    def test_prefix_index_matches_word_prefixes(self):
+        index = FighterPrefixIndex([
+            {"fighter_id": "f1", "name": "Kamaru Usman", "nickname": "The Nigerian Nightmare", "weight_lb": 170, "elo": 1600, "peak_elo": 1650},
+            {"fighter_id": "f2", "name": "Jon Jones", "nickname": "Bones", "weight_lb": 205, "elo": 1700, "peak_elo": 1750},
+            {"fighter_id": "f3", "name": "Jonathan Martinez", "nickname": None, "weight_lb": 135, "elo": 1550, "peak_elo": 1800},
+            {"fighter_id": "f4", "name": "José Aldo", "nickname": "Junior", "weight_lb": 145, "elo": 1650, "peak_elo": 1700},
+        ])
+
+        # A whole word beats a longer word with the same prefix, even with a lower peak Elo
+        self.assertEqual([match["fighter_id"] for match in index.search("jon")], ["f2", "f3"])
+        self.assertEqual(index.search("jon")[0]["similarity"], 1.0)
+        # Any word of the name or nickname, case, accents and punctuation ignored
+        self.assertEqual([match["fighter_id"] for match in index.search("nightm")], ["f1"])
+        self.assertEqual([match["fighter_id"] for match in index.search("JOSE")], ["f4"])
+        self.assertEqual([match["fighter_id"] for match in index.search("usman, kam")], [])
+        self.assertEqual(index.search("jo", limit=1)[0]["fighter_id"], "f2")
+        self.assertEqual(normalize("  Jiří  Procházka-Jr. "), "jiri prochazka jr")
+
+    def test_matchmaker_autocomplete_serves_prefixes_from_memory(self):
+        # First request builds the index (dataset stamp + one fighters query), later ones don't query at all
+        with self.assertNumQueries(2):
+            suggestions = self.client.get("/api/matchmaker/autocomplete/", {"q": "kamaru us"}).data
+        self.assertEqual([suggestion["fighter_id"] for suggestion in suggestions], ["f1"])
+        self.assertNotIn("elo_history", suggestions[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/matchmaker/autocomplete/", {"q": "bon"}).data[0]["fighter_id"], "f2")
+
+        # Typos aren't prefixes, those still go to the pg_trgm query
+        self.assertEqual(self.client.get("/api/matchmaker/autocomplete/", {"q": "kamaru usmen"}).data[0]["fighter_id"], "f1")
+
+        # New fighters show up once the dataset stamp changes
+        Fighter.objects.create(fighter_id="f3", name="Mason Jones", nickname="The Dragon")
+        bump_dataset_version()
+        with mock.patch("api.prefix_index.VERSION_CHECK_INTERVAL", 0):
+            self.assertEqual(self.client.get("/api/matchmaker/autocomplete/", {"q": "drag"}).data[0]["fighter_id"], "f3")
+
+
+class MatchmakerCompareTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usman = Fighter.objects.create(fighter_id="f1", name="Kamaru Usman", elo=1700, peak_elo=1800)
+        cls.jones = Fighter.objects.create(fighter_id="f2", name="Jon Jones", elo=1600, peak_elo=1900)
+        cls.covington = Fighter.objects.create(fighter_id="f3", name="Colby Covington")
+        event = Event.objects.create(event_id="e1", name="UFC 245", date=date(2019, 12, 14), location="Las Vegas", bout_order=["b1"])
+        bout = Bout.objects.create(bout_id="b1", event=event, fighter_1=cls.usman, fighter_2=cls.covington, winning_fighter=cls.usman)
+        BoutElo.objects.create(bout=bout, fighter=cls.usman, opponent=cls.covington, event_date=event.date, fight_number=1,
+                               starting_elo=1685, ending_elo=1700, win_probability=0.5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="tester", password="not-a-real-password"))
+
+    def test_vectorized_win_chances_match_the_elo_formula(self):
+        fighter_elos, opponent_elos = [1500, 1700, 1412.5], [1500, 1500, 1630]
+        self.assertEqual(
+            [round(chance, 12) for chance in expected_win_chances(fighter_elos, opponent_elos).tolist()],
+            [round(expected_win_chance(a, b), 12) for a, b in zip(fighter_elos, opponent_elos)],
+        )
+        # Broadcasting gives every pairing, and the two sides of a matchup always add up to 1
+        matrix = expected_win_chances([[1500], [1700]], [1500, 1700])
+        self.assertEqual(matrix.shape, (2, 2))
+        self.assertAlmostEqual(matrix[0, 1] + matrix[1, 0], 1.0)
+
+    def test_downsample_keeps_the_ends(self):
+        self.assertEqual(downsample_evenly([1, 2, 3], max_points=5), [1, 2, 3])
+        points = downsample_evenly(list(range(101)), max_points=11)
+        self.assertEqual(points, list(range(0, 101, 10)))
+
+    def test_compare_returns_both_fighters_and_win_chances(self):
+        with self.assertNumQueries(3): # dataset stamp, both fighters, both curves
+            response = self.client.get("/api/matchmaker/compare/", {"a": "f1", "b": "f2"})
+        data = response.data
+
+        self.assertEqual((data["a"]["fighter_id"], data["b"]["fighter_id"]), ("f1", "f2"))
+        self.assertAlmostEqual(data["win_probability"], expected_win_chance(1700, 1600))
+        self.assertAlmostEqual(data["peak_win_probability"], expected_win_chance(1800, 1900))
+        self.assertEqual(data["a"]["elo_curve"], [{"date": "2019-12-14", "elo": 1700}])
+        self.assertEqual(data["b"]["elo_curve"], [])
+        self.assertNotIn("elo_history", data["a"])
+
+        # Served from the cache the second time (only the dataset stamp is read)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/matchmaker/compare/", {"a": "f1", "b": "f2"}).data, data)
+
+        self.assertEqual(self.client.get("/api/matchmaker/compare/", {"a": "f1"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/matchmaker/compare/", {"a": "f1", "b": "nobody"}).status_code, 404)
+
+    def test_matrix_covers_every_pair_in_a_weight_class(self):
+        Fighter.objects.bulk_create([
+            Fighter(fighter_id="lw1", name="Islam Makhachev", weight_lb=155, elo=1800),
+            Fighter(fighter_id="lw2", name="Charles Oliveira", weight_lb=155, elo=1700),
+            Fighter(fighter_id="lw3", name="Dustin Poirier", weight_lb=154, elo=1650),
+            Fighter(fighter_id="ww1", name="Leon Edwards", weight_lb=170, elo=1750),
+        ])
+
+        with self.assertNumQueries(2): # dataset stamp, the division's top fighters
+            data = self.client.get("/api/matchmaker/matrix/", {"weight_class": "lightweight"}).data
+
+        # Highest rated first, anyone listed between featherweight and the 155 lb limit
+        self.assertEqual([fighter["fighter_id"] for fighter in data["fighters"]], ["lw1", "lw2", "lw3"])
+        matrix = data["win_probabilities"]
+        self.assertEqual([len(row) for row in matrix], [3, 3, 3])
+        self.assertEqual([matrix[index][index] for index in range(3)], [0.5, 0.5, 0.5])
+        self.assertAlmostEqual(matrix[0][2], expected_win_chance(1800, 1650), places=4)
+        self.assertAlmostEqual(matrix[0][2] + matrix[2][0], 1.0, places=4)
+
+        data = self.client.get("/api/matchmaker/matrix/", {"weight_class": "Lightweight", "size": 2}).data
+        self.assertEqual([fighter["fighter_id"] for fighter in data["fighters"]], ["lw1", "lw2"])
+        self.assertEqual(self.client.get("/api/matchmaker/matrix/", {"weight_class": "catchweight"}).status_code, 400)
+
+    def test_lttb_keeps_the_peaks(self):
+        self.assertEqual(largest_triangle_three_buckets([0, 1, 2], [5, 6, 7], max_points=5), [0, 1, 2])
+        # A flat line with one spike between evenly spaced picks: the spike survives, the ends are always kept
+        ys = [1500.0] * 101
+        ys[37] = 1800.0
+        kept = largest_triangle_three_buckets(list(range(101)), ys, max_points=11)
+        self.assertEqual(len(kept), 11)
+        self.assertEqual((kept[0], kept[-1]), (0, 100))
+        self.assertIn(37, kept)
+        self.assertNotIn(37, downsample_evenly(list(range(101)), max_points=11))
+        self.assertEqual(kept, sorted(set(kept)))
+
+    def test_elo_history_is_windowed_and_downsampled(self):
+        events = Event.objects.bulk_create([
+            Event(event_id=f"h{index}", name=f"UFC H{index}", date=date(2010, 1, 1) + timedelta(days=index * 90), bout_order=[f"hb{index}"])
+            for index in range(40)
+        ])
+        bouts = Bout.objects.bulk_create([
+            Bout(bout_id=f"hb{index}", event=event, fighter_1=self.jones, fighter_2=self.covington, winning_fighter=self.jones)
+            for index, event in enumerate(events)
+        ])
+        BoutElo.objects.bulk_create([
+            BoutElo(bout=bout, fighter=self.jones, opponent=self.covington, event_date=bout.event.date, fight_number=index + 1,
+                    starting_elo=1500 + index, ending_elo=1501 + index, win_probability=0.5)
+            for index, bout in enumerate(bouts)
+        ])
+
+        with self.assertNumQueries(3): # dataset stamp, the fighter, their history
+            data = self.client.get("/api/fighters/f2/elo-history/", {"points": 10}).data
+        self.assertEqual(data["total_points"], 40)
+        self.assertEqual(len(data["points"]), 10)
+        self.assertEqual(data["points"][0], {"date": "2010-01-01", "elo": 1501})
+        self.assertEqual(data["points"][-1]["elo"], 1540)
+
+        # Both ends of the window are inclusive
+        data = self.client.get("/api/fighters/f2/elo-history/", {"from": "2010-03-31", "to": "2010-09-28"}).data
+        self.assertEqual([point["elo"] for point in data["points"]], [1502, 1503, 1504])
+        self.assertEqual(data["total_points"], 3)
+
+        self.assertEqual(len(self.client.get("/api/fighters/f2/elo-history/").data["points"]), 40)
+        self.assertEqual(self.client.get("/api/fighters/f2/elo-history/", {"from": "2010-13-01"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/fighters/f2/elo-history/", {"from": "2012-01-01", "to": "2011-01-01"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/fighters/nobody/elo-history/").status_code, 404)
+
+
+class QueryPlanTest(TestCase):
+    """
+    Runs the main endpoints against a dataset about the size of the real one (thousands of fighters and bouts),
+    then EXPLAINs every query they made: none may read a whole table with a sequential scan.
+    """
+
+    # Fighter names are made up from syllables, so they're as varied as real ones (which matters to the trigram indexes)
+    SYLLABLES = ["ka", "ma", "ru", "us", "an", "jo", "nes", "is", "ra", "el", "de", "sa", "ya", "ol", "vei", "po", "ir",
+                 "hol", "lo", "way", "vol", "ko", "nov", "ski", "kha", "chev", "ed", "wards", "stri", "ck", "cov", "ing",
+                 "ton", "whit", "ta", "ker", "nur", "go", "med", "gre", "gor", "al", "do", "sil", "va", "pie", "rre", "cor"]
+
+    @classmethod
+    def setUpTestData(cls):
+        weights = [115, 125, 135, 145, 155, 170, 185, 205, 265, None]
+        generator = random.Random(2025)
+        made_up_name = lambda: "".join(generator.choices(cls.SYLLABLES, k=generator.randint(2, 4))).capitalize()
+        names = ["Kamaru Usman", "Israel Adesanya"] + [f"{made_up_name()} {made_up_name()}" for _ in range(3998)]
+        fighters = Fighter.objects.bulk_create([
+            Fighter(
+                fighter_id=f"f{index:05d}", name=name, weight_lb=weights[index % len(weights)],
+                elo=1400 + (index * 37) % 400, peak_elo=1500 + (index * 53) % 300,
+                # Every scraped column filled in, so rows are as wide as real ones (the planner weighs that)
+                nickname=made_up_name(), wins=index % 30, losses=index % 12, height_in=60 + index % 20, reach_in=60 + index % 25,
+                stance="Orthodox", date_of_birth=date(1980, 1, 1) + timedelta(days=index), content_hash=f"{index:064x}",
+            )
+            for index, name in enumerate(names)
+        ])
+
+        events, bouts, snapshots = [], [], []
+        for event_index in range(600):
+            event_id = f"e{event_index:04d}"
+            event_date = date(2000, 1, 1) + timedelta(days=event_index * 12)
+            bout_ids = [f"{event_id}b{bout_index:02d}" for bout_index in range(9)]
+            events.append(Event(event_id=event_id, name=f"UFC {event_index}", date=event_date, location="Las Vegas", bout_order=bout_ids))
+            for bout_index, bout_id in enumerate(bout_ids):
+                fighter_1, fighter_2 = fighters[(event_index * 18 + bout_index * 2) % len(fighters)], fighters[(event_index * 18 + bout_index * 2 + 1) % len(fighters)]
+                bouts.append(Bout(bout_id=bout_id, event_id=event_id, fighter_1=fighter_1, fighter_2=fighter_2, winning_fighter=fighter_1))
+                for fighter, opponent in ((fighter_1, fighter_2), (fighter_2, fighter_1)):
+                    snapshots.append(BoutElo(bout_id=bout_id, fighter=fighter, opponent=opponent, event_date=event_date,
+                                             fight_number=event_index + 1, starting_elo=1500, ending_elo=1510, win_probability=0.5))
+        Event.objects.bulk_create(events)
+        Bout.objects.bulk_create(bouts, batch_size=1000)
+        BoutElo.objects.bulk_create(snapshots, batch_size=1000)
+
+        # Fresh statistics, like autovacuum would have after a load. Vacuuming also moves the rows waiting in the
+        # GIN indexes' pending lists into the indexes proper (VACUUM can't run inside the test transaction, this can)
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "SELECT gin_clean_pending_list(indexrelid) FROM pg_index JOIN pg_class ON pg_class.oid = indexrelid "
+                "JOIN pg_am ON pg_am.oid = relam WHERE amname = 'gin' AND indrelid = 'api_fighter'::regclass"
+            )
+            cursor.execute("ANALYZE api_fighter, api_event, api_bout, api_boutelo")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="tester", password="not-a-real-password"))
+
+    def sequential_scans(self, sql):
+        """ Tables a query's plan reads with a sequential scan (single-row/bookkeeping tables aside) """
+
+        with connections['default'].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+
+        scanned, nodes = [], [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan" and node["Relation Name"].startswith("api_") and node["Relation Name"] != "api_datasetversion":
+                scanned.append(node["Relation Name"])
+            nodes.extend(node.get("Plans", []))
+        return scanned
+
+    @override_settings(FIGHTER_PREFIX_INDEX=False)
+    def test_main_endpoints_use_indexes(self):
+        for url, params in (
+            ("/api/events/", {}),
+            ("/api/events/e0300/", {}),
+            ("/api/fighters/", {}),
+            ("/api/fighters/f00042/", {}),
+            ("/api/fighters/f00042/elo-history/", {"from": "2005-01-01", "points": 20}),
+            ("/api/search/", {"q": "usman"}),
+            ("/api/matchmaker/", {"q": "kamaru usmen"}),
+            ("/api/matchmaker/autocomplete/", {"q": "israel adesanya"}),
+            ("/api/matchmaker/compare/", {"a": "f00001", "b": "f00002"}),
+            ("/api/matchmaker/matrix/", {"weight_class": "lightweight", "size": 50}),
+        ):
+            with CaptureQueriesContext(connections['default']) as context:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, url)
+
+            # The page after the first one too, its cursor condition must also be answered from the index
+            if isinstance(response.data, dict) and response.data.get("next") and "cursor=" in response.data["next"]:
+                with CaptureQueriesContext(connections['default']) as next_page_context:
+                    self.client.get(response.data["next"])
+                context.captured_queries.extend(next_page_context.captured_queries)
+
+            for query in context.captured_queries:
+                # Captured SQL has its parameters interpolated already, so it can be EXPLAINed as-is
+                with self.subTest(url=url, sql=query["sql"][:120]):
+                    self.assertEqual(self.sequential_scans(query["sql"]), [])
+
+
 # # Custom validation to ensure fighter_1_id and fighter_2_id refer to existing fighters.
 # # This is an alternative to having direct ForeignKey fields here, which can be complex
 # # when you only have IDs from JSON and aren't mapping them to Django PKs directly on load.
@@ -12,8 +12,12 @@ urlpatterns = [
 
     path('fighters/', views.FighterListView.as_view(), name='fighter-list'),
     path('fighters/<str:fighter_id>/', views.FighterDetailView.as_view(), name='fighter-detail'),
+    path('fighters/<str:fighter_id>/elo-history/', views.FighterEloHistoryView.as_view(), name='fighter-elo-history'),
 
     path('search/', views.CombinedSearchView.as_view(), name='combined-search'),
 
     path('matchmaker/', views.MatchmakerView.as_view(), name="matchmaker"),
+    path('matchmaker/autocomplete/', views.MatchmakerAutocompleteView.as_view(), name="matchmaker-autocomplete"),
+    path('matchmaker/compare/', views.MatchmakerCompareView.as_view(), name="matchmaker-compare"),
+    path('matchmaker/matrix/', views.MatchmakerMatrixView.as_view(), name="matchmaker-matrix"),
 ]
@@ -1,14 +1,21 @@
 from django.shortcuts import render
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import generics, status
 from rest_framework.response import Response
-from .serializers import UserSerializer, NoteSerializer, EventSerializer, FighterSerializer, FighterDetailSerializer, FighterSearchSerializer, EventSearchSerializer
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+from .serializers import UserSerializer, NoteSerializer, EventSerializer, FighterSerializer, FighterEloSerializer, FighterDetailSerializer, FighterSearchSerializer, FighterAutocompleteSerializer, FighterMatchupSerializer, FighterRatingSerializer, EventSearchSerializer
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import Note, Event, Fighter
-from .pagination import TwentyItemsPagination 
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from django.db.models import Q, F, Value, Case, When
+from .models import Note, Event, Fighter, Bout, BoutElo
+from .pagination import EventKeysetPagination, FighterKeysetPagination
+from .caching import CachedDatasetViewMixin
+from . import search
+from . import matchups
+from .prefix_index import fighter_prefix_index
+from django.db.models import Q, F, Value, Case, When, Prefetch
 from django.db.models.functions import Coalesce, Length
+from datetime import date
 
 User = get_user_model()
 
@@ -57,30 +64,82 @@ class CreateUserView(generics.CreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class EventListView(generics.ListAPIView):
-    queryset = Event.objects.all().order_by('-date') # order by 'date' in descending order (-date)
+# Bouts (and their fighters) for every event on the page are fetched up front: one query for the bouts,
+# joined to their fighters, plus one for their BoutElo snapshots, instead of one query per event plus one per fighter per bout (N+1).
+event_bouts_prefetch = Prefetch(
+    'event_bouts',
+    queryset=Bout.objects.select_related('fighter_1', 'fighter_2', 'winning_fighter').prefetch_related('elo_snapshots'),
+)
+
+# A fighter's BoutElo rows in career order, their elo_history
+fighter_elo_snapshots_prefetch = Prefetch('elo_snapshots', queryset=BoutElo.objects.order_by('fight_number'))
+
+class EventListView(CachedDatasetViewMixin, generics.ListAPIView):
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = TwentyItemsPagination
+    pagination_class = EventKeysetPagination # most recent first, ordered by (date, event_id) descending
+
+    def get_queryset(self):
+        return Event.objects.all().prefetch_related(event_bouts_prefetch)
 
-class EventDetailView(generics.RetrieveAPIView):
-    queryset = Event.objects.all()
+class EventDetailView(CachedDatasetViewMixin, generics.RetrieveAPIView):
     serializer_class = EventSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'pk'
 
-class FighterListView(generics.ListAPIView):
-    queryset = Fighter.objects.all().order_by('-peak_elo') # pulling all fighters with pagination... DB does not guarantee the order of records, so we want basically anything here. something, just not nothing
+    def get_queryset(self):
+        return Event.objects.all().prefetch_related(event_bouts_prefetch)
+
+class FighterListView(CachedDatasetViewMixin, generics.ListAPIView):
+    queryset = Fighter.objects.all() # pulling all fighters with pagination, which orders them by (peak_elo, fighter_id) descending
     serializer_class = FighterSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = TwentyItemsPagination
+    pagination_class = FighterKeysetPagination
 
-class FighterDetailView(generics.RetrieveAPIView):
-    queryset = Fighter.objects.all()
+class FighterDetailView(CachedDatasetViewMixin, generics.RetrieveAPIView):
+    queryset = Fighter.objects.prefetch_related(fighter_elo_snapshots_prefetch) # elo_history comes from BoutElo rows
     serializer_class = FighterDetailSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'fighter_id'
 
+class FighterEloHistoryView(CachedDatasetViewMixin, generics.RetrieveAPIView):
+    # Rating history for the charts, e.g. /api/fighters/<fighter_id>/elo-history/?from=2015-01-01&to=2020-12-31&points=100
+    # from/to (YYYY-MM-DD, inclusive) are optional. At most `points` points come back (default 100, at most 500),
+    # downsampled with largest-triangle-three-buckets, so a chart moves the same small payload however long the career
+    queryset = Fighter.objects.only('fighter_id')
+    permission_classes = [IsAuthenticated]
+    lookup_field = 'fighter_id'
+
+    def retrieve(self, request, *args, **kwargs):
+        fighter = self.get_object() # 404 for an unknown fighter
+        start, end = self.get_date('from'), self.get_date('to')
+        if start and end and start > end:
+            raise ValidationError({'from': "Must not be after 'to'."})
+
+        history = matchups.rating_history(fighter.fighter_id, start, end, self.get_points())
+        return Response({
+            'fighter_id': fighter.fighter_id,
+            'from': start,
+            'to': end,
+            **history,
+        })
+
+    def get_date(self, param):
+        value = self.request.query_params.get(param, '').strip()
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({param: "Expected a date, YYYY-MM-DD."})
+
+    def get_points(self):
+        try:
+            points = int(self.request.query_params['points'])
+        except (KeyError, ValueError):
+            return matchups.HISTORY_DEFAULT_POINTS
+        return max(2, min(points, matchups.HISTORY_MAX_POINTS))
+
 
 class CombinedSearchView(generics.ListAPIView):
     def get_queryset(self):
@@ -90,64 +149,53 @@ class CombinedSearchView(generics.ListAPIView):
     def list(self, request, *args, **kwargs):
         query = self.request.query_params.get('q', '').strip()
         results = []
+        next_url = None
 
         if query:
-            search_query_obj = SearchQuery(query, config='english') # Renamed to avoid conflict
-
-            # Search for Fighters
-            fighter_vector_definition = (
-                SearchVector('name', weight='A') +
-                SearchVector('nickname', weight='B')
-            )
-            # Annotate the queryset with the search vector (as 'search_document')
-            # and the rank (as 'rank') https://docs.djangoproject.com/en/5.2/ref/models/querysets/#annotate
-            fighter_queryset = Fighter.objects.annotate(
-                search_document=fighter_vector_definition,
-                rank=SearchRank(fighter_vector_definition, search_query_obj)
-            ).filter(search_document=search_query_obj) # Filter against the annotated 'search_document'
-
-            # https://docs.djangoproject.com/en/5.2/ref/models/database-functions/#coalesce
-            # Use Coalesce to treat null ranks as 0 for consistent ordering if no match
-            # This ensures items that don't match exactly but might be ordered by other criteria don't mess up sorting.
-            # However, since we're filtering (search_document=search_query_obj), all results will have a rank.
-            # Just ordering by -rank is usually sufficient here.
-            fighter_queryset = fighter_queryset.order_by('-rank').distinct()
-
-            for fighter in fighter_queryset: #[:20]: # Limit display to 20 fighters
-                serialized_data = FighterSearchSerializer(fighter).data
-                serialized_data['type'] = 'fighter'
-
-                # serialized_data['rank'] = fighter.rank # expose the rank for client-side sorting if wanted
+            # Fighters and events are ranked together (sort by relevance.. always!) in one UNION query over their stored,
+            # GIN-indexed search vectors, and only the top `page_size` rows after the cursor come back. See api/search.py
+            page_size = self.get_page_size()
+            cursor = self.request.query_params.get('cursor')
+            after = search.decode_cursor(cursor) if cursor else None
+
+            # Ask for one extra row, to know whether there is a next page
+            ranked_results = search.ranked_search_results(query, after, limit=page_size + 1)
+            has_next = len(ranked_results) > page_size
+            ranked_results = ranked_results[:page_size]
+
+            # Then load (and serialize) just this page's fighters and events
+            rows = search.load_results(ranked_results)
+            serializer_classes = {'fighter': FighterSearchSerializer, 'event': EventSearchSerializer}
+            for result_type, result_id, rank in ranked_results:
+                row = rows.get((result_type, result_id))
+                if row is None: # deleted since it was ranked
+                    continue
+                serialized_data = serializer_classes[result_type](row).data
+                serialized_data['type'] = result_type
+                serialized_data['rank'] = rank # expose the rank for client-side sorting if wanted
                 results.append(serialized_data)
 
+            if has_next:
+                next_url = replace_query_param(request.build_absolute_uri(), 'cursor', search.encode_cursor(ranked_results[-1]))
 
-            # search for events
-            event_vector_definition = SearchVector('name', weight='A')
-            event_queryset = Event.objects.annotate(
-                search_document=event_vector_definition,
-                rank=SearchRank(event_vector_definition, search_query_obj)
-            ).filter(search_document=search_query_obj) # Filter against the annotated 'search_document'
-            event_queryset = event_queryset.order_by('-rank').distinct()
-
-            for event in event_queryset: #[:20]: # Limit to 20 events
-                serialized_data = EventSearchSerializer(event).data
-                serialized_data['type'] = 'event'
-                
-                # serialized_data['rank'] = event.rank # expose the rank for client-side sorting
-                results.append(serialized_data)
-
-            # Additionally: sort the combined 'results' list by rank (a.k.a. sort by relevance.. always!)
-            results.sort(key=lambda x: x.get('rank', 0), reverse=True)
+        # Same shape as DRF's CursorPagination (forward-only, so there's never a previous page link)
+        return Response({'next': next_url, 'previous': None, 'results': results})
 
-        return Response(results)
+    def get_page_size(self):
+        """ ?page_size= (defaults to search.DEFAULT_PAGE_SIZE, capped at search.MAX_PAGE_SIZE) """
+        try:
+            page_size = int(self.request.query_params['page_size'])
+        except (KeyError, ValueError):
+            return search.DEFAULT_PAGE_SIZE
+        return max(1, min(page_size, search.MAX_PAGE_SIZE))
 
 class MatchmakerView(generics.ListAPIView):
     # https://www.django-rest-framework.org/api-guide/generic-views/#listapiview
 
     print('hello from matchmaker view')
 
-    # tells ListAPIView which serializer to use
-    serializer_class = FighterSerializer
+    # tells ListAPIView which serializer to use (elo_history for the chart comes from the BoutElo table)
+    serializer_class = FighterEloSerializer
 
     # By overriding get_queryset(), we can apply the filtering before any data is loaded... so we don't have to use Fighter.objects.all() ...an expensive query
     def get_queryset(self):
@@ -158,31 +206,101 @@ class MatchmakerView(generics.ListAPIView):
         if not query_string:
             return Fighter.objects.none()
 
-        # Use Q objects to build a dynamic OR query
-        # search for the query string in either the 'name' or 'nickname' fields
-        queryset = Fighter.objects.filter(
-            Q(name__icontains=query_string) | Q(nickname__icontains=query_string)
-        )
-
-        # Annotate the queryset with a relevance score for ordering
-        # and the rank (as 'rank') https://docs.djangoproject.com/en/5.2/ref/models/querysets/#annotate
-        queryset = queryset.annotate(
-            relevance_score=Case(
-                When(Q(name__iexact=query_string) | Q(nickname__iexact=query_string), then=Value(100)),
-                When(Q(name__istartswith=query_string) | Q(nickname__istartswith=query_string), then=Value(50)),
-                default=Value(0),
-            ) - Length(F('name'))
-        )
+        # Fuzzy (pg_trgm) match on the 'name' or 'nickname' fields, answered from GIN trigram indexes instead of scanning
+        # every fighter with icontains. Typos still match ("kamaru usmen"), best match first. See api/search.py
+        queryset = search.fighter_name_matches(query_string).prefetch_related(fighter_elo_snapshots_prefetch)
 
         # Note: Django querysets are lazy. It builds a query of Python objects then execute it against the database
             # so I'm not actually pulling all the records from the DB then only returning the sliced 10.
-            # The SQL query probably looks something like this (and is efficient - enough... for now)
+            # The SQL query probably looks something like this
 
             # SELECT ... FROM fighter_table
-            # WHERE name LIKE '%query%' OR nickname LIKE '%query%'
-            # ORDER BY relevance_score DESC
+            # WHERE name %> 'query' OR nickname %> 'query'
+            # ORDER BY GREATEST(word_similarity('query', name), word_similarity('query', nickname)) DESC, ...
             # LIMIT 10;
 
-        # Order by the calculated relevance score in descending order.
-        # Then, use list slicing to get only the top 10 results.
-        return queryset.order_by('-relevance_score')[:10]
+        return queryset[:10]
+
+class MatchmakerAutocompleteView(generics.ListAPIView):
+    # Typeahead suggestions for the matchmaker search boxes, e.g. /api/matchmaker/autocomplete/?q=kamaru%20usmen
+    # Returns up to search.AUTOCOMPLETE_LIMIT compact fighters (no elo_history), best match first, unpaginated
+    serializer_class = FighterAutocompleteSerializer
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        # Prefixes of a name or nickname word ("kam", "usm") are answered from the in-process index without
+        # querying the fighters table. Anything it can't match (typos) falls through to the pg_trgm query below
+        query_string = request.query_params.get('q', '').strip()
+        if query_string and settings.FIGHTER_PREFIX_INDEX:
+            matches = fighter_prefix_index().search(query_string, limit=search.AUTOCOMPLETE_LIMIT)
+            if matches:
+                return Response(self.get_serializer(matches, many=True).data)
+
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self):
+        query_string = self.request.query_params.get('q', '').strip()
+
+        if not query_string:
+            return Fighter.objects.none()
+
+        return search.fighter_name_matches(query_string).only(
+            'fighter_id', 'name', 'nickname', 'weight_lb', 'elo', 'peak_elo'
+        )[:search.AUTOCOMPLETE_LIMIT]
+
+class MatchmakerCompareView(CachedDatasetViewMixin, generics.RetrieveAPIView):
+    # Head-to-head summary for two fighters, e.g. /api/matchmaker/compare/?a=<fighter_id>&b=<fighter_id>
+    # Both current ratings, a's chance of beating b (now, and both at their peak) and downsampled rating curves,
+    # in one compact response instead of two full fighter payloads. Two queries: the fighters, then both curves
+    serializer_class = FighterMatchupSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        fighter_ids = {side: request.query_params.get(side, '').strip() for side in ('a', 'b')}
+        missing = [side for side, fighter_id in fighter_ids.items() if not fighter_id]
+        if missing:
+            raise ValidationError({side: "A fighter_id is required." for side in missing})
+
+        fighters = Fighter.objects.only(
+            'fighter_id', 'name', 'nickname', 'weight_lb', 'wins', 'losses', 'draws', 'elo', 'peak_elo'
+        ).in_bulk(set(fighter_ids.values()))
+        for fighter_id in fighter_ids.values():
+            if fighter_id not in fighters:
+                raise NotFound(f"No fighter with id {fighter_id}")
+
+        fighter_a, fighter_b = fighters[fighter_ids['a']], fighters[fighter_ids['b']]
+        comparison = matchups.compare(fighter_a, fighter_b)
+        context = dict(self.get_serializer_context(), curves=comparison['curves'])
+
+        return Response({
+            'a': FighterMatchupSerializer(fighter_a, context=context).data,
+            'b': FighterMatchupSerializer(fighter_b, context=context).data,
+            'win_probability': comparison['win_probability'],
+            'peak_win_probability': comparison['peak_win_probability'],
+        })
+
+class MatchmakerMatrixView(CachedDatasetViewMixin, generics.RetrieveAPIView):
+    # Win probabilities for every pairing among a division's top fighters, for building hypothetical cards
+    # e.g. /api/matchmaker/matrix/?weight_class=lightweight&size=50 (size defaults to 25, at most 300)
+    # win_probabilities[i][j] is fighters[i]'s chance of beating fighters[j], computed from current ratings in one
+    # vectorized operation (see matchups.win_probability_matrix). One query, cached per dataset version
+    serializer_class = FighterRatingSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        weight_class = request.query_params.get('weight_class', '').strip().lower()
+        if weight_class not in matchups.WEIGHT_CLASSES:
+            raise ValidationError({'weight_class': f"Choose one of: {', '.join(matchups.WEIGHT_CLASSES)}."})
+
+        fighters = list(matchups.weight_class_fighters(weight_class).only(*self.serializer_class.Meta.fields)[:self.get_size()])
+
+        return Response({
+            'weight_class': weight_class,
+            'fighters': self.get_serializer(fighters, many=True).data,
+            'win_probabilities': matchups.win_probability_matrix([fighter.elo for fighter in fighters]),
+        })
+
+    def get_size(self):
+        try:
+            size = int(self.request.query_params['size'])
+        except (KeyError, ValueError):
+            return matchups.MATRIX_DEFAULT_SIZE
+        return max(1, min(size, matchups.MATRIX_MAX_SIZE))
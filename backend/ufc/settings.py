@@ -86,6 +86,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # trigram lookups/functions (pg_trgm) used by the matchmaker autocomplete
     'api',
     'rest_framework',
     'rest_framework_simplejwt', # mostly in case we want to add translations/localization later on
@@ -135,10 +136,37 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        'OPTIONS': {
+            # The whole dataset fits in memory, so an index lookup costs about as much as a sequential read.
+            # With Postgres' default (4.0, tuned for spinning disks) the planner scans whole tables instead of
+            # using an index for lookups like the BoutElo prefetch of an events page (bout_id IN (...a few hundred ids))
+            'options': f"-c random_page_cost={config('DB_RANDOM_PAGE_COST', default='1.1')}",
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Caches the read-only fighter/event API responses (see api/caching.py). Local memory by default, no external services needed.
+# For a cache shared between worker processes, use CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# with CACHE_LOCATION set to a writable directory.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ufc-api-responses'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Serve matchmaker autocomplete prefixes from an in-process index of fighter names (see api/prefix_index.py),
+# falling back to the pg_trgm query for typos. Each worker process keeps its own copy (a few MB).
+FIGHTER_PREFIX_INDEX = config('FIGHTER_PREFIX_INDEX', default=True, cast=bool)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
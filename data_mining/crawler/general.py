@@ -51,9 +51,11 @@ def file_to_set(file_name):
 
 # Iterate thru the set, each item is a line in the file
 def set_to_file(links, file):
-    delete_file_contents(file)  # clear the file first, all the data up this point is old data
-    for link in sorted(links):
-        append_to_file(file, link)
+    # Written in one go to a temporary file, then swapped in, so a crash mid-write never leaves a half-written file behind
+    temporary_file = file + '.tmp'
+    with open(temporary_file, 'w') as f:
+        f.writelines(link + '\n' for link in sorted(links))
+    os.replace(temporary_file, file)  # all the data up this point is old data
 
 
 # Example usage:
@@ -0,0 +1,59 @@
+import os
+
+# Journal line prefixes
+QUEUED = 'Q '
+CRAWLED = 'C '
+
+class CrawlJournal:
+    """
+    Append-only log of the crawl's progress, next to the queue.txt/crawled.txt snapshot in the project directory.
+
+    After every page we only append a few lines (the links it added to the queue, then the page itself as crawled),
+    instead of rewriting both files. Every so often the spider compacts: it writes a fresh snapshot and empties the journal.
+    On boot, replaying the journal over the snapshot gives back exactly where the last run stopped, even if it crashed
+    (a line cut off by a crash is ignored, and that page simply gets crawled again).
+    """
+
+    def __init__(self, project_name):
+        self.path = project_name + '/journal.txt'
+        self.file = None
+
+    def replay(self, queue, crawled):
+        # Applies every complete journal line to the queue and crawled sets (in place), returns how many were applied
+        if not os.path.isfile(self.path):
+            return 0
+        applied = 0
+        with open(self.path, 'rt') as f:
+            for line in f:
+                if not line.endswith('\n'): # cut off mid-write by a crash
+                    break
+                url = line[len(QUEUED):-1]
+                if line.startswith(QUEUED):
+                    if url not in crawled:
+                        queue.add(url)
+                elif line.startswith(CRAWLED):
+                    crawled.add(url)
+                    queue.discard(url)
+                else:
+                    continue
+                applied += 1
+        return applied
+
+    def record(self, page_url, queued_links):
+        # One page's bookkeeping: the links it queued, then the page itself. Flushed, so it survives the process dying
+        if self.file is None:
+            self.file = open(self.path, 'a')
+        self.file.writelines(QUEUED + url + '\n' for url in queued_links)
+        self.file.write(CRAWLED + page_url + '\n')
+        self.file.flush()
+
+    def clear(self):
+        # Only once a snapshot with everything in the journal has been written (see Spider.compact)
+        self.close()
+        with open(self.path, 'w'):
+            pass
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -1,5 +1,5 @@
 from html.parser import HTMLParser
-from urllib import parse
+from url_rules import canonicalize_url
 
 class LinkFinder(HTMLParser):
 
@@ -14,11 +14,12 @@ class LinkFinder(HTMLParser):
         # print(tag)
         if tag == 'a': # anchor HTML tag
             for (attribute, value) in attrs:
-                if attribute == 'href':
+                if attribute == 'href' and value:
                     # sometimes we come across links in sites that are relative links, not full URLs
-                    # so we need to convert them to absolute URLs
-                    url = parse.urljoin(self.base_url, value)
-                    self.links.add(url)
+                    # so we need to convert them to absolute (and canonical) URLs, see url_rules.py
+                    url = canonicalize_url(value, self.page_url)
+                    if url:
+                        self.links.add(url)
     
     def page_links(self):
         return self.links
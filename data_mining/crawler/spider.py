@@ -1,73 +1,184 @@
-from urllib.request import urlopen
+import asyncio
+import os
+import sys
+from urllib.parse import urlparse
+import aiohttp
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # data_mining/, for the HTTP cache shared with the scraper
+from http_cache import PageNotCached
 from link_finder import LinkFinder
+from journal import CrawlJournal
+from url_rules import canonicalize_url, is_allowed
 from general import *
 
-class Spider: 
-    
-    # Class Variables - shared by all instances of the class
-    project_name = ''
-    base_url = ''
-    domain_name = ''
-    queue_file = ''
-    crawled_file = ''
-    queue = set()
-    crawled = set()
-
-    def __init__(self, project_name, base_url, domain_name): # instance vars
-        Spider.project_name = project_name
-        Spider.base_url = base_url
-        Spider.domain_name = domain_name
-        Spider.queue_file = project_name + '/queue.txt'
-        Spider.crawled_file = project_name + '/crawled.txt'
+class HostRateLimiter:
+    # Spaces out requests to the same host, so we don't get booted from the site for crawling too fast
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = {} # host -> earliest time (event loop clock) the next request to it may start
+
+    async def wait(self, host):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot.get(host, now))
+        # the slot is reserved before sleeping, so workers waiting on the same host line up one interval apart
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class Spider:
+    """
+    Crawls every page of a domain, `concurrency` pages at a time, over one pooled (keep-alive) HTTP session.
+
+    Everything runs on a single event loop thread, so the queue and crawled sets are only ever touched between
+    awaits and need no locks. A URL is claimed (added to the queue set) the moment it's discovered, before
+    anything else can run, so no two workers ever fetch the same page.
+
+    Progress is appended to a journal after every page, and queue.txt/crawled.txt are only rewritten
+    every `compact_every` pages (and at the end), see CrawlJournal.
+
+    Only the pages url_rules.is_allowed lets through are queued as they're discovered. The `seeds`
+    (index pages listing them, by default just base_url) are the only other pages ever fetched.
+
+    With an http_cache.HttpCache, every page is fetched through it: pages fetched before are revalidated with
+    a conditional request (a 304 costs no body), and an offline cache crawls without touching the network.
+    """
+
+    def __init__(self, project_name, base_url, domain_name, concurrency=16, requests_per_second=10, timeout=30, compact_every=1000, seeds=None, cache=None):
+        self.project_name = project_name
+        self.base_url = base_url
+        self.domain_name = domain_name
+        self.seeds = [canonicalize_url(url, base_url) for url in [base_url] + list(seeds or [])]
+        self.queue_file = project_name + '/queue.txt'
+        self.crawled_file = project_name + '/crawled.txt'
+        self.concurrency = concurrency # how many pages we fetch at the same time
+        self.timeout = timeout # seconds, per page
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.journal = CrawlJournal(project_name)
+        self.compact_every = compact_every # pages between rewrites of the queue/crawled files
+        self.pages_since_compaction = 0
+        self.cache = cache # shared with the scraper, so it can re-parse every crawled page without fetching it again
+        self.queue = set()
+        self.crawled = set()
+        self.frontier = None # asyncio.Queue of URLs to crawl, created on the running event loop in crawl()
         self.boot()
-        self.crawl_page('First spider', Spider.base_url)
-
-    @staticmethod # decorator to indicate that this method does not depend on instance variables, but rather the Class variables that we defined
-    def boot():
-        # The first spider we dispatch has one unique job: to check for / create the project directory and files
-        create_project_dir(Spider.project_name)
-        create_data_files(Spider.project_name, Spider.base_url)
-        Spider.queue = file_to_set(Spider.queue_file)
-        Spider.crawled = file_to_set(Spider.crawled_file)
-
-    @staticmethod
-    def crawl_page(thread_name, page_url): # when we crawl a page, let's also print out what tasks are being worked on, so our console isn't completely inert/silent while running our crawler
-        if page_url not in Spider.crawled: # make sure we didn't already crawl this page, use the crawl SET, not FILE
-            print(thread_name + ' now crawling ' + page_url)
-            print('Queue ' + str(len(Spider.queue)) + ' | Crawled ' + str(len(Spider.crawled)))
-            Spider.add_links_to_queue(Spider.gather_links(page_url)) # add the list of links to the list that all Spiders can see
-            Spider.queue.remove(page_url)
-            Spider.crawled.add(page_url)
-            Spider.update_files() # update the files with the new queue and crawled sets
-
-    @staticmethod
-    def gather_links(page_url):
-        html_string = ''
+
+    def boot(self):
+        # The spider has one job before crawling: check for / create the project directory and files, and pick up where the last run left off
+        create_project_dir(self.project_name)
+        create_data_files(self.project_name, self.base_url)
+        self.queue = file_to_set(self.queue_file)
+        self.crawled = file_to_set(self.crawled_file)
+        # Anything crawled since the last snapshot (e.g. the last run was stopped or crashed) is in the journal
+        replayed = self.journal.replay(self.queue, self.crawled)
+        # Seeds that haven't been crawled yet, and nothing left over (from older runs) that the rules now deny
+        wanted = {url for url in self.queue if url in self.seeds or is_allowed(url, self.domain_name)}
+        wanted.update(url for url in self.seeds if url not in self.crawled)
+        if replayed or wanted != self.queue:
+            self.queue = wanted
+            self.compact()
+
+    async def crawl(self):
+        # Crawl until there's nothing left in the queue: a fixed pool of workers caps how many pages are in flight at once
+        self.frontier = asyncio.Queue()
+        for url in sorted(self.queue - self.crawled):
+            self.frontier.put_nowait(url)
+
+        # One session for the whole crawl, so connections to the site are kept alive and reused between pages
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            workers = [asyncio.create_task(self.work(session, f'Spider {number + 1}')) for number in range(self.concurrency)]
+            await self.frontier.join() # every queued page (including the ones discovered along the way) is done
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        self.compact()
+        print('Queue ' + str(len(self.queue)) + ' | Crawled ' + str(len(self.crawled)))
+        if self.cache is not None:
+            print('HTTP cache: ' + ', '.join(f'{count} {outcome}' for outcome, count in self.cache.stats.items()))
+
+    async def work(self, session, worker_name):
+        # Do the next job in the queue, forever (crawl() cancels the workers once the queue is empty)
+        while True:
+            page_url = await self.frontier.get()
+            try:
+                await self.crawl_page(session, worker_name, page_url)
+            except Exception as e: # a bad page must never take its worker down (or what's left in the queue would never get crawled)
+                print('Error: ' + worker_name + ' failed on ' + page_url + ': ' + repr(e)) # it stays in the queue, for the next run
+            finally:
+                self.frontier.task_done()
+
+    async def crawl_page(self, session, worker_name, page_url): # when we crawl a page, let's also print out what tasks are being worked on, so our console isn't completely inert/silent while running our crawler
+        if page_url in self.crawled: # make sure we didn't already crawl this page, use the crawl SET, not FILE
+            return
+        print(worker_name + ' now crawling ' + page_url)
+        print('Queue ' + str(len(self.queue)) + ' | Crawled ' + str(len(self.crawled)))
+        queued_links = self.add_links_to_queue(await self.gather_links(session, page_url)) # add the links to the queue every worker pulls from
+        self.queue.discard(page_url)
+        self.crawled.add(page_url)
+        self.update_files(page_url, queued_links)
+
+    async def gather_links(self, session, page_url):
         try: # whenever doing networking or server operations in python, try/except is best to handle exceptions instead of our program erroring out
-            response = urlopen(page_url) # open the URL and get the response
-            if response.getheader('Content-Type') == 'text/html;charset=utf-8': # make we're connected to an HTML page, not an executable or something else
-                html_bytes = response.read() # convert the complex computer format to a string
-                html_string = html_bytes.decode("utf-8")
-            finder = LinkFinder(Spider.base_url, page_url)
-            finder.feed(html_string) # feed the HTML string to our LinkFinder
-        except: # Most likely: the page doesn't exist, is unreachable, or Maybe.. we got booted from site because the site doesn't allow crawling or you crawled too fast
+            html_string = await self.fetch(session, page_url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, PageNotCached): # Most likely: the page doesn't exist, is unreachable, or Maybe.. we got booted from site
             print('Error: Could not crawl page ' + page_url)
             return set() # return empty set ... there were no links to add to the queue
+        if html_string is None:
+            return set()
+        finder = LinkFinder(self.base_url, page_url)
+        finder.feed(html_string) # feed the HTML string to our LinkFinder
         return finder.page_links()
-    
-    @staticmethod
-    def add_links_to_queue(links):
+
+    async def fetch(self, session, page_url):
+        # The page's HTML, through the cache if there is one (None if it isn't an HTML page)
+        cached_page = self.cache.load(page_url) if self.cache is not None else None
+        if self.cache is not None and self.cache.offline:
+            if cached_page is None:
+                raise PageNotCached(page_url)
+            self.cache.stats['offline'] += 1
+            return cached_page.text # no request, so no need to wait on the rate limiter either
+
+        await self.rate_limiter.wait(urlparse(page_url).netloc)
+        headers = self.cache.conditional_headers(cached_page) if self.cache is not None else {}
+        async with session.get(page_url, headers=headers) as response:
+            if response.status == 304 and cached_page is not None: # unchanged since we cached it
+                return self.cache.revalidated(cached_page).text
+            if response.content_type != 'text/html': # make sure we're connected to an HTML page, not an executable or something else
+                return None
+            response.raise_for_status()
+            if self.cache is None:
+                return await response.text() # decoded with the charset from the response headers (utf-8 on ufcstats)
+            self.cache.stats['downloaded'] += 1
+            return self.cache.save(page_url, await response.read(), response.headers).text
+
+    def add_links_to_queue(self, links):
+        # Returns the links that were actually new, for the journal
+        queued_links = []
         for url in links:
             # instead of just pushing them in the queue, we check if they're already there and make sure they're not on the crawled list
-            if url in Spider.queue:
+            if url in self.queue:
                 continue
-            if url in Spider.crawled:
+            if url in self.crawled:
                 continue
-            if Spider.domain_name not in url: # make sure the URL is part of the domain we're crawling, so we don't accidentally crawl an external site
+            if not is_allowed(url, self.domain_name): # only the pages we scrape, on the domain we're crawling (not paginated indexes or external sites)
                 continue
-            Spider.queue.add(url)
+            self.queue.add(url)
+            self.frontier.put_nowait(url)
+            queued_links.append(url)
+        return queued_links
+
+    def update_files(self, page_url, queued_links):
+        # A few appended journal lines per page, no matter how big the queue and crawled sets get
+        self.journal.record(page_url, queued_links)
+        self.pages_since_compaction += 1
+        if self.pages_since_compaction >= self.compact_every:
+            self.compact()
 
-    @staticmethod
-    def update_files():
-        set_to_file(Spider.queue, Spider.queue_file) # (set we're working with, set we're saving to)
-        set_to_file(Spider.crawled, Spider.crawled_file) 
\ No newline at end of file
+    def compact(self):
+        # Writes the queue and crawled sets out in full, then empties the journal they now include
+        set_to_file(self.queue, self.queue_file) # (set we're working with, set we're saving to)
+        set_to_file(self.crawled, self.crawled_file)
+        self.journal.clear()
+        self.pages_since_compaction = 0
@@ -0,0 +1,263 @@
+"""
+Tests for the crawler, run from this directory: python -m unittest tests
+
+The crawl tests run the Spider against a small fixture site (aiohttp.web on localhost), shaped like ufcstats:
+an index page lists events, events link to their bouts, bouts to their fighters (and back).
+"""
+import asyncio
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from journal import CrawlJournal
+from spider import Spider
+from http_cache import HttpCache, PageNotCached # (importable once spider has put data_mining/ on the path)
+from url_rules import canonicalize_url, is_allowed
+
+# path -> links on that page (with the noise a real page has: other sites, mailto:, paginated indexes, odd spellings)
+FIXTURE_PAGES = {
+    '/': ['/statistics/events/completed?page=all', 'https://twitter.com/ufc'],
+    '/statistics/events/completed': ['/event-details/E1', '/event-details/e2#top', '/statistics/events/completed?page=2'],
+    '/event-details/e1': ['/fight-details/b1', '/fight-details/b2', '/statistics/events/completed'],
+    '/event-details/e2': ['/fight-details/b3'],
+    '/fight-details/b1': ['/fighter-details/f1', '../fighter-details/f2?tab=1', 'mailto:someone@example.com'],
+    '/fight-details/b2': ['/fighter-details/f3', '/fighter-details/f4'],
+    '/fight-details/b3': ['/fighter-details/f1', '/fighter-details//F3/', '/event-details/e2'],
+    '/fighter-details/f1': ['/fight-details/b1', '/fight-details/b3'],
+    '/fighter-details/f2': ['/fight-details/b1'],
+    '/fighter-details/f3': ['/fight-details/b2', '/fight-details/b3'],
+    '/fighter-details/f4': ['/fight-details/b2'],
+}
+
+
+class FixtureSite:
+    """ Serves FIXTURE_PAGES on a free localhost port, and counts the requests for every path
+
+    Every page has an ETag, and a request that already has the current one gets a 304 Not Modified.
+    """
+
+    async def start(self):
+        self.hits = {}
+        self.not_modified = 0
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        self.domain_name = f'127.0.0.1:{self.port}'
+        self.base_url = f'http://{self.domain_name}/'
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def handle(self, request):
+        self.hits[request.path] = self.hits.get(request.path, 0) + 1
+        if request.path not in FIXTURE_PAGES:
+            return web.Response(status=404)
+        html = '<html><body>' + ''.join(f'<a href="{link}">link</a>' for link in FIXTURE_PAGES[request.path]) + '</body></html>'
+        etag = '"' + hashlib.sha256(html.encode('utf-8')).hexdigest()[:16] + '"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=html, content_type='text/html', headers={'ETag': etag})
+
+
+class SpiderCrawlTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.site = FixtureSite()
+        await self.site.start()
+        self.addAsyncCleanup(self.site.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.project = os.path.join(directory.name, 'project')
+
+    def spider(self, spider_class=Spider, concurrency=4, project=None, cache=None):
+        seeds = [self.site.base_url + 'statistics/events/completed?page=all']
+        with contextlib.redirect_stdout(io.StringIO()):
+            return spider_class(
+                project or self.project, self.site.base_url, self.site.domain_name,
+                concurrency=concurrency, requests_per_second=0, seeds=seeds, cache=cache
+            )
+
+    async def crawl(self, spider):
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.wait_for(spider.crawl(), timeout=10)
+
+    def read_lines(self, file_name, project=None):
+        with open(os.path.join(project or self.project, file_name)) as f:
+            return f.read().splitlines()
+
+    async def test_every_page_is_crawled_exactly_once(self):
+        await self.crawl(self.spider())
+
+        # The seeds, and every detail page (found under any spelling), each fetched once. Nothing else
+        detail_pages = [path for path in FIXTURE_PAGES if '-details/' in path]
+        self.assertEqual(self.site.hits, {path: 1 for path in ['/', '/statistics/events/completed', *detail_pages]})
+        self.assertEqual(self.read_lines('queue.txt'), [])
+        self.assertEqual(self.read_lines('crawled.txt'), sorted(
+            [self.site.base_url, self.site.base_url + 'statistics/events/completed?page=all'] +
+            [self.site.base_url + path[1:] for path in detail_pages]
+        ))
+        self.assertEqual(self.read_lines('journal.txt'), []) # compacted at the end
+
+    async def test_a_failing_page_does_not_stop_the_crawl(self):
+        class FlakySpider(Spider):
+            async def gather_links(self, session, page_url):
+                if page_url.endswith('/fight-details/b2'):
+                    raise LookupError('unknown encoding: x-fixture')
+                return await super().gather_links(session, page_url)
+
+        # One worker, so if the error killed it, nothing would be left to empty the queue (and crawl() would hang)
+        await self.crawl(self.spider(FlakySpider, concurrency=1))
+
+        # b2 is left in the queue for the next run; f4 is only linked from b2, everything else still gets crawled
+        crawled = self.read_lines('crawled.txt')
+        self.assertEqual(self.read_lines('queue.txt'), [self.site.base_url + 'fight-details/b2'])
+        self.assertEqual(len(crawled), 9)
+        self.assertNotIn(self.site.base_url + 'fighter-details/f4', crawled)
+
+    async def test_recrawl_is_answered_from_the_http_cache(self):
+        cache = HttpCache(os.path.join(self.project, 'http_cache'))
+        await self.crawl(self.spider(cache=cache))
+        pages = sum(self.site.hits.values())
+        self.assertEqual(cache.stats, {'downloaded': pages, 'not_modified': 0, 'offline': 0})
+
+        # A fresh crawl sends the stored ETags, and every page comes back 304 and is read from the cache
+        cache = HttpCache(cache.directory)
+        await self.crawl(self.spider(project=self.project + '-again', cache=cache))
+        self.assertEqual(self.site.not_modified, pages)
+        self.assertEqual(cache.stats, {'downloaded': 0, 'not_modified': pages, 'offline': 0})
+        self.assertEqual(self.read_lines('crawled.txt', self.project + '-again'), self.read_lines('crawled.txt'))
+
+        # Offline, the same crawl happens without a single request
+        cache = HttpCache(cache.directory, offline=True)
+        offline_spider = self.spider(project=self.project + '-offline', cache=cache)
+        await self.crawl(offline_spider)
+        self.assertEqual(sum(self.site.hits.values()), 2 * pages)
+        self.assertEqual(self.read_lines('crawled.txt', self.project + '-offline'), self.read_lines('crawled.txt'))
+
+        # ...and a page that was never fetched isn't fetched now either
+        async with aiohttp.ClientSession() as session:
+            with self.assertRaises(PageNotCached):
+                await offline_spider.fetch(session, self.site.base_url + 'fighter-details/ff')
+        self.assertEqual(sum(self.site.hits.values()), 2 * pages)
+
+
+class UrlRulesTest(unittest.TestCase):
+
+    page_url = 'http://ufcstats.com/event-details/abc'
+
+    def test_canonicalize_url(self):
+        for link, canonical in [
+            # the documented example: relative link, uppercase id, trailing slash, query and fragment on a detail page
+            ('../fighter-details/93FE7332D16C6AD9/?x=1#top', 'http://ufcstats.com/fighter-details/93fe7332d16c6ad9'),
+            ('HTTP://UFCStats.com/fight-details/ABC123', 'http://ufcstats.com/fight-details/abc123'), # host and id case
+            ('http://ufcstats.com:80/event-details/abc', 'http://ufcstats.com/event-details/abc'), # default port
+            ('https://ufcstats.com:443/event-details/abc', 'https://ufcstats.com/event-details/abc'),
+            ('http://ufcstats.com:8080/event-details/abc', 'http://ufcstats.com:8080/event-details/abc'), # other ports stay
+            ('/statistics//events///completed', 'http://ufcstats.com/statistics/events/completed'), # repeated slashes
+            ('/statistics/fighters?page=all&char=b', 'http://ufcstats.com/statistics/fighters?char=b&page=all'), # sorted query
+            ('/statistics/events/completed#top', 'http://ufcstats.com/statistics/events/completed'), # fragment
+            ('', 'http://ufcstats.com/event-details/abc'), # a link to the page itself
+        ]:
+            with self.subTest(link=link):
+                self.assertEqual(canonicalize_url(link, self.page_url), canonical)
+
+    def test_links_that_are_not_pages_are_dropped(self):
+        for link in ['mailto:someone@example.com', 'javascript:void(0)', 'tel:+15555555555', 'http://ufcstats.com:bad/']:
+            with self.subTest(link=link):
+                self.assertIsNone(canonicalize_url(link, self.page_url))
+
+    def test_is_allowed(self):
+        for url, allowed in [
+            ('http://ufcstats.com/fighter-details/93fe7332d16c6ad9', True),
+            ('http://ufcstats.com/fight-details/abc123', True),
+            ('http://ufcstats.com/event-details/abc', True),
+            ('http://www.ufcstats.com/event-details/abc', True), # subdomain
+            ('http://ufcstats.com/statistics/events/completed?page=2', False), # paginated index
+            ('http://ufcstats.com/statistics/events/completed', False), # index pages are only ever seeds
+            ('http://ufcstats.com/fighter-details/abc?tab=1', False), # never canonical, but denied anyway
+            ('http://ufcstats.com/fighter-details/not-hex', False),
+            ('https://twitter.com/fighter-details/abc', False), # external site
+            ('http://notufcstats.com/event-details/abc', False), # only looks like the domain
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(is_allowed(url, 'ufcstats.com'), allowed)
+
+
+class CrawlJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.project = directory.name
+        self.journal = CrawlJournal(self.project)
+        self.addCleanup(self.journal.close)
+
+    def write_journal(self, text):
+        with open(self.journal.path, 'w') as f:
+            f.write(text)
+
+    def test_replay_over_a_snapshot(self):
+        self.journal.record('http://a/', ['http://a/1', 'http://a/2'])
+        self.journal.record('http://a/1', ['http://a/3'])
+        queue, crawled = {'http://a/'}, set() # the snapshot from before those pages
+
+        self.assertEqual(self.journal.replay(queue, crawled), 5)
+        self.assertEqual(queue, {'http://a/2', 'http://a/3'})
+        self.assertEqual(crawled, {'http://a/', 'http://a/1'})
+
+    def test_replay_ignores_a_cut_off_last_line(self):
+        # The process died in the middle of writing the second page's lines
+        self.write_journal('Q http://a/1\nC http://a/\nQ http://a/2\nC http://a/')
+        queue, crawled = {'http://a/'}, set()
+
+        self.assertEqual(self.journal.replay(queue, crawled), 3)
+        self.assertEqual(queue, {'http://a/1', 'http://a/2'})
+        self.assertEqual(crawled, {'http://a/'})
+
+    def test_replay_is_idempotent(self):
+        self.journal.record('http://a/', ['http://a/1'])
+        self.journal.record('http://a/1', [])
+        queue, crawled = {'http://a/'}, set()
+        self.journal.replay(queue, crawled)
+        once = (set(queue), set(crawled))
+
+        # e.g. a crash after compaction wrote the new snapshot, but before it emptied the journal
+        self.journal.replay(queue, crawled)
+        self.assertEqual((queue, crawled), once)
+
+    def test_compact_empties_the_journal(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            spider = Spider(self.project, 'http://a/', 'a', seeds=[])
+        spider.crawled.add('http://a/')
+        spider.queue = {'http://a/fighter-details/1'}
+        spider.update_files('http://a/', ['http://a/fighter-details/1'])
+        self.assertNotEqual(os.path.getsize(spider.journal.path), 0)
+
+        spider.compact()
+        self.assertEqual(os.path.getsize(spider.journal.path), 0)
+        with open(spider.queue_file) as f:
+            self.assertEqual(f.read(), 'http://a/fighter-details/1\n')
+        with open(spider.crawled_file) as f:
+            self.assertEqual(f.read(), 'http://a/\n')
+        spider.journal.close()
+
+        # A new run boots from the snapshot alone
+        with contextlib.redirect_stdout(io.StringIO()):
+            resumed = Spider(self.project, 'http://a/', 'a', seeds=[])
+        self.assertEqual((resumed.queue, resumed.crawled), ({'http://a/fighter-details/1'}, {'http://a/'}))
+        resumed.journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import re
+from urllib import parse
+
+# The only pages the scraper reads (see scraper/scraper.py), e.g. http://ufcstats.com/fighter-details/93fe7332d16c6ad9
+ALLOWED_PAGES = [
+    re.compile(r'^/fighter-details/[0-9a-f]+$'),
+    re.compile(r'^/fight-details/[0-9a-f]+$'),
+    re.compile(r'^/event-details/[0-9a-f]+$'),
+]
+# Everything else is denied: paginated and ?query index pages, /statistics pages, other sites...
+# Those are only ever fetched as seeds (see SEED_PATHS in main.py), to discover the pages above
+
+DETAIL_PAGE_PATH = re.compile(r'^/(fighter|fight|event)-details/([0-9a-fA-F]+)/?$')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Canonical (absolute) form of a link found on a page, so the same page is never queued twice under two spellings
+def canonicalize_url(url, page_url):
+    try:
+        parts = parse.urlsplit(parse.urljoin(page_url, url.strip()))  # relative links are relative to the page they're on
+        port = parts.port
+    except ValueError:  # malformed URL, e.g. a bad port
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:  # mailto:, javascript:, tel: ...
+        return None
+
+    host = parts.hostname  # already lowercased
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f'{host}:{port}'
+    path = re.sub(r'/{2,}', '/', parts.path) or '/'
+    query = parse.urlencode(sorted(parse.parse_qsl(parts.query, keep_blank_values=True)))  # ?b=2&a=1 is ?a=1&b=2
+
+    detail_page = DETAIL_PAGE_PATH.match(path)
+    if detail_page:  # ids are case-insensitive hex, and a detail page is the same page whatever the query string says
+        path = f'/{detail_page[1]}-details/{detail_page[2].lower()}'
+        query = ''
+
+    return parse.urlunsplit((scheme, netloc, path, query, ''))  # #fragments never change the page we fetch
+
+# Allow/deny rules, for canonical URLs: only the pages the scraper reads, on the site we're crawling
+def is_allowed(url, domain_name):
+    parts = parse.urlsplit(url)
+    if parts.netloc != domain_name and not parts.netloc.endswith('.' + domain_name):  # don't accidentally crawl an external site
+        return False
+    if parts.query:
+        return False
+    return any(pattern.match(parts.path) for pattern in ALLOWED_PAGES)
+
+# Example usage:
+# canonicalize_url('../fighter-details/93FE7332D16C6AD9/?x=1#top', 'http://UFCStats.com:80/event-details/abc')
+# -> 'http://ufcstats.com/fighter-details/93fe7332d16c6ad9'
+# is_allowed('http://ufcstats.com/statistics/events/completed?page=2', 'ufcstats.com') -> False
@@ -0,0 +1,115 @@
+"""
+On-disk HTTP cache shared by the crawler and the scraper, keyed by URL.
+
+Every successful HTML response is stored gzip-compressed along with its ETag / Last-Modified validators,
+one file per URL under http_cache/ (named by the URL's SHA-256). The next fetch of that URL sends
+If-None-Match / If-Modified-Since, and a 304 Not Modified is answered from the stored body, so a re-crawl
+only downloads pages that changed. In offline mode nothing goes over the network at all: every page comes
+from the cache (PageNotCached if it was never fetched), so the parsers can be re-run over the whole site in minutes.
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'http_cache')
+
+# Response headers kept with each page
+STORED_HEADERS = ['ETag', 'Last-Modified', 'Content-Type']
+
+
+class PageNotCached(Exception):
+    """ Raised in offline mode for a page that isn't in the cache """
+
+
+class CachedPage:
+    def __init__(self, url, body, headers, fetched_at):
+        self.url = url
+        self.body = body # bytes, as received
+        self.headers = headers # the STORED_HEADERS the server sent
+        self.fetched_at = fetched_at # unix time the body was last downloaded or revalidated
+
+    @property
+    def text(self):
+        # Decoded with the charset the server declared (utf-8 on ufcstats), or utf-8 if it's missing or unknown
+        charset = 'utf-8'
+        for parameter in self.headers.get('Content-Type', '').split(';')[1:]:
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'charset' and value.strip(' "\''):
+                charset = value.strip(' "\'')
+        try:
+            return self.body.decode(charset)
+        except LookupError: # e.g. charset=x-made-up
+            return self.body.decode('utf-8')
+
+
+class HttpCache:
+
+    def __init__(self, directory=CACHE_DIRECTORY, offline=False):
+        self.directory = directory
+        self.offline = offline
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'offline': 0}
+
+    def path(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key + '.gz') # 256 subdirectories, so no directory holds 20k files
+
+    def load(self, url):
+        """ The cached page for `url`, or None """
+
+        try:
+            with gzip.open(self.path(url), 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile, json.JSONDecodeError): # never cached, or a damaged file
+            return None
+        return CachedPage(header['url'], body, header['headers'], header['fetched_at'])
+
+    def save(self, url, body, headers):
+        """ Stores a 200 response (body bytes plus its headers), returns it as a CachedPage """
+
+        page = CachedPage(url, body, {name: headers[name] for name in STORED_HEADERS if headers.get(name)}, time.time())
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a temporary file, then swapped in, so a reader (or a crash) never sees half a page
+        temporary_path = path + '.tmp'
+        with gzip.open(temporary_path, 'wb') as f:
+            f.write(json.dumps({'url': url, 'headers': page.headers, 'fetched_at': page.fetched_at}).encode('utf-8') + b'\n')
+            f.write(body)
+        os.replace(temporary_path, path)
+        return page
+
+    def revalidated(self, page):
+        """ Records a 304 Not Modified for a cached page, returns it """
+
+        page.fetched_at = time.time()
+        self.stats['not_modified'] += 1
+        return page
+
+    def conditional_headers(self, page):
+        """ If-None-Match / If-Modified-Since for a cached page (empty if there's no page or it has no validators) """
+
+        headers = {}
+        if page is not None and page.headers.get('ETag'):
+            headers['If-None-Match'] = page.headers['ETag']
+        if page is not None and page.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = page.headers['Last-Modified']
+        return headers
+
+    def get(self, session, url, timeout=30):
+        """ Fetches a page with a requests.Session, through the cache. Returns the CachedPage (or raises PageNotCached offline) """
+
+        page = self.load(url)
+        if self.offline:
+            if page is None:
+                raise PageNotCached(url)
+            self.stats['offline'] += 1
+            return page
+
+        response = session.get(url, headers=self.conditional_headers(page), timeout=timeout)
+        if response.status_code == 304 and page is not None:
+            return self.revalidated(page)
+        response.raise_for_status()
+        self.stats['downloaded'] += 1
+        return self.save(url, response.content, response.headers)
@@ -1,8 +1,22 @@
+import os
+import sys
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # data_mining/, for the HTTP cache shared with the crawler
+from http_cache import HttpCache
 from general import *
 
+# Every page goes through the on-disk cache the crawler fills (set cache.offline to scrape without the network),
+# over one keep-alive session instead of a new connection per page
+cache = HttpCache()
+session = requests.Session()
+
+
+# fetch a page (through the cache) and parse it
+def fetch_document(hyperlink):
+    page = cache.get(session, hyperlink)
+    return BeautifulSoup(page.text, "html.parser")
 
 # search document for matching css class name
 def search_by_class(class_name, bs4_document):
@@ -10,8 +24,7 @@ def search_by_class(class_name, bs4_document):
     return field
 
 def fighter_page(hyperlink):
-    result = requests.get(hyperlink)
-    doc = BeautifulSoup(result.text, "html.parser")
+    doc = fetch_document(hyperlink)
 
     fighter_id = urlparse(hyperlink).path.split('/')[-1]  # Extract the last part of the URL
     name = search_by_class('b-content__title-highlight', doc)
@@ -73,8 +86,7 @@ def fighter_page(hyperlink):
 
 
 def bout_page(hyperlink):
-    result = requests.get(hyperlink)
-    doc = BeautifulSoup(result.text, "html.parser")
+    doc = fetch_document(hyperlink)
 
     bout_id = urlparse(hyperlink).path.split('/')[-1]  # Extract the last part of the URL
 
@@ -163,8 +175,7 @@ def bout_page(hyperlink):
 
 
 def event_page(hyperlink):
-    result = requests.get(hyperlink)
-    doc = BeautifulSoup(result.text, "html.parser")
+    doc = fetch_document(hyperlink)
 
     event_id = urlparse(hyperlink).path.split('/')[-1]  # Extract the last part of the URL
     name = search_by_class('b-content__title-highlight', doc)
@@ -193,4 +204,17 @@ def event_page(hyperlink):
         'bout_order': bout_order  # This will be filled later with bout IDs
     }
 
-    return event_data
\ No newline at end of file
+    return event_data
+
+
+def event_list_page(hyperlink):
+    doc = fetch_document(hyperlink)
+
+    # Links to every event on the list (newest first), e.g. http://ufcstats.com/statistics/events/completed?page=all
+    event_links = []
+    for link in doc.find_all('a', class_='b-link'):
+        href = urljoin(hyperlink, link.get('href', '').strip())
+        if '/event-details/' in href and href not in event_links:
+            event_links.append(href)
+
+    return event_links
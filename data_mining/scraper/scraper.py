@@ -1,46 +1,109 @@
+import argparse
 import logging
-from data_types import fighter_page, bout_page, event_page
+from data_types import fighter_page, bout_page, event_page, event_list_page, cache
+from http_cache import PageNotCached
 import json
 import os
 import time
+from urllib.parse import urlparse
 
-start_time = time.time()
-
-# Setup for logger
-log_file = "scraper.log"
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
 links_list = 'crawled_links.txt'
 
-# lists of dictionaries, each dictionary is a separate fighter, bout, or event
-fighters_list = []  
-bouts_list = []
-events_list = []
-
-with open(links_list, 'rt') as f:  # 'rt' for read text mode
-    for link in f:
-        link = link.replace('\n', '') # strip linebreaks that were nice for human readability
-        if 'fighter-details' in link: # fighter page
-            fighter = fighter_page(link)
-            logger.info(f"Scraped FIGHTER data: {fighter['name']} ({fighter['fighter_id']})")
-            fighters_list.append(fighter)
-        elif 'fight-details' in link: # bout page
-            bout = bout_page(link)
-            logger.info(f"Scraped BOUT data: ({bout['bout_id']})")
-            bouts_list.append(bout)
-        elif 'event-details' in link: # event page
-            event = event_page(link)
-            logger.info(f"Scraped EVENT data: {event['name']} ({event['event_id']})")
-            events_list.append(event)
+FIGHTERS_OUTPUT_FILE = "data/fighters.json"
+EVENTS_OUTPUT_FILE = "data/events.json"
+BOUTS_OUTPUT_FILE = "data/bouts.json"
+
+# What --incremental reads instead of crawled_links.txt: the lists of every event (newest first), and where bouts and fighters live
+EVENT_LISTS = ['http://ufcstats.com/statistics/events/completed?page=all', 'http://ufcstats.com/statistics/events/upcoming?page=all']
+BOUT_LINK = 'http://ufcstats.com/fight-details/'
+FIGHTER_LINK = 'http://ufcstats.com/fighter-details/'
+
+# scraped_data holds lists of dictionaries, each dictionary is a separate fighter, bout, or event:
+# {'fighters': [...], 'bouts': [...], 'events': [...]}
+def scrape_link(link, scraped_data):
+    if 'fighter-details' in link: # fighter page
+        fighter = fighter_page(link)
+        logger.info(f"Scraped FIGHTER data: {fighter['name']} ({fighter['fighter_id']})")
+        scraped_data['fighters'].append(fighter)
+    elif 'fight-details' in link: # bout page
+        bout = bout_page(link)
+        logger.info(f"Scraped BOUT data: ({bout['bout_id']})")
+        scraped_data['bouts'].append(bout)
+    elif 'event-details' in link: # event page
+        event = event_page(link)
+        logger.info(f"Scraped EVENT data: {event['name']} ({event['event_id']})")
+        scraped_data['events'].append(event)
+
+def scrape_links(links, scraped_data):
+    for link in links:
+        try:
+            scrape_link(link, scraped_data)
+        except PageNotCached: # offline, and the crawler never fetched this page
+            logger.warning(f"Not in the HTTP cache, skipped: {link}")
+
+
+def load_json_file(file_path):
+    """Load the records a previous run saved (an empty list if there aren't any)."""
+    if not os.path.isfile(file_path):
+        return []
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+def merge_records(saved_records, scraped_records, id_field):
+    """Scraped records replace the saved ones with the same id, new ones are added at the end."""
+    merged = {record[id_field]: record for record in saved_records}
+    merged.update((record[id_field], record) for record in scraped_records)
+    return list(merged.values())
+
+def last_completed_event_date(events, bouts):
+    """Date of the newest saved event with a result. Events scraped before they took place have none yet."""
+    decided_event_ids = {bout['event_id'] for bout in bouts if bout['result'] or bout['winning_fighter_id']}
+    return max((event['date'] for event in events if event['event_id'] in decided_event_ids), default=None)
+
+def select_event_links(listed_links, saved_events, saved_bouts):
+    """Every listed event we don't have complete data for: events newer than the last completed one, and upcoming events."""
+    last_completed = last_completed_event_date(saved_events, saved_bouts)
+    saved_dates = {event['event_id']: event['date'] for event in saved_events}
+
+    links = []
+    for link in listed_links:
+        event_id = urlparse(link).path.split('/')[-1]
+        if event_id in saved_dates and last_completed and saved_dates[event_id] <= last_completed:
+            continue # already complete (the lists are newest first, but a missed older event still gets picked up)
+        if link not in links:
+            links.append(link)
+    return links
+
+def new_event_links(saved_events, saved_bouts):
+    """Fetches the event lists, returns the events --incremental needs to scrape (see select_event_links)."""
+    logger.info(f"Last completed event in the saved data: {last_completed_event_date(saved_events, saved_bouts)}")
+    listed_links = [link for list_link in EVENT_LISTS for link in event_list_page(list_link)]
+    return select_event_links(listed_links, saved_events, saved_bouts)
+
+def scrape_incrementally(scraped_data):
+    """Scrapes what's new since the saved data/*.json, returns everything merged: {'fighters': [...], 'bouts': [...], 'events': [...]}"""
+    # A handful of pages per weekly refresh: the event lists, then each new event, its bouts, and the fighters in them
+    saved_events = load_json_file(EVENTS_OUTPUT_FILE)
+    saved_bouts = load_json_file(BOUTS_OUTPUT_FILE)
+    saved_fighters = load_json_file(FIGHTERS_OUTPUT_FILE)
+
+    scrape_links(new_event_links(saved_events, saved_bouts), scraped_data)
+    scrape_links([BOUT_LINK + bout_id for event in scraped_data['events'] for bout_id in event['bout_order']], scraped_data)
+    # Fighters are scraped again even if we have them, their records changed with the new bouts
+    fighter_ids = dict.fromkeys(fighter_id for bout in scraped_data['bouts'] for fighter_id in (bout['fighter_1_id'], bout['fighter_2_id']))
+    scrape_links([FIGHTER_LINK + fighter_id for fighter_id in fighter_ids], scraped_data)
+
+    if scraped_data['events']:
+        logger.info(f"Load the merged files into the database, then re-rate from the earliest new event: elo --since {min(event['date'] for event in scraped_data['events'])}")
+
+    return {
+        'fighters': merge_records(saved_fighters, scraped_data['fighters'], 'fighter_id'),
+        'bouts': merge_records(saved_bouts, scraped_data['bouts'], 'bout_id'),
+        'events': merge_records(saved_events, scraped_data['events'], 'event_id'),
+    }
 
 
 def save_to_json(output_file, ufc_data):
@@ -54,22 +117,53 @@ def create_json_file(file_path):
         with open(file_path, 'w') as f:
             json.dump([], f)  # Initialize with an empty list
 
-# Save data to JSON files
-fighters_output_file = "data/fighters.json"
-create_json_file(fighters_output_file)
-save_to_json(fighters_output_file, fighters_list)
 
-events_output_file = "data/events.json"
-create_json_file(events_output_file)
-save_to_json(events_output_file, events_list)
+def main():
+    parser = argparse.ArgumentParser(description="Scrape every crawled ufcstats page into data/*.json")
+    parser.add_argument('--offline', action='store_true', help="only read pages from the HTTP cache, never the network")
+    parser.add_argument('--incremental', action='store_true', help="only scrape events newer than the last completed one in data/*.json (plus their bouts and fighters), and merge them in")
+    args = parser.parse_args()
+    cache.offline = args.offline
+
+    start_time = time.time()
+
+    # Setup for logger
+    log_file = "scraper.log"
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+
+    scraped_data = {'fighters': [], 'bouts': [], 'events': []}
+    if args.incremental:
+        scraped_data = scrape_incrementally(scraped_data)
+    else:
+        with open(links_list, 'rt') as f:  # 'rt' for read text mode
+            scrape_links((link.replace('\n', '') for link in f), scraped_data) # strip linebreaks that were nice for human readability
+
+    # Save data to JSON files
+    create_json_file(FIGHTERS_OUTPUT_FILE)
+    save_to_json(FIGHTERS_OUTPUT_FILE, scraped_data['fighters'])
+
+    create_json_file(EVENTS_OUTPUT_FILE)
+    save_to_json(EVENTS_OUTPUT_FILE, scraped_data['events'])
+
+    create_json_file(BOUTS_OUTPUT_FILE)
+    save_to_json(BOUTS_OUTPUT_FILE, scraped_data['bouts'])
+
+    logger.info("HTTP cache: " + ", ".join(f"{count} {outcome}" for outcome, count in cache.stats.items()))
+
+    end_time = time.time()
+    elapsed_seconds = end_time - start_time
+    minutes = int(elapsed_seconds // 60)
+    seconds = int(elapsed_seconds % 60)
 
-bouts_output_file = "data/bouts.json"
-create_json_file(bouts_output_file)
-save_to_json(bouts_output_file, bouts_list)
+    logger.info(f"Scraping completed in {minutes} minutes and {seconds} seconds.")
 
-end_time = time.time()
-elapsed_seconds = end_time - start_time
-minutes = int(elapsed_seconds // 60)
-seconds = int(elapsed_seconds % 60)
 
-logger.info(f"Scraping completed in {minutes} minutes and {seconds} seconds.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Tests for the scraper, run from this directory: python -m unittest tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # data_mining/, for the HTTP cache shared with the crawler
+from http_cache import CachedPage, HttpCache, PageNotCached
+from scraper import last_completed_event_date, merge_records, select_event_links
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """ Serves one page with an ETag, answering a request that already has it with 304 Not Modified """
+
+    body = '<html><body>Jon Jones</body></html>'.encode('utf-8')
+    etag = '"v1"'
+    requests_seen = [] # (path, If-None-Match header)
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.path != '/fighter-details/07f72a2a7591b409':
+            self.send_response(404)
+            self.end_headers()
+        elif self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', self.etag)
+            self.send_header('Content-Length', str(len(self.body)))
+            self.end_headers()
+            self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass # keep the test output quiet
+
+
+class HttpCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        FixtureHandler.requests_seen = []
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f'http://127.0.0.1:{server.server_address[1]}/fighter-details/07f72a2a7591b409'
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+    def test_conditional_get(self):
+        cache = HttpCache(self.directory)
+        first = cache.get(self.session, self.url)
+        second = cache.get(self.session, self.url)
+
+        # The first fetch downloads and stores the page, the second sends its ETag and gets a 304 (no body)
+        self.assertEqual(FixtureHandler.requests_seen, [('/fighter-details/07f72a2a7591b409', None), ('/fighter-details/07f72a2a7591b409', '"v1"')])
+        self.assertEqual(first.text, second.text)
+        self.assertEqual(second.text, '<html><body>Jon Jones</body></html>')
+        self.assertEqual(cache.stats, {'downloaded': 1, 'not_modified': 1, 'offline': 0})
+
+        # The stored copy (body and validators) survives in a new cache object, e.g. the next run
+        stored = HttpCache(self.directory).load(self.url)
+        self.assertEqual((stored.body, stored.headers['ETag']), (FixtureHandler.body, '"v1"'))
+
+    def test_offline_never_touches_the_network(self):
+        HttpCache(self.directory).get(self.session, self.url)
+        cache = HttpCache(self.directory, offline=True)
+
+        self.assertEqual(cache.get(self.session, self.url).text, '<html><body>Jon Jones</body></html>')
+        with self.assertRaises(PageNotCached):
+            cache.get(self.session, self.url.replace('07f72a2a7591b409', '93fe7332d16c6ad9'))
+        self.assertEqual(len(FixtureHandler.requests_seen), 1)
+        self.assertEqual(cache.stats, {'downloaded': 0, 'not_modified': 0, 'offline': 1})
+
+    def test_text_uses_the_declared_charset(self):
+        body = 'José Aldo'.encode('latin-1')
+        for content_type, text in [
+            ('text/html; charset=ISO-8859-1', 'José Aldo'),
+            ('text/html; charset="iso-8859-1"', 'José Aldo'), # quoted
+            ('text/html;Charset=latin-1;foo=bar', 'José Aldo'),
+        ]:
+            with self.subTest(content_type=content_type):
+                self.assertEqual(CachedPage(self.url, body, {'Content-Type': content_type}, 0).text, text)
+
+        # Missing or unknown charsets fall back to utf-8, instead of raising LookupError
+        body = 'José Aldo'.encode('utf-8')
+        for content_type in ['text/html', 'text/html; charset=x-made-up', 'text/html; charset=""']:
+            with self.subTest(content_type=content_type):
+                self.assertEqual(CachedPage(self.url, body, {'Content-Type': content_type}, 0).text, 'José Aldo')
+
+
+def event_link(event_id):
+    return f'http://ufcstats.com/event-details/{event_id}'
+
+def bout(bout_id, event_id, result):
+    return {'bout_id': bout_id, 'event_id': event_id, 'result': result, 'winning_fighter_id': 'f1' if result == 'Win/Loss' else None}
+
+
+class IncrementalScrapeTest(unittest.TestCase):
+
+    saved_events = [
+        {'event_id': 'e1', 'date': '2025-06-07', 'name': 'UFC 1'},
+        {'event_id': 'e2', 'date': '2025-06-28', 'name': 'UFC 2'},
+        {'event_id': 'e3', 'date': '2025-07-12', 'name': 'UFC 3'}, # scraped before it took place
+    ]
+    saved_bouts = [bout('b1', 'e1', 'Win/Loss'), bout('b2', 'e2', 'Draw'), bout('b3', 'e3', None)]
+
+    def test_merge_records_by_id(self):
+        saved = [{'event_id': 'e1', 'name': 'Old'}, {'event_id': 'e2', 'name': 'Kept'}]
+        scraped = [{'event_id': 'e3', 'name': 'New'}, {'event_id': 'e1', 'name': 'Updated'}]
+
+        # Rescraped records replace the saved ones in place, new ones go at the end
+        self.assertEqual(merge_records(saved, scraped, 'event_id'), [
+            {'event_id': 'e1', 'name': 'Updated'}, {'event_id': 'e2', 'name': 'Kept'}, {'event_id': 'e3', 'name': 'New'},
+        ])
+        self.assertEqual(merge_records([], scraped, 'event_id'), scraped)
+        self.assertEqual(merge_records(saved, [], 'event_id'), saved)
+
+    def test_last_completed_event_is_the_newest_with_a_result(self):
+        self.assertEqual(last_completed_event_date(self.saved_events, self.saved_bouts), '2025-06-28') # e2's draw counts
+        self.assertIsNone(last_completed_event_date(self.saved_events, [bout('b3', 'e3', None)]))
+        self.assertIsNone(last_completed_event_date([], []))
+
+    def test_selects_newer_and_upcoming_events(self):
+        # The completed list (newest first), then the upcoming one
+        listed_links = [event_link(event_id) for event_id in ['e5', 'e4', 'e3', 'e2', 'e1', 'e0', 'u1']]
+
+        # e4/e5 are new, e3 never got its results, u1 is upcoming, e0 was missed by an earlier scrape
+        self.assertEqual(
+            select_event_links(listed_links, self.saved_events, self.saved_bouts),
+            [event_link(event_id) for event_id in ['e5', 'e4', 'e3', 'e0', 'u1']]
+        )
+
+    def test_selects_everything_without_saved_results(self):
+        listed_links = [event_link('e2'), event_link('e1'), event_link('e1')]
+        self.assertEqual(select_event_links(listed_links, [], []), [event_link('e2'), event_link('e1')])
+        self.assertEqual(select_event_links(listed_links, self.saved_events, [bout('b3', 'e3', None)]), [event_link('e2'), event_link('e1')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,11 @@
 import type { AxiosResponse } from 'axios';
 import { api } from './client.ts';
 import type { Event } from '../types/event.types.ts';
-import type { Fighter } from '@/types/fighter.types.ts';
+import type { Fighter, EloHistory } from '@/types/fighter.types.ts';
 
 // Define the shape of your paginated response from the backend
 export interface PaginatedResponse {
-    count: number;
+    count?: number; // only on page-number lists, the keyset-paginated events/fighters lists don't count their rows
     next: string | null; // URL for the next page
     previous: string | null; // URL for the previous page
     results: Event[] | Fighter[]; // Array of items for the current page
@@ -17,7 +17,7 @@ type IndividualItem = Event | Fighter;
  * Fetches a list of events from the API.
  * Accepts a full URL for the endpoint (including pagination params).
  *
- * @param endpointUrl The full URL to fetch (e.g., '/api/events/' or '/api/events/?page=2').
+ * @param endpointUrl The full URL to fetch (e.g., '/api/events/' or '/api/events/?cursor=...').
  * @returns A promise resolving to the paginated events response.
  */
 export const getItems = async (endpointUrl: string): Promise<AxiosResponse<PaginatedResponse, any>> => {
@@ -29,3 +29,17 @@ export const getItems = async (endpointUrl: string): Promise<AxiosResponse<Pagin
 export const getItemById = async (id: string, collection: string): Promise<AxiosResponse<IndividualItem, any>> => {
     return await api.get<IndividualItem>(`/api/${collection}/${id}`);
 };
+
+/**
+ * Fetches a fighter's rating history for a chart, windowed and downsampled by the API.
+ *
+ * @param fighterId The fighter to chart.
+ * @param options Optional `from`/`to` dates (YYYY-MM-DD, inclusive) and the most `points` to return (default 100).
+ * @returns A promise resolving to the history, at most `points` points however long the career.
+ */
+export const getEloHistory = async (
+    fighterId: string,
+    options: { from?: string; to?: string; points?: number } = {}
+): Promise<AxiosResponse<EloHistory, any>> => {
+    return await api.get<EloHistory>(`/api/fighters/${fighterId}/elo-history/`, { params: options });
+};
@@ -12,33 +12,41 @@ import {
   ChartTooltipContent,
 } from "@/components/ui/chart"
 import type { ChartConfig } from "@/components/ui/chart"
+import { useQuery } from '@tanstack/react-query'
 import { formatDate } from '../lib/dateUtils.ts'
+import { getEloHistory } from '@/api/queries.ts'
 import type { Fighter } from '@/types/fighter.types.ts'
 
 export const description = "A linear line chart"
 
 export const chartConfig = {
-  ending_elo: {
+  elo: {
     label: "Elo Rating",
     color: "var(--chart-3)",
   },
 } satisfies ChartConfig
 
-const FighterEloChart = ( fighter: Fighter ) => {
+const FighterEloChart = ({ fighter }: { fighter: Fighter }) => {
+  // The chart has its own (small, downsampled) request, instead of plotting the fighter payload's full elo_history
+  const { data: history } = useQuery({
+    queryKey: ['fighters', fighter.fighter_id, 'elo-history'],
+    queryFn: () => getEloHistory(fighter.fighter_id),
+  });
+  const points = history?.data.points ?? [];
 
   return (
     <Card>
       <CardHeader>
         <div className="flex">
             <CardTitle>Fighter Rating History</CardTitle>
-            {fighter?.elo_history && <CardDescription className="ml-5">{formatDate(fighter?.elo_history[0].date)} - {formatDate(fighter?.elo_history[fighter.elo_history.length - 1].date)}</CardDescription>}
+            {points.length > 0 && <CardDescription className="ml-5">{formatDate(points[0].date)} - {formatDate(points[points.length - 1].date)}</CardDescription>}
         </div>
       </CardHeader>
       <CardContent>
         <ChartContainer config={chartConfig}>
           <LineChart
             accessibilityLayer
-            data={fighter.elo_history}
+            data={points}
             margin={{
               left: 12,
               right: 12,
@@ -64,12 +72,12 @@ const FighterEloChart = ( fighter: Fighter ) => {
               />}
             />
             <Line
-              dataKey="ending_elo"
+              dataKey="elo"
               type="linear"
-              stroke="var(--color-ending_elo)"
+              stroke="var(--color-elo)"
               strokeWidth={2}
               dot={{
-                fill: "var(--color-ending_elo)",
+                fill: "var(--color-elo)",
               }}
               activeDot={{
                 r: 6,
@@ -54,7 +54,7 @@ const LoginForm: React.FC = () => {
             
                 if (access && refresh) {
                     login(access, refresh);
-                    navigate({ to: '/events', replace: true, search: { page: 1 } });
+                    navigate({ to: '/events', replace: true, search: {} });
                 } else {
                     // If for some reason tokens are missing, set a manual error
                     form.setError("root.serverError", {
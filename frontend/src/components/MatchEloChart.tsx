@@ -11,7 +11,9 @@ import {
   ChartTooltip,
   ChartTooltipContent,
 } from "@/components/ui/chart";
+import { useQuery } from "@tanstack/react-query";
 import { formatDate } from "../lib/dateUtils.ts";
+import { getEloHistory } from "@/api/queries.ts";
 import type { Fighter } from "@/types/fighter.types.ts";
 
 export const description = "A linear line chart, plotting the ratings across time for two fighters";
@@ -39,27 +41,35 @@ const MatchEloChart = ({ fighter1, fighter2 }: { fighter1: Fighter; fighter2: Fi
     },
   };
 
+  // Each line comes from the (downsampled) history endpoint, so the chart's payload stays small however long the careers
+  const { data: history1 } = useQuery({
+    queryKey: ["fighters", fighter1.fighter_id, "elo-history"],
+    queryFn: () => getEloHistory(fighter1.fighter_id),
+  });
+  const { data: history2 } = useQuery({
+    queryKey: ["fighters", fighter2.fighter_id, "elo-history"],
+    queryFn: () => getEloHistory(fighter2.fighter_id),
+  });
+  const fighter1Points = history1?.data.points ?? [];
+  const fighter2Points = history2?.data.points ?? [];
+
   const combinedDataMap = new Map();
 
-  if (fighter1.elo_history && fighter1.elo_history.length > 0) {
-    fighter1.elo_history.forEach((dataPoint) => {
-      combinedDataMap.set(dataPoint.date, {
-        date: dataPoint.date,
-        fighter1_elo: dataPoint.ending_elo,
-      });
+  fighter1Points.forEach((dataPoint) => {
+    combinedDataMap.set(dataPoint.date, {
+      date: dataPoint.date,
+      fighter1_elo: dataPoint.elo,
     });
-  }
-
-  if (fighter2.elo_history && fighter2.elo_history.length > 0) {
-    fighter2.elo_history.forEach((dataPoint) => {
-      const existingData = combinedDataMap.get(dataPoint.date);
-      combinedDataMap.set(dataPoint.date, {
-        ...existingData,
-        date: dataPoint.date,
-        fighter2_elo: dataPoint.ending_elo,
-      });
+  });
+
+  fighter2Points.forEach((dataPoint) => {
+    const existingData = combinedDataMap.get(dataPoint.date);
+    combinedDataMap.set(dataPoint.date, {
+      ...existingData,
+      date: dataPoint.date,
+      fighter2_elo: dataPoint.elo,
     });
-  }
+  });
 
   // Sort the combined data by date
   const sortedData = Array.from(combinedDataMap.values()).sort(
@@ -89,11 +99,11 @@ const MatchEloChart = ({ fighter1, fighter2 }: { fighter1: Fighter; fighter2: Fi
   //   };
   // });
 
-  const lastDateFighter1 = fighter1.elo_history && fighter1.elo_history.length > 0
-    ? fighter1.elo_history[fighter1.elo_history.length - 1].date
+  const lastDateFighter1 = fighter1Points.length > 0
+    ? fighter1Points[fighter1Points.length - 1].date
     : null;
-  const lastDateFighter2 = fighter2.elo_history && fighter2.elo_history.length > 0
-    ? fighter2.elo_history[fighter2.elo_history.length - 1].date
+  const lastDateFighter2 = fighter2Points.length > 0
+    ? fighter2Points[fighter2Points.length - 1].date
     : null;
 
   let lastFighter1Elo: number | null = null;
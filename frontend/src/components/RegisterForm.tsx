@@ -61,7 +61,7 @@ export function RegisterForm() {
 
         if (access && refresh && newUser.id && newUser.username) {
           login(access, refresh, newUser);
-          navigate({ to: '/events', replace: true, search: { page: 1 } });
+          navigate({ to: '/events', replace: true, search: {} });
         } else {
           // If for some reason tokens are missing, set a manual error
           form.setError("root.serverError", {
@@ -1,32 +1,30 @@
 /**
- * Extracts the 'page' query parameter as a number from a given URL string.
+ * Extracts the 'cursor' query parameter from a given URL string (the next/previous links of a list response).
  *
- * @param url A URL string (e.g., "http://127.0.0.1:8000/api/events/?page=2").
- * @returns The page number as a number, or undefined if not found or invalid.
+ * @param url A URL string (e.g., "http://127.0.0.1:8000/api/events/?cursor=eyJwIjpb...").
+ * @returns The cursor string, or undefined if not found or invalid (undefined also means the first page).
  */
-export function getPageParamFromUrl(url: string | null): number | undefined {
+export function getCursorParamFromUrl(url: string | null): string | undefined {
   if (!url) {
     return undefined;
   }
   try {
     const urlObj = new URL(url);
-    const page = urlObj.searchParams.get('page');
-    // Return page as number, or 1 if no page param (default first page)
-    return page ? parseInt(page, 10) : 1;
+    return urlObj.searchParams.get('cursor') ?? undefined;
   } catch (e) {
-    console.error("Invalid URL for page param extraction:", url, e);
+    console.error("Invalid URL for cursor param extraction:", url, e);
     return undefined;
   }
 }
 
 /**
- * Constructs a full API URL for events based on a page number.
+ * Constructs a full API URL for a list (events, fighters) based on a page cursor.
  *
- * @param page The page number.
- * @returns The API URL string (e.g., "/api/events/?page=2").
+ * @param cursor The page cursor, as returned in the previous response's next/previous links.
+ * @returns The API URL string (e.g., "/api/events/?cursor=eyJwIjpb...").
  */
-export function constructItemsApiUrl(page: number | undefined, collection: string | undefined): string {
-    // If page is undefined or 1, fetch the base URL (first page).
-    // Otherwise, construct the URL with the page query parameter.
-    return page && page > 1 ? `/api/${collection}/?page=${page}` : `/api/${collection}/`;
-}
\ No newline at end of file
+export function constructItemsApiUrl(cursor: string | undefined, collection: string | undefined): string {
+    // If there is no cursor, fetch the base URL (first page).
+    // Otherwise, construct the URL with the cursor query parameter.
+    return cursor ? `/api/${collection}/?cursor=${encodeURIComponent(cursor)}` : `/api/${collection}/`;
+}
@@ -5,7 +5,7 @@ import type { PaginatedResponse } from '../../../api/queries.ts';
 import { getItems } from '../../../api/queries.ts';
 import type { Event } from '../../../types/event.types.ts';
 import { formatDate, isFutureDate } from '../../../lib/dateUtils.ts';
-import { getPageParamFromUrl, constructItemsApiUrl } from '../../../lib/urlUtils.ts';
+import { getCursorParamFromUrl, constructItemsApiUrl } from '../../../lib/urlUtils.ts';
 
 import { Section } from "@/components/ui/section";
 import { cn } from "@/lib/utils";
@@ -15,37 +15,21 @@ import { Spinner } from '@/components/ui/spinner.tsx';
 
 export const Route = createFileRoute('/_authenticated/events/')({
   component: EventsIndex,
-  validateSearch: (rawSearch: Record<string, unknown>): { page: number } => {
+  validateSearch: (rawSearch: Record<string, unknown>): { cursor?: string } => {
     // ensure rawSearch is an object (or empty object if undefined/null) - utilizing tanstack router search for pagination
-    // this is a safeguard to ensure we always return an object with a 'page' property
-    // if rawSearch is not an object, we default to an empty object
-    // this allows us to safely access properties like rawSearch.page without TypeErrors
     const actualSearch = rawSearch && typeof rawSearch === 'object' ? rawSearch : {};
 
-    let pageNumber: number;
-    const pageParam = actualSearch.page;
-
-    // Safely parse page number, defaulting to 1 if invalid
-    if (typeof pageParam === 'string' || typeof pageParam === 'number') {
-      pageNumber = Number(pageParam);
-      if (isNaN(pageNumber) || pageNumber < 1) {
-        pageNumber = 1;
-      }
-    } else {
-      pageNumber = 1;
-    }
-    return { page: pageNumber }; // Always return an object with a valid 'page' number
+    // The API pages with opaque cursors (see api/pagination.py), no cursor means the first page
+    const cursorParam = actualSearch.cursor;
+    return typeof cursorParam === 'string' && cursorParam ? { cursor: cursorParam } : {};
   },
   loader: async ({ context: { queryClient }, search }) => {
-    // (search?.page ?? 1) will provide a fallback if search equates to falsy
-    const currentPage = (search?.page ?? 1);
-
-    // construct the API URL based on the current page
-    const apiUrl = constructItemsApiUrl(currentPage, "events");
+    // construct the API URL based on the current page's cursor (undefined on the first page)
+    const apiUrl = constructItemsApiUrl(search?.cursor, "events");
     
     // The queryKey MUST include the specific URL to ensure unique caching per page
     return queryClient.ensureQueryData({
-      queryKey: ['events', apiUrl], // Dynamic query key: ['events', '/api/events/?page=X']
+      queryKey: ['events', apiUrl], // Dynamic query key: ['events', '/api/events/?cursor=X']
       queryFn: () => getItems(apiUrl), // pass the constructed URL to fetch specific page
       staleTime: 1000 * 60 * 5, // add cache stale time... refresh after 5 mins
     });
@@ -56,8 +40,8 @@ export const Route = createFileRoute('/_authenticated/events/')({
 
 
 function EventsIndex() {
-  const { page: currentPage } = Route.useSearch();
-  const currentApiUrl = constructItemsApiUrl(currentPage, "events");
+  const { cursor: currentCursor } = Route.useSearch();
+  const currentApiUrl = constructItemsApiUrl(currentCursor, "events");
 
   const { data: axiosResponse } = useSuspenseQuery<PaginatedResponse, Error, PaginatedResponse, ['events', string]>({
     queryKey: ['events', currentApiUrl],
@@ -71,19 +55,11 @@ function EventsIndex() {
   const events = eventsData.results || []; // 'events' is finally the array of Event objects
   // console.log('DEBUG: Filtered events array (should contain results if API sent them):', events);
 
-  // Calculate next and previous page numbers using the utility function
-  const nextPageNumber = eventsData.next ? getPageParamFromUrl(eventsData.next) : undefined;
-  const previousPageNumber = eventsData.previous ? getPageParamFromUrl(eventsData.previous) : undefined;
-
-  // Improved pagination display!:
-  // With a page size of 20 items, calculate the range of items displayed
-  const pageSize = 20; // Assuming 20 items per page
-  const totalEvents = eventsData.count;
-  const totalPages = Math.ceil(totalEvents / pageSize);
-
-  const startItem = (currentPage - 1) * pageSize + 1;
-  // Ensure endItem does not exceed totalEvents if it's the last page
-  const endItem = Math.min(currentPage * pageSize, totalEvents);
+  // Cursors for the next and previous pages, using the utility function
+  // (the list has no page count: every page is fetched by its cursor, so deep pages cost the same as the first one)
+  const nextCursor = eventsData.next ? getCursorParamFromUrl(eventsData.next) : undefined;
+  const hasPreviousPage = Boolean(eventsData.previous);
+  const previousCursor = hasPreviousPage ? getCursorParamFromUrl(eventsData.previous) : undefined;
 
   return (
     <Section
@@ -143,21 +119,16 @@ function EventsIndex() {
         </div>
 
         {/* Pagination Controls */}
-        {totalEvents > 0 && ( // if there are events...
+        {(events.length > 0 || hasPreviousPage) && ( // if there are events...
           <div className="animate-appear flex flex-col items-center mt-6">
-            {/* Items Counter */}
-            <div className="text-lg text-brand font-medium mb-5">
-              Displaying {startItem} - {endItem} of {totalEvents} events
-            </div>
-
             {/* Pagination Controls */}
             <div className="flex justify-center items-center">
               {/* First Page Link */}
-              {currentPage > 1 && totalPages > 1 ? (
+              {currentCursor ? (
                 <Button asChild>
                   <Link
                     to="."
-                    search={{ page: 1 }}
+                    search={{}}
                   >
                     {`<<`}
                   </Link>
@@ -169,11 +140,11 @@ function EventsIndex() {
               )}
 
               {/* Previous Page Link */}
-              {previousPageNumber !== undefined ? (
+              {hasPreviousPage ? (
                 <Button asChild>
                   <Link
                     to="."
-                    search={{ page: previousPageNumber }}
+                    search={previousCursor ? { cursor: previousCursor } : {}}
                     className="ml-2"
                   >
                     {`<`}
@@ -186,14 +157,14 @@ function EventsIndex() {
               )}
 
               {/* Current Page Indicator */}
-              <span className="text-lg font-medium mx-4">Page {currentPage} of {totalPages}</span>
+              <span className="text-lg font-medium mx-4">{currentCursor ? 'More events' : 'Page 1'}</span>
 
               {/* Next Page Link */}
-              {nextPageNumber !== undefined ? (
+              {nextCursor !== undefined ? (
                 <Button asChild>
                   <Link
                     to="."
-                    search={{ page: nextPageNumber }}
+                    search={{ cursor: nextCursor }}
                     className="mr-2"
                   >
                     {`>`}
@@ -204,22 +175,6 @@ function EventsIndex() {
                   {`>`}
                 </Button>
               )}
-
-              {/* Last Page Link */}
-              {currentPage < totalPages && totalPages > 1 ? (
-                <Button asChild>
-                  <Link
-                    to="."
-                    search={{ page: totalPages }}
-                  >
-                    {`>>`}
-                  </Link>
-                </Button>
-              ) : (
-                <Button asChild>
-                  {`>>`}
-                </Button>
-              )}
             </div>
           </div>
         )}
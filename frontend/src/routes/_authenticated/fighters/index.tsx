@@ -5,7 +5,7 @@ import type { PaginatedResponse } from '../../../api/queries.ts';
 import { getItems } from '../../../api/queries.ts';
 import type { Fighter } from '../../../types/fighter.types.ts';
 import { calculateAge, formatDate } from '../../../lib/dateUtils.ts';
-import { getPageParamFromUrl, constructItemsApiUrl } from '../../../lib/urlUtils.ts';
+import { getCursorParamFromUrl, constructItemsApiUrl } from '../../../lib/urlUtils.ts';
 import { Button } from '@/components/ui/button.tsx';
 import { Section } from "@/components/ui/section";
 import { cn } from "@/lib/utils";
@@ -14,34 +14,21 @@ import { Spinner } from '@/components/ui/spinner.tsx';
 
 export const Route = createFileRoute('/_authenticated/fighters/')({
   component: FightersIndex,
-  validateSearch: (rawSearch: Record<string, unknown>): { page: number } => {
+  validateSearch: (rawSearch: Record<string, unknown>): { cursor?: string } => {
     // ensure rawSearch is an object (or empty object if undefined/null)
     const actualSearch = rawSearch && typeof rawSearch === 'object' ? rawSearch : {};
 
-    let pageNumber: number;
-    const pageParam = actualSearch.page;
-
-    // Safely parse page number, defaulting to 1 if invalid
-    if (typeof pageParam === 'string' || typeof pageParam === 'number') {
-      pageNumber = Number(pageParam);
-      if (isNaN(pageNumber) || pageNumber < 1) {
-        pageNumber = 1;
-      }
-    } else {
-      pageNumber = 1;
-    }
-    return { page: pageNumber }; // Always return an object with a valid 'page' number
+    // The API pages with opaque cursors (see api/pagination.py), no cursor means the first page
+    const cursorParam = actualSearch.cursor;
+    return typeof cursorParam === 'string' && cursorParam ? { cursor: cursorParam } : {};
   },
   loader: async ({ context: { queryClient }, search }) => {
-    // (search?.page ?? 1) will provide a fallback if search equates to falsy
-    const currentPage = (search?.page ?? 1);
-
-    // construct the API URL based on the current page
-    const apiUrl = constructItemsApiUrl(currentPage, "fighters");
+    // construct the API URL based on the current page's cursor (undefined on the first page)
+    const apiUrl = constructItemsApiUrl(search?.cursor, "fighters");
 
     // The queryKey MUST include the specific URL to ensure unique caching per page
     return queryClient.ensureQueryData({
-      queryKey: ['fighters', apiUrl], // Dynamic query key: ['fighters', '/api/fighters/?page=X']
+      queryKey: ['fighters', apiUrl], // Dynamic query key: ['fighters', '/api/fighters/?cursor=X']
       queryFn: () => getItems(apiUrl), // pass the constructed URL to fetch specific page
       staleTime: 1000 * 60 * 5, // add cache stale time... refresh after 5 mins
     });
@@ -52,8 +39,8 @@ export const Route = createFileRoute('/_authenticated/fighters/')({
 
 
 function FightersIndex() {
-  const { page: currentPage } = Route.useSearch();
-  const currentApiUrl = constructItemsApiUrl(currentPage, "fighters");
+  const { cursor: currentCursor } = Route.useSearch();
+  const currentApiUrl = constructItemsApiUrl(currentCursor, "fighters");
 
   const { data: axiosResponse } = useSuspenseQuery<PaginatedResponse, Error, PaginatedResponse, ['fighters', string]>({
     queryKey: ['fighters', currentApiUrl],
@@ -67,19 +54,11 @@ function FightersIndex() {
   const fighters = fightersData.results || []; // 'fighters' is finally the array of Fighter objects
   // console.log('DEBUG: Filtered fighters array (should contain results if API sent them):', fighters);
 
-  // Calculate next and previous page numbers using the utility function
-  const nextPageNumber = fightersData.next ? getPageParamFromUrl(fightersData.next) : undefined;
-  const previousPageNumber = fightersData.previous ? getPageParamFromUrl(fightersData.previous) : undefined;
-
-  // Improved pagination display!:
-  // With a page size of 20 items, calculate the range of items displayed
-  const pageSize = 20; // Assuming 20 items per page
-  const totalFighters = fightersData.count;
-  const totalPages = Math.ceil(totalFighters / pageSize);
-
-  const startItem = (currentPage - 1) * pageSize + 1;
-  // Ensure endItem does not exceed totalFighters if it's the last page
-  const endItem = Math.min(currentPage * pageSize, totalFighters);
+  // Cursors for the next and previous pages, using the utility function
+  // (the list has no page count: every page is fetched by its cursor, so deep pages cost the same as the first one)
+  const nextCursor = fightersData.next ? getCursorParamFromUrl(fightersData.next) : undefined;
+  const hasPreviousPage = Boolean(fightersData.previous);
+  const previousCursor = hasPreviousPage ? getCursorParamFromUrl(fightersData.previous) : undefined;
 
   console.log('fighters: ', fighters)
 
@@ -169,21 +148,16 @@ function FightersIndex() {
 
 
         {/* Pagination Controls */}
-        {totalFighters > 0 && ( // if there are fighters...
+        {(fighters.length > 0 || hasPreviousPage) && ( // if there are fighters...
           <div className="animate-appear flex flex-col items-center mt-6">
-            {/* Items Counter */}
-            <div className="text-lg text-brand font-medium mb-5">
-              Displaying {startItem} - {endItem} of {totalFighters} fighters
-            </div>
-
             {/* Pagination Controls */}
             <div className="flex justify-center items-center">
               {/* First Page Link */}
-              {currentPage > 1 && totalPages > 1 ? (
+              {currentCursor ? (
                 <Button asChild>
                   <Link
                     to="."
-                    search={{ page: 1 }}
+                    search={{}}
                   >
                     {`<<`}
                   </Link>
@@ -195,11 +169,11 @@ function FightersIndex() {
               )}
 
               {/* Previous Page Link */}
-              {previousPageNumber !== undefined ? (
+              {hasPreviousPage ? (
                 <Button asChild>
                   <Link
                     to="."
-                    search={{ page: previousPageNumber }}
+                    search={previousCursor ? { cursor: previousCursor } : {}}
                     className="ml-2"
                   >
                     {`<`}
@@ -212,14 +186,14 @@ function FightersIndex() {
               )}
 
               {/* Current Page Indicator */}
-              <span className="text-lg font-medium mx-4">Page {currentPage} of {totalPages}</span>
+              <span className="text-lg font-medium mx-4">{currentCursor ? 'More fighters' : 'Page 1'}</span>
 
               {/* Next Page Link */}
-              {nextPageNumber !== undefined ? (
+              {nextCursor !== undefined ? (
                 <Button asChild>
                   <Link
                     to="."
-                    search={{ page: nextPageNumber }}
+                    search={{ cursor: nextCursor }}
                     className="mr-2"
                   >
                     {`>`}
@@ -230,22 +204,6 @@ function FightersIndex() {
                   {`>`}
                 </Button>
               )}
-
-              {/* Last Page Link */}
-              {currentPage < totalPages && totalPages > 1 ? (
-                <Button asChild>
-                  <Link
-                    to="."
-                    search={{ page: totalPages }}
-                  >
-                    {`>>`}
-                  </Link>
-                </Button>
-              ) : (
-                <Button asChild>
-                  {`>>`}
-                </Button>
-              )}
             </div>
           </div>
         )}
@@ -1,7 +1,7 @@
 // @ts-nocheck
 import { useEffect, useState } from 'react';
 import { createFileRoute, useLocation, Link } from '@tanstack/react-router';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery } from '@tanstack/react-query';
 import { api } from '../../../api/client.ts';
 import { Button } from '@/components/ui/button';
 import { formatDate } from '../../../lib/dateUtils.ts'
@@ -26,12 +26,16 @@ interface EventResult {
 }
 type SearchResult = FighterResult | EventResult;
 
-const fetchSearchResults = async (searchTerm: string): Promise<SearchResult[]> => {
-  if (!searchTerm) {
-    return [];
-  }
+// One page of results, ranked by relevance. `next` is the URL of the following page (null on the last page)
+interface SearchPage {
+  next: string | null;
+  previous: null;
+  results: SearchResult[];
+}
+
+const fetchSearchResults = async (searchTerm: string, pageUrl: string | null): Promise<SearchPage> => {
   try {
-    const response = await api.get(`/api/search/?q=${encodeURIComponent(searchTerm)}`);
+    const response = await api.get(pageUrl ?? `/api/search/?q=${encodeURIComponent(searchTerm)}`);
     return response.data;
   } catch (error) {
     console.error("Failed to fetch search results:", error);
@@ -65,18 +69,26 @@ function SearchResultsPage() {
   }, [location.state]); // Re-run effect if location state changes
 
   const {
-    data: results,
+    data,
     isLoading,
     isError,
     error,
-    isFetching
-  } = useQuery<SearchResult[], Error>({
+    isFetching,
+    isFetchingNextPage,
+    fetchNextPage,
+    hasNextPage,
+  } = useInfiniteQuery<SearchPage, Error>({
     queryKey: ['searchResults', q],
-    queryFn: () => fetchSearchResults(q),
+    queryFn: ({ pageParam }) => fetchSearchResults(q, pageParam as string | null),
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.next,
     // Only enable the query if there's a valid search term and NO validation errors
     enabled: !!q && !validationError,
     // staleTime: 24 * 60 * 60 * 1000, // 1 day
   });
+  const results = data?.pages.flatMap((page) => page.results);
+  // Loading more results keeps the ones already on screen
+  const isRefreshing = isFetching && !isFetchingNextPage;
 
   return (
     <div className="container mx-auto p-4 max-w-3xl">
@@ -90,15 +102,17 @@ function SearchResultsPage() {
       {!q && !validationError && ( // initial state... OR after a direct navigation without query/error
         (<p className="text-center text-lg text-brand">Enter a search term in the header to find results.</p>)
       )}
-      {(isLoading || isFetching) && q && !validationError && (
+      {(isLoading || isRefreshing) && q && !validationError && (
         <p className="text-brand text-center text-lg">Searching for "{q}"...</p>
       )}
       {isError && q && !validationError && (
         <p className="text-brand text-center text-lg">Error: {error?.message}</p>
       )}
-      {results && results.length > 0 && q && !isFetching && !validationError && (
+      {results && results.length > 0 && q && !isRefreshing && !validationError && (
         <>
-          <p className="text-brand text-center mb-4">Found {results.length} results for "{q}"</p>
+          <p className="text-brand text-center mb-4">
+            Showing {results.length}{hasNextPage ? '+' : ''} results for "{q}"
+          </p>
           <ul className="space-y-4">
             {results.map((item) => (
               <li key={`${item.type}-${item.type === 'fighter' ? item.fighter_id : item.event_id}`}
@@ -136,9 +150,16 @@ function SearchResultsPage() {
               </li>
             ))}
           </ul>
+          {hasNextPage && (
+            <div className="flex justify-center mt-6">
+              <Button variant="secondary" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                {isFetchingNextPage ? 'Loading...' : 'Load more results'}
+              </Button>
+            </div>
+          )}
         </>
       )}
-      {results && results.length === 0 && q && !isFetching && !isLoading && !validationError && (
+      {results && results.length === 0 && q && !isRefreshing && !isLoading && !validationError && (
         <p className="text-brand text-center text-lg">No results found for "{q}".</p>
       )}
     </div>
@@ -10,7 +10,7 @@ export const Route = createFileRoute('/register')({
     if (isLoggedIn) {
       // console.log("User is already logged in, redirecting from /login to /events.");
       // If they are logged in, redirect them to /events
-      throw redirect({ to: '/events', search: { page: 1 }, replace: true })
+      throw redirect({ to: '/events', search: {}, replace: true })
     }
   },
   component: () => <RegisterForm />,
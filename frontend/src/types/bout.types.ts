@@ -1,12 +1,20 @@
 import type { Event } from './event.types.ts';
 import type { Fighter } from './fighter.types.ts';
 
+// Fighters nested in a bout are compact by default (the full Fighter comes back with ?expand=fighters)
+export interface BoutFighter {
+    fighter_id: string;
+    name: string;
+    starting_elo: number | null; // null for upcoming bouts
+    ending_elo: number | null;
+}
+
 export interface Bout {
     bout_id: string;
-    event: Event;
-    fighter_1: Fighter;
-    fighter_2: Fighter;
-    winning_fighter?: Fighter;
+    event?: Event; // left out when the bout is nested inside its own event
+    fighter_1: BoutFighter | Fighter;
+    fighter_2: BoutFighter | Fighter;
+    winning_fighter?: BoutFighter | Fighter;
     result?: string;
     method?: string;
     ending_round?: string;
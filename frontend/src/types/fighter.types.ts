@@ -23,6 +23,21 @@ export interface Fighter {
     peak_elo?: number;
     elo_history?: History[]
 }
+
+// One point of a rating chart: the fighter's rating after their bout(s) on that date
+export interface EloHistoryPoint {
+    date: string;
+    elo: number;
+}
+
+// Response of /api/fighters/<fighter_id>/elo-history/, downsampled server-side to at most `points` points
+export interface EloHistory {
+    fighter_id: string;
+    from: string | null;
+    to: string | null;
+    total_points: number; // bouts in the window, before downsampling
+    points: EloHistoryPoint[];
+}
     // name = models.CharField(max_length=255)
     // nickname = models.CharField(max_length=255, null=True, blank=True)
     // wins = models.IntegerField(default=0)